@@ -1,10 +1,24 @@
 from django.contrib import admin
+from django.contrib import messages
 from django.contrib.admin import AdminSite
-from django.db.models import Count
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect
+from django.db.models import Sum
 from django.urls import path
 from django.template.response import TemplateResponse
-from datetime import datetime
-from .models import Meal, MealRegistration, MealChoice, Parent, Child
+from django.utils import timezone
+from datetime import datetime, timedelta
+from .models import (
+    Meal, MealRegistration, MealChoice, Parent, Child, DailyMealTotal, StandingOrder, DeletionTask, Job,
+)
+from .forms import OrderExportForm, TermPlanForm
+from .exports import astream, filter_choices, stream_csv, stream_xlsx
+from .planning import plan_term
+from .forecasting import forecast, forecast_rows
+from .pagination import EstimatedCountPaginator
+
+FORECAST_HORIZON = timedelta(days=28)
 
 
 class MealsAdminSite(AdminSite):
@@ -21,13 +35,24 @@ class MealsAdminSite(AdminSite):
         custom_urls = [
             path('logout/', auth_views.LogoutView.as_view(next_page='/admin/login/'), name='logout'),
             path('meals-for-day/', self.admin_view(self.meals_for_day_view), name='meals-for-day'),
+            path('export-orders/', self.admin_view(self.export_orders_view), name='export-orders'),
+            path('plan-term/', self.admin_view(self.plan_term_view), name='plan-term'),
         ]
         # Put custom URL before default ones so it takes precedence
         return custom_urls + urls
 
     def meals_for_day_view(self, request):
         """View for displaying meal orders by date"""
-        available_dates = MealChoice.objects.order_by('meal_registration__date').values_list('meal_registration__date', flat=True).distinct()
+        today = timezone.now().date()
+        # Upcoming menus are listed before anyone orders, for their forecast.
+        available_dates = sorted(
+            DailyMealTotal.objects.filter(count__gt=0)
+            .values_list('meal_registration__date', flat=True)
+            .union(
+                MealRegistration.objects.filter(date__gte=today, date__lt=today + FORECAST_HORIZON)
+                .values_list('date', flat=True)
+            )
+        )
 
         date_str = request.GET.get('date')
         if date_str:
@@ -36,22 +61,45 @@ class MealsAdminSite(AdminSite):
             except ValueError:
                 date = None
         else:
-            date = available_dates.first() if available_dates else None
+            date = available_dates[0] if available_dates else None
 
         if date:
             meal_registrations = MealRegistration.objects.filter(date=date)
-            meals = MealChoice.objects.filter(meal_registration__in=meal_registrations).order_by('child__year_group', 'child__last_name')
-            meal_totals = meals.values('meal__name').annotate(total=Count('id')).order_by('-total')
+            meals = (
+                MealChoice.objects.filter(meal_registration__in=meal_registrations)
+                .select_related('child', 'meal', 'meal_registration')
+                .order_by('child__year_group', 'child__last_name')
+            )
+            meal_totals = (
+                DailyMealTotal.objects.filter(meal_registration__in=meal_registrations, count__gt=0)
+                .values('meal__name')
+                .annotate(total=Sum('count'))
+                .order_by('-total')
+            )
         else:
             meals = []
             meal_totals = []
 
+        forecast_totals = []
+        if date and date >= today:
+            rows = forecast_rows(forecast(date, date, today))
+            names = dict(Meal.objects.filter(id__in={row['meal_id'] for row in rows}).values_list('id', 'name'))
+            forecast_totals = sorted(
+                ({**row, 'meal__name': names[row['meal_id']]} for row in rows),
+                key=lambda row: (-row['forecast'], row['meal__name']),
+            )
+
         context = {
             'title': f'Meals for {date}' if date else 'Meals for Day',
             'meals': meals,
             'meal_totals': meal_totals,
+            'forecast_totals': forecast_totals,
             'date': date,
             'available_dates': available_dates,
+            'export_form': OrderExportForm(initial={
+                'start': available_dates[0] if available_dates else date,
+                'end': available_dates[-1] if available_dates else date,
+            }),
             'site_title': self.site_title,
             'site_header': self.site_header,
             'has_permission': True,
@@ -59,6 +107,69 @@ class MealsAdminSite(AdminSite):
 
         return TemplateResponse(request, 'admin/meals_for_day.html', context)
 
+    def export_orders_view(self, request):
+        """Stream the orders for a date range as CSV or XLSX"""
+        form = OrderExportForm(request.GET)
+        if not form.is_valid():
+            for field, errors in form.errors.items():
+                for error in errors:
+                    messages.error(request, f'Export {field}: {error}')
+            return redirect('admin:meals-for-day')
+
+        data = form.cleaned_data
+        choices = filter_choices(data['start'], data['end'], data['year_group'], data['meal'])
+        filename = f"meal-orders-{data['start']}-to-{data['end']}.{data['format']}"
+        if data['format'] == 'xlsx':
+            content = stream_xlsx(choices)
+            content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        else:
+            content, content_type = stream_csv(choices), 'text/csv'
+        if isinstance(request, ASGIRequest):
+            # Under ASGI a sync iterator would be read whole before sending.
+            content = astream(content)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def plan_term_view(self, request):
+        """Create a whole term of menus from a weekly rotation in one go"""
+        if request.method == 'POST':
+            form = TermPlanForm(request.POST)
+            if form.is_valid():
+                data = form.cleaned_data
+                preview = 'preview' in request.POST
+                try:
+                    result = plan_term(
+                        data['start'], data['end'], form.rotation(), data['holidays'], dry_run=preview
+                    )
+                except ValueError as e:
+                    messages.error(request, str(e))
+                else:
+                    verb = 'Would create' if preview else 'Created'
+                    messages.success(
+                        request,
+                        f"{verb} {result['registrations']} menus with {result['menu_rows']} meals "
+                        f"from {data['start']} to {data['end']}.",
+                    )
+                    if result['skipped']:
+                        messages.warning(
+                            request,
+                            f"{len(result['skipped'])} days already have a menu and were left alone.",
+                        )
+                    if not preview:
+                        return redirect('admin:meals_mealregistration_changelist')
+        else:
+            form = TermPlanForm()
+
+        context = {
+            'title': 'Plan Term Menus',
+            'form': form,
+            'site_title': self.site_title,
+            'site_header': self.site_header,
+            'has_permission': True,
+        }
+        return TemplateResponse(request, 'admin/plan_term.html', context)
+
     def index(self, request, extra_context=None):
         """Override admin index to add custom links"""
         extra_context = extra_context or {}
@@ -67,7 +178,12 @@ class MealsAdminSite(AdminSite):
                 'title': 'View Meal Orders by Date',
                 'url': '/admin/meals-for-day/',
                 'description': 'See all meal orders organized by date'
-            }
+            },
+            {
+                'title': 'Plan Term Menus',
+                'url': '/admin/plan-term/',
+                'description': 'Create the menus for a whole term from a weekly rotation'
+            },
         ]
         return super().index(request, extra_context)
 
@@ -81,14 +197,43 @@ class MealAdmin(admin.ModelAdmin):
 
 
 class MealRegistrationAdmin(admin.ModelAdmin):
-    list_display = ('date',)
+    list_display = ('date', 'standing_orders_applied')
     filter_horizontal = ('meals',)
 
 
+class YearGroupFilter(admin.SimpleListFilter):
+    """Year groups as a fixed list, rather than a DISTINCT over every choice."""
+    title = 'year group'
+    parameter_name = 'child__year_group'
+
+    def lookups(self, request, model_admin):
+        return [(str(year_group), f'Year {year_group}') for year_group in range(14)]
+
+    def queryset(self, request, queryset):
+        if self.value() is not None:
+            return queryset.filter(child__year_group=self.value())
+        return queryset
+
+
 class MealChoiceAdmin(admin.ModelAdmin):
     list_display = ('child', 'meal', 'meal_registration')
-    list_filter = ('child__year_group', 'meal', 'meal_registration__date')
+    list_filter = (YearGroupFilter, 'meal')
+    list_select_related = ('child', 'meal', 'meal_registration')
     search_fields = ('child__first_name', 'child__last_name')
+    # Years, months and days come from the daily totals; see
+    # admin/meals/mealchoice/change_list.html.
+    date_hierarchy = 'meal_registration__date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ('child', 'meal_registration')
+
+
+class StandingOrderAdmin(admin.ModelAdmin):
+    list_display = ('child', 'weekday', 'rank', 'meal')
+    list_filter = ('weekday', 'meal')
+    list_select_related = ('child', 'meal')
+    search_fields = ('child__first_name', 'child__last_name')
+    raw_id_fields = ('child',)
 
 
 class ParentAdmin(admin.ModelAdmin):
@@ -102,9 +247,36 @@ class ChildAdmin(admin.ModelAdmin):
     search_fields = ('first_name', 'last_name', 'parent__full_name')
 
 
+class DeletionTaskAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'target_id', 'status', 'step', 'rows_deleted', 'updated_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = [field.name for field in DeletionTask._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = [field.name for field in Job._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # Register models with the custom admin site
 admin_site.register(Meal, MealAdmin)
 admin_site.register(MealRegistration, MealRegistrationAdmin)
 admin_site.register(MealChoice, MealChoiceAdmin)
+admin_site.register(StandingOrder, StandingOrderAdmin)
 admin_site.register(Parent, ParentAdmin)
 admin_site.register(Child, ChildAdmin)
+admin_site.register(DeletionTask, DeletionTaskAdmin)
+admin_site.register(Job, JobAdmin)
@@ -0,0 +1,97 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
+from .models import ArchivedMealChoice, DailyMealTotal, MealChoice, MealChoiceRollup, MealRegistration
+
+BATCH_SIZE = 20
+
+
+def archive_cutoff(today=None, days=None):
+    """The first date kept in the hot table: ``MEALS_ARCHIVE_AFTER_DAYS`` before today."""
+    today = today or timezone.now().date()
+    if days is None:
+        days = settings.MEALS_ARCHIVE_AFTER_DAYS
+    return today - timedelta(days=days)
+
+
+def registrations_to_archive(cutoff):
+    """Ids of the registrations before ``cutoff`` that still have hot rows, by date."""
+    return list(
+        MealRegistration.objects.filter(date__lt=cutoff)
+        .filter(
+            Exists(MealChoice.objects.filter(meal_registration=OuterRef("pk")))
+            | Exists(DailyMealTotal.objects.filter(meal_registration=OuterRef("pk")))
+        )
+        .order_by("date", "id")
+        .values_list("id", flat=True)
+    )
+
+
+def archive_registrations(registration_ids):
+    """
+    Archive every choice of ``registration_ids`` in one transaction.
+
+    The rollups are written first, adding to any left by an earlier run
+    for the same dates. The choices are then copied into
+    ArchivedMealChoice and removed from the hot table with a raw DELETE,
+    since the per-row signals would only decrement totals that go next:
+    the dates' DailyMealTotal rows are dropped too, and the rollups hold
+    their counts from now on. Returns ``(choices, rollups)`` written.
+    """
+    with transaction.atomic():
+        choices = MealChoice.objects.filter(meal_registration_id__in=registration_ids)
+        counts = list(
+            choices.values_list("meal_registration__date", "meal_id", "child__year_group")
+            .annotate(n=Count("id"))
+            .order_by()
+        )
+        existing = {
+            (rollup.date, rollup.meal_id, rollup.year_group): rollup.count
+            for rollup in MealChoiceRollup.objects.filter(date__in={date for date, _, _, _ in counts})
+        }
+        MealChoiceRollup.objects.bulk_create(
+            [
+                MealChoiceRollup(
+                    date=date, meal_id=meal_id, year_group=year_group,
+                    count=existing.get((date, meal_id, year_group), 0) + n,
+                )
+                for date, meal_id, year_group, n in counts
+            ],
+            update_conflicts=True,
+            unique_fields=["date", "meal", "year_group"],
+            update_fields=["count"],
+        )
+        ArchivedMealChoice.objects.bulk_create(
+            (
+                ArchivedMealChoice(
+                    id=choice_id, child_id=child_id, meal_id=meal_id, date=date, chosen_at=chosen_at
+                )
+                for choice_id, child_id, meal_id, date, chosen_at in choices.values_list(
+                    "id", "child_id", "meal_id", "meal_registration__date", "chosen_at"
+                )
+            ),
+            ignore_conflicts=True,
+        )
+        moved = choices._raw_delete(choices.db)
+        DailyMealTotal.objects.filter(meal_registration_id__in=registration_ids).delete()
+    return moved, len(counts)
+
+
+def archive_choices(cutoff, batch_size=BATCH_SIZE):
+    """
+    Move the choices of every date before ``cutoff`` into the archive,
+    ``batch_size`` registrations per transaction so an interrupted run
+    keeps what it finished and the next one picks up the rest. Returns a
+    dict with the number of dates, choices and rollup rows archived.
+    """
+    result = {"dates": 0, "choices": 0, "rollups": 0}
+    registration_ids = registrations_to_archive(cutoff)
+    for start in range(0, len(registration_ids), batch_size):
+        batch = registration_ids[start:start + batch_size]
+        moved, rollups = archive_registrations(batch)
+        result["dates"] += len(batch)
+        result["choices"] += moved
+        result["rollups"] += rollups
+    return result
@@ -0,0 +1,57 @@
+from django.core.exceptions import ImproperlyConfigured
+
+POSTGRESQL_ENGINES = ("django.db.backends.postgresql", "django.db.backends.postgresql_psycopg2")
+POOLED_ENGINE = "meals.backends.postgresql"
+
+CONNECTION_MODES = ("pool", "persistent", "pgbouncer", "per_request")
+
+
+def apply_connection_mode(database, mode, max_age=600, pool_size=4, pool_max_idle=300,
+                          behind_proxy=False, asgi=False):
+    """
+    Return a copy of the ``database`` settings dict configured for ``mode``:
+
+    * ``pool``: a per-process pool of connections, reset with ``DISCARD
+      ALL`` when handed back (PostgreSQL only; other engines fall back to
+      ``persistent``). Opt-in.
+    * ``persistent``: one connection per thread, kept for ``max_age``
+      seconds and health-checked at the start of each request.
+    * ``pgbouncer``: short-lived connections to a transaction-pooling proxy,
+      which makes them cheap, with server-side cursors turned off.
+    * ``per_request``: a fresh connection for every request.
+
+    ``behind_proxy`` turns server-side cursors off for the other modes, for
+    when the pool or persistent connections talk to a pgbouncer-style proxy.
+    ``persistent`` is refused under ``asgi``, where each request's sync code
+    runs in a new thread and every thread would leave a connection open.
+    """
+    if mode not in CONNECTION_MODES:
+        raise ImproperlyConfigured(
+            f"DB_CONNECTIONS must be one of {', '.join(CONNECTION_MODES)}, not {mode!r}."
+        )
+    if asgi and mode == "persistent":
+        raise ImproperlyConfigured(
+            "DB_CONNECTIONS=persistent leaks a connection per thread under ASGI; "
+            "use per_request, pool or pgbouncer."
+        )
+    database = dict(database)
+    if mode == "pool" and database.get("ENGINE") not in (*POSTGRESQL_ENGINES, POOLED_ENGINE):
+        mode = "persistent"
+
+    if mode == "pool":
+        database.update(
+            ENGINE=POOLED_ENGINE,
+            CONN_MAX_AGE=0,
+            CONN_HEALTH_CHECKS=True,
+            POOL={"max_size": pool_size, "max_idle": pool_max_idle},
+        )
+    elif mode == "persistent":
+        database.update(CONN_MAX_AGE=max_age, CONN_HEALTH_CHECKS=True)
+    elif mode == "pgbouncer":
+        database.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+        behind_proxy = True
+    else:
+        database.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+    if behind_proxy:
+        database["DISABLE_SERVER_SIDE_CURSORS"] = True
+    return database
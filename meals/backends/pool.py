@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from collections import Counter
+
+_pools = {}
+_pools_lock = threading.Lock()
+# Pools a forked child inherited from its parent. Their sockets are shared
+# with the parent, so closing them (even by garbage collection) would end
+# the parent's sessions; they are kept referenced and never used.
+_inherited = []
+
+
+class ConnectionPool:
+    """
+    A per-process pool of idle DB-API connections.
+
+    ``acquire`` hands out the most recently released connection, dropping
+    any that sat idle longer than ``max_idle`` seconds or fail ``check``,
+    and opens a new one when none is left, so callers never wait. At most
+    ``max_size`` connections are kept idle; extra ones are closed on
+    release.
+    """
+
+    def __init__(self, max_size=4, max_idle=300):
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.stats = Counter()
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self, connect, check=None):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                connection, released_at = self._idle.pop()
+            if self.max_idle is not None and time.monotonic() - released_at > self.max_idle:
+                self._discard(connection)
+            elif check is not None and not check(connection):
+                self._discard(connection)
+            else:
+                self.stats["reused"] += 1
+                return connection
+        connection = connect()
+        self.stats["created"] += 1
+        return connection
+
+    def release(self, connection, reset=None):
+        try:
+            if reset is not None:
+                reset(connection)
+        except Exception:
+            self._discard(connection)
+            return
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append((connection, time.monotonic()))
+                return
+        self._discard(connection)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def __len__(self):
+        return len(self._idle)
+
+    def _discard(self, connection):
+        self.stats["discarded"] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def get_pool(key, **options):
+    """Return this process's pool for ``key``, creating it on first use."""
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(key, ConnectionPool(**options))
+    return pool
+
+
+def _forget_inherited_pools():
+    global _pools_lock
+    _inherited.append(_pools.copy())
+    _pools.clear()
+    _pools_lock = threading.Lock()
+
+
+# gunicorn forks its workers; each one has to start with empty pools.
+os.register_at_fork(after_in_child=_forget_inherited_pools)
@@ -0,0 +1,46 @@
+from functools import partial
+from django.db.backends.postgresql import base
+from ..pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend that keeps physical connections in a per-process
+    pool (see meals.backends.pool).
+
+    Run it with CONN_MAX_AGE = 0: Django then "closes" the connection at
+    the end of every request, which hands it back to the pool, and the next
+    connect() from any thread of the process takes it out again. That also
+    covers ASGI, where each request's sync code runs in a new thread and
+    per-thread persistent connections would be reopened every time.
+    """
+
+    def _pool(self):
+        return get_pool(self._pool_key, **(self.settings_dict.get("POOL") or {}))
+
+    def get_new_connection(self, conn_params):
+        self._pool_key = (self.alias, repr(sorted(conn_params.items())))
+        check = self._check_pooled if self.settings_dict["CONN_HEALTH_CHECKS"] else None
+        return self._pool().acquire(partial(super().get_new_connection, conn_params), check)
+
+    def _close(self):
+        if self.connection is not None:
+            self._pool().release(self.connection, self._reset_pooled)
+
+    @staticmethod
+    def _check_pooled(connection):
+        # No round trip: the connection was reset, which proved it alive,
+        # when it was released, and it has been idle at most max_idle since.
+        # Transaction status 0 is IDLE in both psycopg2 and psycopg 3.
+        return not connection.closed and connection.info.transaction_status == 0
+
+    @staticmethod
+    def _reset_pooled(connection):
+        if connection.closed:
+            raise base.Database.InterfaceError("connection already closed")
+        connection.rollback()
+        connection.autocommit = True
+        # Drop the session state the last request left behind: SETs, temp
+        # tables, advisory locks, prepared statements and LISTENs.
+        with connection.cursor() as cursor:
+            cursor.execute("DISCARD ALL")
@@ -0,0 +1,107 @@
+from datetime import datetime
+from django.db import transaction
+from .models import MealRegistration
+from .ordering import upsert_choices
+
+MAX_CELLS = 1000
+
+CREATED = "created"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+REJECTED = "rejected"
+STATUSES = (CREATED, UPDATED, UNCHANGED, REJECTED)
+
+
+def parse_cell(cell):
+    """Return ``(child_id, date, meal_id)`` for one order, or raise ValueError."""
+    if not isinstance(cell, dict):
+        raise ValueError("Each order must be an object with child, date and meal.")
+    try:
+        child_id = int(cell["child"])
+        meal_id = int(cell["meal"])
+        date = datetime.strptime(str(cell["date"]), "%Y-%m-%d").date()
+    except KeyError as e:
+        raise ValueError(f"Missing {e.args[0]}.")
+    except (TypeError, ValueError):
+        raise ValueError("child and meal must be ids and date must be YYYY-MM-DD.")
+    return child_id, date, meal_id
+
+
+def place_orders(parent, cells, today):
+    """
+    Validate and save a batch of orders for ``parent``'s children.
+
+    ``cells`` is a list of ``{"child", "date", "meal"}`` dicts. The whole
+    batch is checked with two set-based queries (the parent's children and
+    the menus of every date involved), then every valid cell is written
+    with one upsert in one transaction, which reads the choices already
+    stored under a lock on the children. Returns one result per cell, in
+    order: the cell plus a ``status`` of created, updated, unchanged or
+    rejected, and an ``error`` for rejected cells.
+    """
+    results = []
+    parsed = []
+    for cell in cells:
+        try:
+            child_id, date, meal_id = parse_cell(cell)
+        except ValueError as e:
+            results.append({"status": REJECTED, "error": str(e)})
+            continue
+        results.append({"child": child_id, "date": date.isoformat(), "meal": meal_id})
+        parsed.append((results[-1], child_id, date, meal_id))
+    if not parsed:
+        return results
+
+    own_children = set(
+        parent.children.filter(id__in={child_id for _, child_id, _, _ in parsed})
+        .values_list("id", flat=True)
+    )
+    # (date, meal id) -> registration id, for every meal on the dates asked
+    # for; the first registration wins, as in menu_for_date().
+    menus = {}
+    menu_dates = set()
+    Through = MealRegistration.meals.through
+    rows = (
+        Through.objects.filter(mealregistration__date__in={date for _, _, date, _ in parsed})
+        .values_list("mealregistration__date", "mealregistration_id", "meal_id")
+        .order_by("mealregistration_id")
+    )
+    for date, registration_id, meal_id in rows:
+        menu_dates.add(date)
+        menus.setdefault((date, meal_id), registration_id)
+
+    selections = {}
+    ordered = set()
+    accepted = []
+    for result, child_id, date, meal_id in parsed:
+        if date < today:
+            error = "Orders for past dates cannot be changed."
+        elif child_id not in own_children:
+            error = "Unknown child."
+        elif date not in menu_dates:
+            error = "There is no menu on this date."
+        elif (date, meal_id) not in menus:
+            error = "This meal is not on the menu for this date."
+        elif (child_id, date) in ordered:
+            # By date, not registration: a date can have more than one.
+            error = "Duplicate order for this child and date."
+        else:
+            key = (child_id, menus[(date, meal_id)])
+            ordered.add((child_id, date))
+            selections[key] = meal_id
+            accepted.append((result, key))
+            continue
+        result.update(status=REJECTED, error=error)
+    if not selections:
+        return results
+
+    with transaction.atomic():
+        previous = upsert_choices(selections)
+    for result, key in accepted:
+        if key not in previous:
+            result["status"] = CREATED
+        elif previous[key] == selections[key]:
+            result["status"] = UNCHANGED
+        else:
+            result["status"] = UPDATED
+    return results
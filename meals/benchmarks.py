@@ -0,0 +1,90 @@
+import json
+import math
+import statistics
+import time
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (0 < pct <= 100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies_ms, query_counts=()):
+    """Latency percentiles in milliseconds, plus the worst query count."""
+    summary = {
+        "requests": len(latencies_ms),
+        "mean_ms": round(statistics.fmean(latencies_ms), 3) if latencies_ms else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p95_ms": round(percentile(latencies_ms, 95), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+    }
+    if query_counts:
+        summary["queries"] = max(query_counts)
+    return summary
+
+
+def time_requests(send, count, warmup=0):
+    """
+    Call ``send`` ``warmup`` times untimed, then ``count`` times while
+    recording wall time and the queries each call issues.
+    """
+    for _ in range(warmup):
+        send()
+    latencies = []
+    query_counts = []
+    for _ in range(count):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            send()
+            latencies.append((time.perf_counter() - started) * 1000)
+        query_counts.append(len(queries))
+    return summarize(latencies, query_counts)
+
+
+def results_document(results, **meta):
+    return {
+        "created": timezone.now().isoformat(),
+        "database": connection.vendor,
+        **meta,
+        "results": results,
+    }
+
+
+def write_results(path, document):
+    with open(path, "w") as fh:
+        json.dump(document, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+
+
+def load_results(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def compare_results(current, baseline, tolerance=0.2):
+    """
+    Return a list of regressions of ``current`` against ``baseline``: any
+    scenario whose p95 latency grew by more than ``tolerance`` (a fraction)
+    or that now runs more queries.
+    """
+    regressions = []
+    for name, before in baseline.get("results", {}).items():
+        after = current.get("results", {}).get(name)
+        if after is None:
+            continue
+        if after["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {after['p95_ms']:.1f} ms, baseline {before['p95_ms']:.1f} ms"
+            )
+        if after.get("queries", 0) > before.get("queries", 0):
+            regressions.append(
+                f"{name}: {after['queries']} queries, baseline {before['queries']}"
+            )
+    return regressions
@@ -0,0 +1,80 @@
+import statistics
+import threading
+from django.db import connection
+from django.db.models import Count
+from .models import MealChoice
+from .totals import verify_totals
+
+LOCK_WAITS_SQL = """
+    SELECT
+        (SELECT count(*) FROM pg_stat_activity
+         WHERE wait_event_type = 'Lock' AND datname = current_database()),
+        (SELECT deadlocks FROM pg_stat_database WHERE datname = current_database())
+"""
+
+
+class LockWaitSampler:
+    """
+    Count the sessions waiting on a lock every ``interval`` seconds while
+    the block runs, from a thread with its own connection, and the
+    deadlocks detected meanwhile. PostgreSQL only: elsewhere ``summary()``
+    returns None.
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.samples = []
+        self.deadlocks = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if connection.vendor == "postgresql":
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+
+    def _sample(self):
+        # ``connection`` is per thread, so this opens one of its own.
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(LOCK_WAITS_SQL)
+                _, first_deadlocks = cursor.fetchone()
+                while not self._stop.wait(self.interval):
+                    cursor.execute(LOCK_WAITS_SQL)
+                    waiting, deadlocks = cursor.fetchone()
+                    self.samples.append(waiting)
+                    self.deadlocks = deadlocks - first_deadlocks
+        finally:
+            connection.close()
+
+    def summary(self):
+        if self._thread is None:
+            return None
+        return {
+            "samples": len(self.samples),
+            "waiting_samples": sum(1 for waiting in self.samples if waiting),
+            "max_waiting": max(self.samples, default=0),
+            "mean_waiting": round(statistics.fmean(self.samples), 2) if self.samples else 0.0,
+            "deadlocks": self.deadlocks or 0,
+        }
+
+
+def order_integrity(registration_id, child_ids):
+    """
+    Check what a rush left behind for one date: children with more than
+    one choice, children without one, and totals that no longer match the
+    choices.
+    """
+    choices = MealChoice.objects.filter(meal_registration_id=registration_id, child_id__in=child_ids)
+    per_child = dict(choices.values_list("child_id").annotate(n=Count("id")).order_by())
+    return {
+        "duplicate_choices": sum(n - 1 for n in per_child.values() if n > 1),
+        "missing_choices": len(set(child_ids) - set(per_child)),
+        "total_mismatches": len(verify_totals([registration_id])),
+    }
@@ -0,0 +1,57 @@
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+
+
+def _load_user(request):
+    # Touch the lazy user so the session read and user query happen here,
+    # in a worker thread, and never inside the event loop.
+    return request.user.is_authenticated
+
+
+def _load_parent(request):
+    return request.parent.pk
+
+
+async def aget_user(request):
+    """Resolve ``request.user`` off the event loop and return it."""
+    await sync_to_async(_load_user)(request)
+    return request.user
+
+
+async def aget_parent(request):
+    """Resolve ``request.parent`` (see ParentMiddleware) off the event loop."""
+    await sync_to_async(_load_parent)(request)
+    return request.parent
+
+
+def async_login_required(view):
+    """
+    login_required for ``async def`` views.
+
+    Django 4.2's decorator wraps views in a sync function, which would turn
+    an async view back into a sync one; this keeps the view a coroutine.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def async_staff_required(view):
+    """async_login_required that also turns away users who are not staff with a 403."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        if not user.is_staff:
+            raise PermissionDenied
+        return await view(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,171 @@
+import logging
+from collections import Counter
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from .jobs import enqueue, job
+from .models import ArchivedMealChoice, Child, DeletionTask, MealChoice, Parent, StandingOrder
+from .ordering import lock_children
+from .totals import apply_total_changes
+
+logger = logging.getLogger("meals")
+
+CHUNK_SIZE = 1000
+MAX_ATTEMPTS = 5
+
+
+def _delete_choice_rows(child_ids, choices):
+    """
+    Delete ``choices`` of ``child_ids`` and take them off the totals, in
+    the caller's transaction. The choices are read after the children are
+    locked, so a deletion running twice at once (a job claimed again after
+    its lease ran out) cannot take the same rows off the totals twice.
+    Returns the number of rows deleted.
+    """
+    lock_children(child_ids)
+    rows = list(choices.values_list("id", "meal_registration_id", "meal_id"))
+    if not rows:
+        return 0
+    chunk = MealChoice.objects.filter(id__in=[row[0] for row in rows])
+    # A raw DELETE skips the per-row signals, so fix the totals here.
+    deleted = chunk._raw_delete(chunk.db)
+    apply_total_changes(Counter({
+        (registration_id, meal_id): -count
+        for (registration_id, meal_id), count in Counter(row[1:] for row in rows).items()
+    }))
+    return deleted
+
+
+def _cancel_upcoming_choices(child_ids):
+    """
+    Delete the children's choices from today on, with their totals, so the
+    kitchen stops cooking for them at once. A child has at most a term of
+    these, so this is done in the request; the rest waits for the job.
+    """
+    _delete_choice_rows(child_ids, MealChoice.objects.filter(
+        child_id__in=child_ids, meal_registration__date__gte=timezone.now().date()
+    ))
+
+
+def request_account_deletion(user):
+    """
+    Deactivate ``user`` so they are signed out everywhere and cannot log
+    in, cancel their children's upcoming meals and queue the deletion of
+    their account and data.
+    """
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=["is_active"])
+        _cancel_upcoming_choices(list(Child.all_objects.filter(parent__user=user).values_list("id", flat=True)))
+        task = DeletionTask.objects.create(kind=DeletionTask.ACCOUNT, target_id=user.pk)
+        enqueue(run_deletion, task.pk, max_attempts=MAX_ATTEMPTS)
+        return task
+
+
+def request_child_deletion(child):
+    """
+    Hide ``child`` from every page now, cancel its upcoming meals and queue
+    the deletion of its other rows.
+    """
+    with transaction.atomic():
+        child.is_active = False
+        child.save(update_fields=["is_active"])
+        _cancel_upcoming_choices([child.pk])
+        task = DeletionTask.objects.create(kind=DeletionTask.CHILD, target_id=child.pk)
+        enqueue(run_deletion, task.pk, max_attempts=MAX_ATTEMPTS)
+        return task
+
+
+def _record(task, step, deleted):
+    """Save progress after each chunk."""
+    task.step = step
+    task.rows_deleted += deleted
+    task.save(update_fields=["step", "rows_deleted", "updated_at"])
+
+
+def _delete_choices(task, child_ids, chunk_size):
+    """Delete the children's choices a chunk at a time, moving the totals with them."""
+    while True:
+        with transaction.atomic():
+            deleted = _delete_choice_rows(
+                child_ids, MealChoice.objects.filter(child_id__in=child_ids).order_by("id")[:chunk_size]
+            )
+            if not deleted:
+                return
+            _record(task, "meal choices", deleted)
+
+
+def _delete_in_chunks(task, step, queryset, chunk_size):
+    while True:
+        ids = list(queryset.order_by("pk").values_list("pk", flat=True)[:chunk_size])
+        if not ids:
+            return
+        chunk = queryset.model._base_manager.filter(pk__in=ids)
+        _record(task, step, chunk._raw_delete(chunk.db))
+
+
+def _delete_children(task, child_ids, chunk_size):
+    _delete_choices(task, child_ids, chunk_size)
+    _delete_in_chunks(task, "archived choices",
+                      ArchivedMealChoice.objects.filter(child_id__in=child_ids), chunk_size)
+    _delete_in_chunks(task, "standing orders",
+                      StandingOrder.objects.filter(child_id__in=child_ids), chunk_size)
+    # Nothing refers to the children any more, so the collector has no
+    # rows left to load and this is one DELETE.
+    deleted, _ = Child.all_objects.filter(id__in=child_ids).delete()
+    _record(task, "children", deleted)
+
+
+def run_task(task, chunk_size=CHUNK_SIZE):
+    """
+    Delete everything ``task`` points at with set-based DELETEs of at most
+    ``chunk_size`` rows, each committed with the progress made so far.
+    Every step deletes whatever is left, so a task that is run again after
+    a crash carries on where it stopped.
+    """
+    if task.kind == DeletionTask.CHILD:
+        _delete_children(task, [task.target_id], chunk_size)
+    elif task.kind == DeletionTask.ACCOUNT:
+        child_ids = list(
+            Child.all_objects.filter(parent__user_id=task.target_id).values_list("id", flat=True)
+        )
+        _delete_children(task, child_ids, chunk_size)
+        deleted, _ = Parent.objects.filter(user_id=task.target_id).delete()
+        _record(task, "parent", deleted)
+        deleted, _ = User.objects.filter(pk=task.target_id).delete()
+        _record(task, "user", deleted)
+    else:
+        raise ValueError(f"Unknown deletion kind: {task.kind}")
+    task.status = DeletionTask.DONE
+    task.step = ""
+    task.finished_at = timezone.now()
+    task.save(update_fields=["status", "step", "finished_at", "updated_at"])
+
+
+def _give_up(task_id, chunk_size=CHUNK_SIZE):
+    DeletionTask.objects.filter(pk=task_id).exclude(status=DeletionTask.DONE).update(
+        status=DeletionTask.FAILED, updated_at=timezone.now()
+    )
+
+
+@job(on_failure=_give_up)
+def run_deletion(task_id, chunk_size=CHUNK_SIZE):
+    """
+    Run deletion task ``task_id``. The job queue leases the task to one
+    worker and retries it with backoff; every retry carries on from the
+    rows that are left, and the task is marked failed once the job gives up.
+    """
+    task = DeletionTask.objects.get(pk=task_id)
+    if task.status in (DeletionTask.DONE, DeletionTask.FAILED):
+        return
+    task.status = DeletionTask.RUNNING
+    task.save(update_fields=["status", "updated_at"])
+    try:
+        run_task(task, chunk_size)
+    except Exception as e:
+        logger.error(f"Error deleting {task.kind} {task.target_id}: {str(e)}")
+        task.status = DeletionTask.PENDING
+        task.last_error = str(e)
+        task.save(update_fields=["status", "last_error", "updated_at"])
+        raise
+    logger.info(f"Deleted {task.kind} {task.target_id}: {task.rows_deleted} rows")
@@ -0,0 +1,15 @@
+from django.contrib.auth.forms import PasswordResetForm
+from .jobs import job
+
+
+@job
+def send_password_reset(email, domain, use_https):
+    """Send the password reset email for ``email``, if it belongs to an active user."""
+    form = PasswordResetForm({"email": email})
+    if form.is_valid():
+        form.save(
+            domain_override=domain,
+            use_https=use_https,
+            email_template_name="meals/password_reset_email.html",
+            subject_template_name="meals/password_reset_subject.txt",
+        )
@@ -0,0 +1,238 @@
+import csv
+import heapq
+import zipfile
+from collections import Counter, namedtuple
+from itertools import islice
+from xml.sax.saxutils import escape
+from asgiref.sync import sync_to_async
+from django.db.models import Count
+from .models import ArchivedMealChoice, MealChoice
+
+ORDER_HEADER = ("Date", "Year group", "Last name", "First name", "Meal")
+TOTALS_HEADER = ("Date", "Meal", "Total")
+
+CHUNK_SIZE = 2000
+
+# Spreadsheets run a cell starting with one of these as a formula.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+# The orders of an export: the MealChoice rows of the hot table and the
+# ArchivedMealChoice rows of dates moved out of it.
+Choices = namedtuple("Choices", ["current", "archived"])
+
+
+def filter_choices(start, end, year_group=None, meal=None):
+    """Current and archived choices in the inclusive date range, optionally narrowed."""
+    current = MealChoice.objects.filter(
+        meal_registration__date__gte=start, meal_registration__date__lte=end
+    )
+    archived = ArchivedMealChoice.objects.filter(date__gte=start, date__lte=end)
+    if year_group is not None:
+        current = current.filter(child__year_group=year_group)
+        archived = archived.filter(child__year_group=year_group)
+    if meal is not None:
+        current = current.filter(meal=meal)
+        archived = archived.filter(meal=meal)
+    return Choices(current, archived)
+
+
+def _sorted_orders(choices, date_field):
+    return (
+        choices.order_by(date_field, "child__year_group", "child__last_name", "id")
+        .values_list(
+            date_field,
+            "child__year_group",
+            "child__last_name",
+            "id",
+            "child__first_name",
+            "meal__name",
+        )
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def order_rows(choices):
+    """
+    Stream one tuple per order, reading the current and archived choices
+    in chunks with a server-side cursor each and merging the two sorted
+    streams.
+    """
+    merged = heapq.merge(
+        _sorted_orders(choices.archived, "date"),
+        _sorted_orders(choices.current, "meal_registration__date"),
+        key=lambda row: row[:4],
+    )
+    return (
+        (day, year_group, last_name, first_name, meal)
+        for day, year_group, last_name, _, first_name, meal in merged
+    )
+
+
+def total_rows(choices):
+    """One ``(date, meal, total)`` tuple per day and meal, from a GROUP BY per table."""
+    totals = Counter()
+    for queryset, date_field in ((choices.archived, "date"), (choices.current, "meal_registration__date")):
+        for day, meal, total in (
+            queryset.order_by().values_list(date_field, "meal__name").annotate(total=Count("id"))
+        ):
+            totals[day, meal] += total
+    return [(day, meal, total) for (day, meal), total in sorted(totals.items())]
+
+
+class _Buffer:
+    """Write-only file object whose contents are drained by the generator."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _csv_safe(row):
+    """Quote text cells a spreadsheet would read as a formula with a leading ``'``."""
+    return [
+        f"'{value}" if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) else value
+        for value in row
+    ]
+
+
+class _Echo:
+    """csv.writer target that hands each formatted line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(choices):
+    """Yield the orders as CSV, followed by a per-day totals section."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ORDER_HEADER)
+    for row in order_rows(choices):
+        yield writer.writerow(_csv_safe(row))
+    yield writer.writerow(())
+    yield writer.writerow(TOTALS_HEADER)
+    for row in total_rows(choices):
+        yield writer.writerow(_csv_safe(row))
+
+
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_SHEET_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PACKAGE_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_SHEETS = (("Orders", "sheet1.xml"), ("Daily totals", "sheet2.xml"))
+
+
+def _cell(value):
+    if isinstance(value, int):
+        return f"<c><v>{value}</v></c>"
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def _row(values):
+    return "<row>" + "".join(_cell(value) for value in values) + "</row>"
+
+
+def _package_parts():
+    sheet_overrides = "".join(
+        f'<Override PartName="/xl/worksheets/{part}" ContentType="application/'
+        f'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for _, part in _SHEETS
+    )
+    sheets = "".join(
+        f'<sheet name="{name}" sheetId="{index}" r:id="rId{index}"/>'
+        for index, (name, _) in enumerate(_SHEETS, start=1)
+    )
+    sheet_rels = "".join(
+        f'<Relationship Id="rId{index}" Type="{_REL_NS}/worksheet" '
+        f'Target="worksheets/{part}"/>'
+        for index, (_, part) in enumerate(_SHEETS, start=1)
+    )
+    return {
+        "[Content_Types].xml": (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/'
+            'vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            f"{sheet_overrides}</Types>"
+        ),
+        "_rels/.rels": (
+            f'<Relationships xmlns="{_PACKAGE_REL_NS}">'
+            f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>'
+        ),
+        "xl/workbook.xml": (
+            f'<workbook xmlns="{_SHEET_NS}" xmlns:r="{_REL_NS}">'
+            f"<sheets>{sheets}</sheets></workbook>"
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            f'<Relationships xmlns="{_PACKAGE_REL_NS}">{sheet_rels}</Relationships>'
+        ),
+    }
+
+
+def stream_xlsx(choices):
+    """
+    Yield an .xlsx workbook with an "Orders" sheet and a "Daily totals"
+    sheet. The zip is written to a non-seekable buffer that is drained
+    after every chunk of rows, so bytes go out while rows are still read.
+    """
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _package_parts().items():
+            archive.writestr(name, _XML_DECLARATION + content)
+        yield buffer.drain()
+
+        sheets = (
+            ("xl/worksheets/sheet1.xml", ORDER_HEADER, order_rows(choices)),
+            ("xl/worksheets/sheet2.xml", TOTALS_HEADER, total_rows(choices)),
+        )
+        for part, header, rows in sheets:
+            with archive.open(part, "w", force_zip64=True) as sheet:
+                sheet.write(
+                    f'{_XML_DECLARATION}<worksheet xmlns="{_SHEET_NS}"><sheetData>'
+                    f"{_row(header)}".encode()
+                )
+                for count, row in enumerate(rows, start=1):
+                    sheet.write(_row(row).encode())
+                    if count % CHUNK_SIZE == 0:
+                        yield buffer.drain()
+                sheet.write(b"</sheetData></worksheet>")
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def _read_chunks(chunks, size):
+    return [
+        chunk.encode() if isinstance(chunk, str) else chunk
+        for chunk in islice(chunks, size)
+    ]
+
+
+async def astream(chunks, size=CHUNK_SIZE):
+    """
+    Serve a stream_csv() or stream_xlsx() stream to an ASGI server.
+
+    Django 4.2 reads a sync iterator into a list before sending any of it
+    under ASGI, so the stream is read here ``size`` chunks at a time in
+    the thread that runs sync code for the request, where its connection
+    and server-side cursors live, and each batch is sent as it is read.
+    """
+    chunks = iter(chunks)
+    try:
+        while batch := await sync_to_async(_read_chunks)(chunks, size):
+            yield b"".join(batch)
+    finally:
+        # Closes the cursors as well when the client goes away early.
+        await sync_to_async(chunks.close)()
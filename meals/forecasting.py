@@ -0,0 +1,198 @@
+from collections import namedtuple
+from datetime import date, timedelta
+import numpy as np
+from django.db.models import Count
+from django.utils import timezone
+from .models import MealChoice, MealChoiceRollup, MealRegistration
+
+HISTORY_DAYS = 365
+BASELINE_WEEKS = 8
+YEAR_GROUPS = 14
+EPOCH = date(1970, 1, 1).toordinal()
+
+# One row per registration (ordered by date) and one column per meal.
+# ``offered`` is [registration, meal], ``counts`` is [registration, meal,
+# year group]; ``days`` holds date ordinals.
+Demand = namedtuple("Demand", ["registration_ids", "days", "meal_ids", "offered", "counts"])
+
+# ``placed`` and ``predicted`` are [registration, meal, year group] for the
+# upcoming registrations only.
+Forecast = namedtuple("Forecast", ["registration_ids", "days", "meal_ids", "offered", "placed", "predicted"])
+
+
+def load_demand(start, end):
+    """
+    Load every menu and the choice counts per (registration, meal, year
+    group) from ``start`` to ``end`` into arrays, taking archived dates
+    from their rollups. Costs three queries.
+    """
+    Through = MealRegistration.meals.through
+    menus = np.array(
+        Through.objects.filter(mealregistration__date__range=(start, end))
+        .values_list("mealregistration_id", "mealregistration__date", "meal_id")
+        .order_by("mealregistration__date", "mealregistration_id"),
+        dtype=object,
+    ).reshape(-1, 3)
+    choices = np.array(
+        MealChoice.objects.filter(meal_registration__date__range=(start, end))
+        .values_list("meal_registration_id", "meal_id", "child__year_group")
+        .annotate(n=Count("id"))
+        .order_by(),
+        dtype=np.int64,
+    ).reshape(-1, 4)
+    # Rollups are kept per date; count them against the date's first menu.
+    first_of_day = {}
+    for registration_id, day, _ in menus:
+        first_of_day.setdefault(day, registration_id)
+    archived = np.array(
+        [
+            (first_of_day[day], meal_id, year_group, n)
+            for day, meal_id, year_group, n in MealChoiceRollup.objects.filter(date__range=(start, end))
+            .values_list("date", "meal_id", "year_group", "count")
+            if day in first_of_day
+        ],
+        dtype=np.int64,
+    ).reshape(-1, 4)
+    choices = np.concatenate([choices, archived])
+
+    registration_ids, first = np.unique(menus[:, 0].astype(np.int64), return_index=True)
+    days = np.array([day.toordinal() for day in menus[first, 1]], dtype=np.int64)
+    by_date = np.argsort(days, kind="stable")
+    registration_ids, days = registration_ids[by_date], days[by_date]
+    meal_ids = np.unique(np.concatenate([menus[:, 2].astype(np.int64), choices[:, 1]]))
+
+    # Positions in the id-sorted registrations, mapped to date order.
+    rank = np.empty_like(by_date)
+    rank[by_date] = np.arange(len(by_date))
+    id_order = np.sort(registration_ids)
+
+    offered = np.zeros((len(registration_ids), len(meal_ids)), dtype=bool)
+    rows = rank[np.searchsorted(id_order, menus[:, 0].astype(np.int64))]
+    offered[rows, np.searchsorted(meal_ids, menus[:, 2].astype(np.int64))] = True
+
+    counts = np.zeros((len(registration_ids), len(meal_ids), YEAR_GROUPS), dtype=np.int64)
+    # Choices on a date without a menu row cannot be placed anywhere.
+    known = np.isin(choices[:, 0], id_order)
+    choices = choices[known]
+    np.add.at(
+        counts,
+        (
+            rank[np.searchsorted(id_order, choices[:, 0])],
+            np.searchsorted(meal_ids, choices[:, 1]),
+            np.clip(choices[:, 2], 0, YEAR_GROUPS - 1),
+        ),
+        choices[:, 3],
+    )
+    return Demand(registration_ids, days, meal_ids, offered, counts)
+
+
+def _months(days):
+    return (days - EPOCH).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) % 12
+
+
+def _group_mean(values, groups, size):
+    """Mean of the rows of ``values`` per group, NaN for empty groups."""
+    sums = np.zeros((size,) + values.shape[1:])
+    np.add.at(sums, groups, values)
+    seen = np.bincount(groups, minlength=size).reshape((size,) + (1,) * (values.ndim - 1))
+    return np.divide(sums, seen, out=np.full(sums.shape, np.nan), where=seen > 0)
+
+
+def predict(demand, today):
+    """
+    Forecast the final choices of every registration on or after ``today``.
+
+    Past registrations give three baselines: the diners per year group on
+    each weekday over the last ``BASELINE_WEEKS`` weeks, a month-of-year
+    factor over the whole history, and each meal's share of the diners on
+    the days it was on the menu. The expected diners of an upcoming date
+    are its weekday baseline scaled by its month factor; whatever the
+    orders already placed do not cover is shared out between the meals on
+    its menu, so a forecast never drops below the orders placed.
+    """
+    counts = demand.counts.astype(float)
+    diners = counts.sum(axis=1)
+    weekdays = (demand.days - 1) % 7
+    months = _months(demand.days)
+    past = demand.days < today.toordinal()
+    upcoming = ~past
+
+    # Month factors relative to the average day; months with no history
+    # count as average.
+    daily = diners[past].sum(axis=1)
+    season = np.ones(12)
+    if daily.size and daily.mean() > 0:
+        by_month = _group_mean(daily, months[past], 12)
+        season = np.where(np.isnan(by_month), 1.0, by_month / daily.mean())
+        season = np.where(season > 0, season, 1.0)
+
+    # Weekday baselines of the deseasonalised diners, falling back to the
+    # average weekday where a weekday has no recent history.
+    recent = past & (demand.days >= today.toordinal() - 7 * BASELINE_WEEKS)
+    deseasoned = diners / season[months][:, None]
+    baseline = _group_mean(deseasoned[recent], weekdays[recent], 7)
+    overall = deseasoned[recent].mean(axis=0) if recent.any() else np.zeros(YEAR_GROUPS)
+    baseline = np.where(np.isnan(baseline), overall, baseline)
+    expected = baseline[weekdays[upcoming]] * season[months[upcoming]][:, None]
+
+    # Each meal's share of the diners on the days it was offered.
+    taken = counts[past].sum(axis=0)
+    available = (demand.offered[past][:, :, None] * diners[past][:, None, :]).sum(axis=0)
+    share = np.divide(taken, available, out=np.full(taken.shape, np.nan), where=available > 0)
+
+    offered = demand.offered[upcoming][:, :, None]
+    known = offered & ~np.isnan(share)[None]
+    weights = np.where(known, np.nan_to_num(share)[None], 0.0)
+    # Meals with no history get the average share of the others on the
+    # menu, and a menu with no usable shares is split evenly.
+    n_known = known.sum(axis=1, keepdims=True)
+    average = np.divide(weights.sum(axis=1, keepdims=True), n_known,
+                        out=np.ones(n_known.shape), where=n_known > 0)
+    weights = np.where(offered & ~known, average, weights)
+    total = weights.sum(axis=1, keepdims=True)
+    even = offered / np.maximum(offered.sum(axis=1, keepdims=True), 1)
+    weights = np.where(total > 0, weights / np.where(total > 0, total, 1), even)
+
+    placed = counts[upcoming]
+    missing = np.maximum(expected - placed.sum(axis=1), 0)
+    predicted = placed + missing[:, None, :] * weights
+    return Forecast(
+        demand.registration_ids[upcoming], demand.days[upcoming], demand.meal_ids,
+        demand.offered[upcoming], placed.astype(np.int64), predicted,
+    )
+
+
+def forecast(start, end, today=None, history_days=HISTORY_DAYS):
+    """
+    Forecast the registrations from ``start`` to ``end`` that are still to
+    come, learning from the ``history_days`` before ``today``. Costs three
+    queries however long the range.
+    """
+    today = today or timezone.now().date()
+    demand = load_demand(min(start, today) - timedelta(days=history_days), end)
+    result = predict(demand, today)
+    keep = result.days >= start.toordinal()
+    return result._replace(
+        registration_ids=result.registration_ids[keep], days=result.days[keep],
+        offered=result.offered[keep], placed=result.placed[keep], predicted=result.predicted[keep],
+    )
+
+
+def forecast_rows(result):
+    """
+    One dict per upcoming date and meal on its menu, with the orders placed
+    and the forecast portions rounded up, summed over year groups.
+    """
+    placed = result.placed.sum(axis=2)
+    portions = np.ceil(result.predicted.sum(axis=2) - 1e-9).astype(np.int64)
+    rows, columns = np.nonzero(result.offered)
+    return [
+        {
+            "registration_id": int(result.registration_ids[row]),
+            "date": date.fromordinal(int(result.days[row])),
+            "meal_id": int(result.meal_ids[column]),
+            "ordered": int(placed[row, column]),
+            "forecast": int(portions[row, column]),
+        }
+        for row, column in zip(rows, columns)
+    ]
@@ -1,7 +1,17 @@
+from functools import lru_cache
 from django import forms
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from .models import Parent, Child, MealChoice, Meal, MealRegistration
+from django.db.models import Value
+from django.db.models.functions import Upper
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from .models import Parent, Child, Meal
+from .menus import LOCAL_MENU_ENTRIES, MENU_TIMEOUT
+from .planning import WEEKDAYS, parse_holidays, rotation_from_weeks
+
+FRAGMENT_PREFIX = '__prefix__'
 
 
 class UserParentRegistrationForm(forms.ModelForm):
@@ -61,7 +71,10 @@ class UserParentRegistrationForm(forms.ModelForm):
 
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if email and User.objects.filter(email=email).exists():
+        # Compared the way the Upper("email") index on auth_user is built.
+        if email and User.objects.alias(email_upper=Upper("email")).filter(
+            email_upper=Upper(Value(email))
+        ).exists():
             raise ValidationError('This email address is already registered.')
         return email
 
@@ -128,16 +141,188 @@ class ChildRegistrationForm(forms.ModelForm):
         return year_group
 
 
-class MealChoiceForm(forms.ModelForm):
-    class Meta:
-        model = MealChoice
-        fields = ['meal']
-        widgets = {
-            'meal': forms.RadioSelect(attrs={'autofocus': True})
-        }
+class MenuChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField over a menu that has already been loaded, so rendering
+    and validating the field never goes back to the database.
+    """
+
+    def __init__(self, meals=(), **kwargs):
+        self._meals = list(meals)
+        kwargs.setdefault('queryset', Meal.objects.none())
+        super().__init__(**kwargs)
+
+    def _get_meals(self):
+        return self._meals
+
+    def _set_meals(self, meals):
+        self._meals = list(meals)
+        self.widget.choices = self.choices
+
+    meals = property(_get_meals, _set_meals)
+
+    def _get_choices(self):
+        choices = [] if self.empty_label is None else [('', self.empty_label)]
+        choices.extend(
+            (meal.pk, self.label_from_instance(meal)) for meal in self._meals
+        )
+        return choices
+
+    choices = property(_get_choices, forms.ChoiceField._set_choices)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        key = str(getattr(value, 'pk', value))
+        for meal in self._meals:
+            if str(meal.pk) == key:
+                return meal
+        raise ValidationError(
+            self.error_messages['invalid_choice'],
+            code='invalid_choice',
+            params={'value': value},
+        )
+
+
+class MealChoiceForm(forms.Form):
+    meal = MenuChoiceField(widget=forms.RadioSelect(attrs={'autofocus': True}))
 
     def __init__(self, *args, **kwargs):
+        meals = kwargs.pop('meals', None)
         meal_registration = kwargs.pop('meal_registration', None)
+        self.fragment = kwargs.pop('fragment', None)
         super().__init__(*args, **kwargs)
-        if meal_registration:
-            self.fields['meal'].queryset = meal_registration.meals.all()
+        if meals is None and meal_registration:
+            meals = meal_registration.meals.all()
+        if meals is not None:
+            self.fields['meal'].meals = meals
+
+    def meal_html(self):
+        """The meal radio list, specialised from the menu fragment if there is one."""
+        if self.fragment is None:
+            return self['meal']
+        return self.fragment.render(self.prefix, self['meal'].value())
+
+
+class MenuFragment:
+    """
+    The radio list of one menu, rendered once through the widget templates
+    with a placeholder form prefix and nothing selected. render() then turns
+    it into any child's list with string operations only, producing the
+    same markup as rendering the form field itself.
+    """
+
+    def __init__(self, meals):
+        html = str(MealChoiceForm(meals=meals, prefix=FRAGMENT_PREFIX)['meal'])
+        self.parts = html.split(FRAGMENT_PREFIX)
+
+    def render(self, prefix, value=None):
+        html = prefix.join(self.parts)
+        if value not in (None, ''):
+            marker = f' value="{escape(value)}"'
+            start = html.find(marker)
+            if start != -1:
+                # RadioSelect puts "checked" after the option's other attributes.
+                end = html.index('>', start)
+                html = f'{html[:end]} checked{html[end:]}'
+        return mark_safe(html)
+
+
+def menu_fragment(registration, version):
+    """
+    The MenuFragment for ``registration`` at menu ``version``, from this
+    worker's LRU or the shared cache, so each menu is rendered once per
+    version rather than once per child and request.
+    """
+    return _menu_fragment(registration, version)
+
+
+@lru_cache(maxsize=LOCAL_MENU_ENTRIES)
+def _menu_fragment(registration, version):
+    key = f'meals:menu-fragment:{registration.pk}:{version}'
+    fragment = cache.get(key)
+    if fragment is None:
+        fragment = MenuFragment(registration.meals.all())
+        cache.set(key, fragment, MENU_TIMEOUT)
+    return fragment
+
+
+class OrderExportForm(forms.Form):
+    FORMAT_CHOICES = [('csv', 'CSV'), ('xlsx', 'Excel (.xlsx)')]
+
+    start = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    end = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    year_group = forms.IntegerField(required=False, min_value=0, max_value=13)
+    meal = forms.ModelChoiceField(
+        queryset=Meal.objects.order_by('name'),
+        required=False,
+        empty_label='All meals',
+    )
+    format = forms.ChoiceField(choices=FORMAT_CHOICES, initial='csv')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get('start')
+        end = cleaned_data.get('end')
+        if start and end and end < start:
+            raise ValidationError({'end': 'The end date must not be before the start date.'})
+        return cleaned_data
+
+
+class TermPlanForm(forms.Form):
+    start = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    end = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    holidays = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'rows': 4}),
+        help_text='One date or START..END range (YYYY-MM-DD) per line.',
+    )
+    copy_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        help_text='Copy the menus of the week starting here forward. '
+                  'Leave empty to use the weekly menu below.',
+    )
+    weeks = forms.IntegerField(
+        min_value=1, max_value=8, initial=1,
+        help_text='Length of the copied rotation in weeks.',
+    )
+    mon = forms.ModelMultipleChoiceField(queryset=Meal.objects.order_by('name'), required=False,
+                                         widget=forms.CheckboxSelectMultiple, label='Monday')
+    tue = forms.ModelMultipleChoiceField(queryset=Meal.objects.order_by('name'), required=False,
+                                         widget=forms.CheckboxSelectMultiple, label='Tuesday')
+    wed = forms.ModelMultipleChoiceField(queryset=Meal.objects.order_by('name'), required=False,
+                                         widget=forms.CheckboxSelectMultiple, label='Wednesday')
+    thu = forms.ModelMultipleChoiceField(queryset=Meal.objects.order_by('name'), required=False,
+                                         widget=forms.CheckboxSelectMultiple, label='Thursday')
+    fri = forms.ModelMultipleChoiceField(queryset=Meal.objects.order_by('name'), required=False,
+                                         widget=forms.CheckboxSelectMultiple, label='Friday')
+
+    def clean_holidays(self):
+        try:
+            return parse_holidays(self.cleaned_data['holidays'])
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get('start')
+        end = cleaned_data.get('end')
+        if start and end and end < start:
+            raise ValidationError({'end': 'The end date must not be before the start date.'})
+        if not cleaned_data.get('copy_from') and not any(
+            cleaned_data.get(day) for day in WEEKDAYS
+        ):
+            raise ValidationError('Choose a week to copy or at least one meal for the weekly menu.')
+        return cleaned_data
+
+    def rotation(self):
+        """The weekly rotation described by the cleaned form."""
+        data = self.cleaned_data
+        if data['copy_from']:
+            return rotation_from_weeks(data['copy_from'], data['weeks'])
+        return [{
+            weekday: [meal.id for meal in data[day]]
+            for weekday, day in enumerate(WEEKDAYS)
+            if data[day]
+        }]
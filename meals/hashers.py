@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with ``PASSWORD_HASH_COST`` iterations, or Django's default."""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_COST or hashers.PBKDF2PasswordHasher.iterations
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """scrypt with a work factor of ``PASSWORD_HASH_COST``, or Django's default."""
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_HASH_COST or hashers.ScryptPasswordHasher.work_factor
+
+
+def hashers_for(algorithm):
+    """``PASSWORD_HASHERS`` with ``algorithm`` first, so it hashes new passwords."""
+    preferred = settings.PASSWORD_HASH_ALGORITHMS[algorithm]
+    return [preferred] + [path for path in settings.PASSWORD_HASH_ALGORITHMS.values() if path != preferred]
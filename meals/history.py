@@ -0,0 +1,118 @@
+from datetime import datetime
+from django.db.models import F, IntegerField, Q, Value
+from .models import ArchivedMealChoice, Child, Meal, MealChoice, MealRegistration
+
+PAGE_SIZE = 50
+
+UPCOMING = "upcoming"
+PAST = "past"
+
+
+def parse_cursor(cursor):
+    """Turn a ``YYYY-MM-DD.<id>`` cursor back into ``(date, id)``, or None."""
+    if not cursor:
+        return None
+    try:
+        date_str, choice_id = cursor.split(".", 1)
+        return datetime.strptime(date_str, "%Y-%m-%d").date(), int(choice_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def make_cursor(choice):
+    return f"{choice.meal_registration.date.isoformat()}.{choice.id}"
+
+
+HISTORY_FIELDS = ("id", "child_id", "child__first_name", "child__last_name", "meal_id", "meal__name")
+
+
+def _past_choices(parent, today, position):
+    """
+    Past choices from the hot table and the archive, as one UNION ALL query
+    of ``(date, *HISTORY_FIELDS, registration id)`` rows, newest first.
+    """
+    hot = MealChoice.objects.filter(child__parent=parent, meal_registration__date__lt=today)
+    archived = ArchivedMealChoice.objects.filter(child__parent=parent, date__lt=today)
+    if position:
+        date, choice_id = position
+        hot = hot.filter(
+            Q(meal_registration__date__lt=date)
+            | Q(meal_registration__date=date, id__lt=choice_id)
+        )
+        archived = archived.filter(Q(date__lt=date) | Q(date=date, id__lt=choice_id))
+    # Archived rows keep the date but not the registration. Annotations are
+    # selected after fields, so the registration goes last on both sides.
+    hot = hot.annotate(registration_id=F("meal_registration_id"))
+    archived = archived.annotate(registration_id=Value(None, output_field=IntegerField()))
+    return (
+        hot.values_list("meal_registration__date", *HISTORY_FIELDS, "registration_id")
+        .union(archived.values_list("date", *HISTORY_FIELDS, "registration_id"), all=True)
+        .order_by("-meal_registration__date", "-id")
+    )
+
+
+def _past_choice(row):
+    """A read-only MealChoice built from a ``_past_choices()`` row."""
+    date, choice_id, child_id, first_name, last_name, meal_id, meal_name, registration_id = row
+    return MealChoice(
+        id=choice_id,
+        child=Child(id=child_id, first_name=first_name, last_name=last_name),
+        meal=Meal(id=meal_id, name=meal_name),
+        meal_registration=MealRegistration(id=registration_id, date=date),
+    )
+
+
+def _upcoming_choices(parent, today, position):
+    choices = (
+        MealChoice.objects.filter(child__parent=parent, meal_registration__date__gte=today)
+        .select_related("meal_registration", "meal", "child")
+        .order_by("meal_registration__date", "id")
+    )
+    if position:
+        date, choice_id = position
+        choices = choices.filter(
+            Q(meal_registration__date__gt=date)
+            | Q(meal_registration__date=date, id__gt=choice_id)
+        )
+    return choices
+
+
+def _history_choices(parent, today, view, cursor, page_size):
+    position = parse_cursor(cursor)
+    if view == PAST:
+        return _past_choices(parent, today, position)[: page_size + 1], _past_choice
+    return _upcoming_choices(parent, today, position)[: page_size + 1], None
+
+
+def _split_page(page, page_size):
+    if len(page) > page_size:
+        page = page[:page_size]
+        return page, make_cursor(page[-1])
+    return page, None
+
+
+def history_page(parent, today, view=UPCOMING, cursor=None, page_size=PAGE_SIZE):
+    """
+    Return ``(choices, next_cursor)`` for one page of a parent's meal history.
+
+    Upcoming choices run forwards from ``today`` and past ones backwards from
+    yesterday, both keyed on ``(meal_registration__date, id)`` so every page
+    is an index range scan. Past pages read the hot table and the archive
+    in the same query and come back as read-only MealChoice instances. One
+    extra row is fetched to tell whether another page exists;
+    ``next_cursor`` is None on the last page.
+    """
+    choices, build = _history_choices(parent, today, view, cursor, page_size)
+    page = list(choices)
+    if build:
+        page = [build(row) for row in page]
+    return _split_page(page, page_size)
+
+
+async def ahistory_page(parent, today, view=UPCOMING, cursor=None, page_size=PAGE_SIZE):
+    """Async version of history_page(), with the same single query."""
+    choices, build = _history_choices(parent, today, view, cursor, page_size)
+    page = [choice async for choice in choices]
+    if build:
+        page = [build(row) for row in page]
+    return _split_page(page, page_size)
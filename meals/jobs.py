@@ -0,0 +1,172 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Job
+
+logger = logging.getLogger("meals")
+
+LEASE = timedelta(minutes=10)
+BACKOFF = timedelta(seconds=30)
+MAX_BACKOFF = timedelta(hours=1)
+THREADS = 4
+
+
+def job(func=None, *, on_failure=None):
+    """
+    Mark ``func`` as a job, so ``enqueue`` accepts it and the worker runs
+    it. ``on_failure`` is called with the job's arguments once the job has
+    failed for the last time.
+    """
+    def mark(func):
+        func.queued_job = True
+        func.on_failure = on_failure
+        return func
+    return mark if func is None else mark(func)
+
+
+def enqueue(func, *args, run_at=None, max_attempts=5, **kwargs):
+    """
+    Queue ``func(*args, **kwargs)`` for the worker and return the Job.
+    Arguments must be JSON-serialisable. The row is written in the
+    caller's transaction, so a job queued by a request that rolls back is
+    never run.
+    """
+    if not getattr(func, "queued_job", False):
+        raise ValueError(f"{func.__qualname__} is not a job.")
+    return Job.objects.create(
+        name=f"{func.__module__}.{func.__qualname__}",
+        args=list(args),
+        kwargs=kwargs,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+    )
+
+
+def backoff(attempts):
+    """Delay before retrying a job that has failed ``attempts`` times."""
+    return min(BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+
+
+def claim_jobs(limit, now=None):
+    """
+    Lease up to ``limit`` jobs that are due, or whose worker stopped
+    holding them, oldest first. On PostgreSQL the rows are picked with
+    ``SELECT ... FOR UPDATE SKIP LOCKED``, so workers polling together
+    take different jobs without waiting on each other; elsewhere each job
+    is taken with a conditional UPDATE that only one worker can win.
+    """
+    now = now or timezone.now()
+    expired = Q(status=Job.RUNNING, locked_until__lt=now)
+    for stale in Job.objects.filter(expired, attempts__gte=F("max_attempts")):
+        if Job.objects.filter(expired, pk=stale.pk).update(
+            status=Job.FAILED, locked_until=None, finished_at=now, updated_at=now,
+            last_error="The worker stopped before finishing, too many times.",
+        ):
+            _gave_up(stale)
+    ready = Q(status=Job.QUEUED, run_at__lte=now) | expired
+    lease = {
+        "status": Job.RUNNING, "locked_until": now + LEASE,
+        "attempts": F("attempts") + 1, "updated_at": now,
+    }
+    due = Job.objects.filter(ready).order_by("run_at", "id").values_list("id", flat=True)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True)[:limit])
+            Job.objects.filter(id__in=ids).update(**lease)
+    else:
+        ids = [job_id for job_id in due[:limit] if Job.objects.filter(ready, pk=job_id).update(**lease)]
+    return list(Job.objects.filter(id__in=ids).order_by("run_at", "id"))
+
+
+def _gave_up(job):
+    """Call the job's ``on_failure``, if it has one; its errors are only logged."""
+    try:
+        on_failure = getattr(import_string(job.name), "on_failure", None)
+        if on_failure is not None:
+            on_failure(*job.args, **job.kwargs)
+    except Exception as e:
+        logger.error(f"on_failure of job {job.id} {job.name} failed: {str(e)}")
+
+
+def run_job(job):
+    """
+    Run a claimed job and record the outcome. A job that raises is queued
+    again after ``backoff`` until it has used ``max_attempts``, and then
+    its ``on_failure`` is called.
+    """
+    try:
+        func = import_string(job.name)
+        if not getattr(func, "queued_job", False):
+            raise ValueError(f"{job.name} is not a job.")
+        func(*job.args, **job.kwargs)
+    except Exception as e:
+        logger.error(f"Job {job.id} {job.name} failed (attempt {job.attempts}): {str(e)}")
+        now = timezone.now()
+        job.last_error = str(e)
+        job.locked_until = None
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            job.finished_at = now
+        else:
+            job.status = Job.QUEUED
+            job.run_at = now + backoff(job.attempts)
+        job.save(update_fields=["last_error", "locked_until", "status", "finished_at", "run_at", "updated_at"])
+        if job.status == Job.FAILED:
+            _gave_up(job)
+        return job
+    job.status = Job.DONE
+    job.locked_until = None
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "locked_until", "finished_at", "updated_at"])
+    return job
+
+
+def _run_in_thread(job):
+    try:
+        return run_job(job)
+    finally:
+        # Each pool thread has its own connection; don't leave it open.
+        connection.close()
+
+
+def work(threads=THREADS, interval=1.0, once=False):
+    """
+    Run jobs as they fall due, up to ``threads`` at a time, polling every
+    ``interval`` seconds while idle. With ``once`` it returns when nothing
+    is due and nothing is running. One thread runs jobs in the calling
+    thread. Returns the number of jobs run.
+    """
+    finished = 0
+    if threads <= 1:
+        while True:
+            claimed = claim_jobs(1)
+            if claimed:
+                run_job(claimed[0])
+                finished += 1
+            elif once:
+                return finished
+            else:
+                time.sleep(interval)
+
+    running = set()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        while True:
+            done = {future for future in running if future.done()}
+            finished += len(done)
+            running -= done
+            claimed = claim_jobs(threads - len(running)) if len(running) < threads else []
+            running.update(pool.submit(_run_in_thread, job) for job in claimed)
+            if claimed:
+                continue
+            if not running:
+                if once:
+                    return finished
+                time.sleep(interval)
+            else:
+                wait(running, timeout=interval, return_when=FIRST_COMPLETED)
@@ -0,0 +1,226 @@
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+import requests
+from .benchmarks import summarize
+
+# ``data`` is None, a dict of form fields, or a callable taking the username
+# and returning one, for steps whose payload differs per parent.
+Step = namedtuple("Step", ["name", "method", "path", "data"])
+
+
+def send(session, url, method="GET", data=None, timeout=30):
+    """
+    Send one request on a ``requests.Session`` without following
+    redirects. POSTs carry the CSRF cookie as ``csrfmiddlewaretoken``.
+    """
+    if method == "POST":
+        data = dict(data or {})
+        token = session.cookies.get("csrftoken")
+        if token:
+            data.setdefault("csrfmiddlewaretoken", token)
+    return session.request(method, url, data=data, timeout=timeout, allow_redirects=False)
+
+
+class LoadStats:
+    """Latencies per step, response statuses and failures for one run, shared by the user threads."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.outcomes = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, name, latency_ms, status):
+        with self._lock:
+            self.latencies[name].append(latency_ms)
+            self.statuses[str(status)] += 1
+            if status >= 400:
+                self.errors[f"{name}:{status}"] += 1
+
+    def fail(self, name, error):
+        self.reject(name, type(error).__name__)
+
+    def reject(self, name, reason):
+        with self._lock:
+            self.errors[f"{name}:{reason}"] += 1
+
+    def outcome(self, outcome):
+        with self._lock:
+            self.outcomes[outcome] += 1
+
+    def summary(self, elapsed):
+        every = [latency for latencies in self.latencies.values() for latency in latencies]
+        summary = summarize(every)
+        summary.update(
+            elapsed_s=round(elapsed, 3),
+            rps=round(len(every) / elapsed, 2) if elapsed else 0.0,
+            errors=dict(self.errors),
+            statuses=dict(self.statuses),
+            steps={name: summarize(latencies) for name, latencies in self.latencies.items()},
+        )
+        return summary
+
+
+def _login(session, base_url, username, password, login_path, stats, timeout):
+    try:
+        send(session, base_url + login_path, timeout=timeout)
+        response = send(
+            session, base_url + login_path, "POST",
+            {"username": username, "password": password}, timeout=timeout,
+        )
+    except requests.RequestException as error:
+        stats.fail("login", error)
+        return False
+    if response.status_code != 302:
+        stats.reject("login", response.status_code)
+        return False
+    return True
+
+
+def _run_steps(session, base_url, username, steps, stats, deadline, rounds, timeout):
+    done = 0
+    while (rounds is None or done < rounds) and (deadline is None or time.perf_counter() < deadline):
+        for step in steps:
+            data = step.data(username) if callable(step.data) else step.data
+            started = time.perf_counter()
+            try:
+                response = send(session, base_url + step.path, step.method, data, timeout=timeout)
+            except requests.RequestException as error:
+                stats.fail(step.name, error)
+                continue
+            stats.record(step.name, (time.perf_counter() - started) * 1000, response.status_code)
+        done += 1
+
+
+def _in_threads(func, *iterables):
+    """Run ``func`` over ``iterables`` with one thread per call, the way ``map`` would."""
+    calls = list(zip(*iterables))
+    with ThreadPoolExecutor(max_workers=max(len(calls), 1)) as pool:
+        return list(pool.map(lambda args: func(*args), calls))
+
+
+def run_load(base_url, credentials, steps, concurrency, duration=None, rounds=None,
+             login_path="/meals/login/", timeout=30):
+    """
+    Drive ``concurrency`` virtual parents against a running server at
+    ``base_url`` and return a summary with requests per second, latency
+    percentiles overall and per step, statuses and errors.
+
+    Each virtual parent is a thread with its own ``requests.Session``, so
+    it keeps its cookies and a keep-alive connection. ``credentials`` is a
+    list of ``(username, password)`` pairs handed out round-robin. After
+    logging in, each virtual parent runs ``steps`` in a loop until
+    ``duration`` seconds have passed or for ``rounds`` rounds.
+    """
+    if duration is None and rounds is None:
+        raise ValueError("Pass a duration, a number of rounds, or both.")
+    stats = LoadStats()
+    users = [credentials[n % len(credentials)] for n in range(concurrency)]
+    sessions = [requests.Session() for _ in users]
+    try:
+        # Log everybody in first so the timed phase starts with every
+        # virtual parent ready, like a rush at an ordering deadline.
+        logged_in = _in_threads(
+            lambda session, user: _login(session, base_url, *user, login_path, stats, timeout),
+            sessions, users,
+        )
+        started = time.perf_counter()
+        deadline = started + duration if duration else None
+        _in_threads(
+            lambda session, user: _run_steps(
+                session, base_url, user[0], steps, stats, deadline, rounds, timeout
+            ),
+            [session for session, ok in zip(sessions, logged_in) if ok],
+            [user for user, ok in zip(users, logged_in) if ok],
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        for session in sessions:
+            session.close()
+    summary = stats.summary(elapsed)
+    summary["concurrency"] = concurrency
+    summary["logged_in"] = sum(logged_in)
+    return summary
+
+
+# One family in a deadline rush: who logs in, and the form fields their
+# order POST sends.
+Family = namedtuple("Family", ["username", "password", "data"])
+
+# What an order POST came back as. The ordering view redirects on success,
+# re-renders the form with 409 or 503 when saving fails and with 200 when
+# the form is rejected.
+ORDERED = "ordered"
+INTEGRITY_ERROR = "integrity_error"
+SAVE_ERROR = "save_error"
+SERVER_ERROR = "server_error"
+REJECTED = "rejected"
+
+OUTCOMES = {302: ORDERED, 409: INTEGRITY_ERROR, 503: SAVE_ERROR, 200: REJECTED}
+
+
+def order_outcome(status):
+    return OUTCOMES.get(status, SERVER_ERROR if status >= 500 else REJECTED)
+
+
+def _rush_family(session, base_url, family, order_path, stats, timeout):
+    response = None
+    for name, method, data in (("order_page", "GET", None), ("order_post", "POST", family.data)):
+        started = time.perf_counter()
+        try:
+            response = send(session, base_url + order_path, method, data, timeout=timeout)
+        except requests.RequestException as error:
+            stats.fail(name, error)
+            if method == "POST":
+                stats.outcome(type(error).__name__)
+            return
+        stats.record(name, (time.perf_counter() - started) * 1000, response.status_code)
+    stats.outcome(order_outcome(response.status_code))
+    if response.status_code != 302:
+        return
+    started = time.perf_counter()
+    try:
+        next_date = send(session, urljoin(response.url, response.headers["Location"]), timeout=timeout)
+    except requests.RequestException as error:
+        stats.fail("next_date", error)
+        return
+    stats.record("next_date", (time.perf_counter() - started) * 1000, next_date.status_code)
+
+
+def run_rush(base_url, families, order_path, login_path="/meals/login/", timeout=30):
+    """
+    Simulate the rush before an ordering deadline against a running server
+    at ``base_url``: every family logs in, then all of them at once open
+    ``order_path``, POST their order and follow the redirect to the next
+    date, one thread per family. Returns the ``run_load`` summary plus the
+    outcome of every order POST and the orders saved per second.
+    """
+    stats = LoadStats()
+    sessions = [requests.Session() for _ in families]
+    try:
+        logged_in = _in_threads(
+            lambda session, family: _login(
+                session, base_url, family.username, family.password, login_path, stats, timeout
+            ),
+            sessions, families,
+        )
+        started = time.perf_counter()
+        _in_threads(
+            lambda session, family: _rush_family(session, base_url, family, order_path, stats, timeout),
+            [session for session, ok in zip(sessions, logged_in) if ok],
+            [family for family, ok in zip(families, logged_in) if ok],
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        for session in sessions:
+            session.close()
+    summary = stats.summary(elapsed)
+    summary["families"] = len(families)
+    summary["logged_in"] = sum(logged_in)
+    summary["outcomes"] = dict(stats.outcomes)
+    summary["orders_per_second"] = round(stats.outcomes[ORDERED] / elapsed, 2) if elapsed else 0.0
+    return summary
@@ -0,0 +1,49 @@
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from meals.archive import BATCH_SIZE, archive_choices, archive_cutoff, registrations_to_archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move meal choices for past dates into the archive, writing per "
+        "day/meal/year-group rollups first, so the hot table only holds the "
+        "current term. Archived choices stay visible in the parents' history, "
+        "the order reports, the exports and the forecasts."
+    )
+
+    def add_arguments(self, parser):
+        cutoff = parser.add_mutually_exclusive_group()
+        cutoff.add_argument("--before", help="Archive dates before this one (YYYY-MM-DD).")
+        cutoff.add_argument("--days", type=int,
+                            help="Archive dates more than this many days ago "
+                                 "(default: MEALS_ARCHIVE_AFTER_DAYS).")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                            help="Registrations archived per transaction.")
+        parser.add_argument("--dry-run", action="store_true", help="Only report the dates to archive.")
+
+    def handle(self, *args, **options):
+        if options["before"]:
+            try:
+                cutoff = datetime.strptime(options["before"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--before must be in YYYY-MM-DD format.")
+        else:
+            if options["days"] is not None and options["days"] < 0:
+                raise CommandError("--days must not be negative.")
+            cutoff = archive_cutoff(days=options["days"])
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        if options["dry_run"]:
+            count = len(registrations_to_archive(cutoff))
+            self.stdout.write(f"Would archive {count} dates before {cutoff}.")
+            return
+
+        started = time.perf_counter()
+        result = archive_choices(cutoff, batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {result['choices']} choices from {result['dates']} dates before {cutoff} "
+            f"into {result['rollups']} rollup rows in {elapsed:.2f}s."
+        ))
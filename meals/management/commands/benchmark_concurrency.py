@@ -0,0 +1,93 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from meals.benchmarks import results_document, write_results
+from meals.loadtest import Step, run_load
+from meals.seeding import SEED_PASSWORD
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive concurrent virtual parents (login, then the ordering and history "
+        "pages in a loop) against running servers and report requests per second "
+        "and latency percentiles. To compare WSGI with ASGI, serve meals_project.wsgi "
+        "and meals_project.asgi:application (uvicorn worker) on two ports against "
+        "the same seeded database and pass --target wsgi=URL --target asgi=URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", action="append", required=True,
+                            help="NAME=URL of a running server; repeat to compare setups. "
+                                 "Plain http:// servers need DEVELOPMENT set, as secure "
+                                 "cookies are only sent back over https.")
+        parser.add_argument("--concurrency", default="50,100,200",
+                            help="Comma-separated numbers of concurrent parents.")
+        parser.add_argument("--duration", type=float, default=10.0,
+                            help="Seconds of load per target and concurrency.")
+        parser.add_argument("--rounds", type=int,
+                            help="Stop each parent after this many rounds instead of a duration.")
+        parser.add_argument("--prefix", default="seed", help="Username prefix used by seed_school.")
+        parser.add_argument("--password", default=SEED_PASSWORD)
+        parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+
+    def parse_targets(self, targets):
+        parsed = {}
+        for target in targets:
+            name, sep, url = target.partition("=")
+            if not sep or not name or not url:
+                raise CommandError(f"Targets look like NAME=URL, not {target!r}.")
+            parsed[name] = url.rstrip("/")
+        return parsed
+
+    def handle(self, *args, **options):
+        targets = self.parse_targets(options["target"])
+        try:
+            levels = [int(level) for level in options["concurrency"].split(",") if level.strip()]
+        except ValueError:
+            raise CommandError("--concurrency takes comma-separated integers.")
+        if not levels or min(levels) < 1:
+            raise CommandError("--concurrency needs at least one positive level.")
+
+        usernames = list(
+            User.objects.filter(username__startswith=f"{options['prefix']}-parent-")
+            .order_by("id").values_list("username", flat=True)[:max(levels)]
+        )
+        if not usernames:
+            raise CommandError(f"No '{options['prefix']}-parent-*' users; run seed_school first.")
+        credentials = [(username, options["password"]) for username in usernames]
+        steps = [
+            Step("meal_ordering", "GET", reverse("meal_ordering"), None),
+            Step("meal_choice_history", "GET", reverse("meal_choice_history"), None),
+        ]
+        duration = None if options["rounds"] else options["duration"]
+
+        results = {}
+        for name, url in targets.items():
+            for level in levels:
+                summary = run_load(
+                    url, credentials, steps, level, duration=duration,
+                    rounds=options["rounds"], login_path=reverse("login"),
+                    timeout=options["timeout"],
+                )
+                results[f"{name}:{level}"] = summary
+                errors = sum(summary["errors"].values())
+                self.stdout.write(
+                    f"{name:10} {level:4} parents  {summary['rps']:8.1f} req/s  "
+                    f"p50 {summary['p50_ms']:8.2f} ms  p95 {summary['p95_ms']:8.2f} ms  "
+                    f"p99 {summary['p99_ms']:8.2f} ms  {errors} errors"
+                )
+
+        baseline = next(iter(targets))
+        for name in list(targets)[1:]:
+            for level in levels:
+                before = results[f"{baseline}:{level}"]["rps"]
+                after = results[f"{name}:{level}"]["rps"]
+                if before:
+                    self.stdout.write(f"{name} vs {baseline} at {level} parents: {after / before:.2f}x req/s")
+
+        if options["output"]:
+            write_results(options["output"], results_document(
+                results, targets=targets, parents=len(usernames)
+            ))
+            self.stdout.write(f"Wrote {options['output']}")
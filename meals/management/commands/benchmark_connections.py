@@ -0,0 +1,143 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from meals.backends import CONNECTION_MODES
+from meals.benchmarks import results_document, summarize, write_results
+from meals.models import Parent
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure database connect overhead per request under each DB_CONNECTIONS "
+        "mode. Every mode runs in its own process against DATABASE_URL, e.g. a "
+        "local PostgreSQL standing in for the production database; --connect-delay "
+        "adds the network and TLS cost a remote server would charge per connect."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modes", default=",".join(CONNECTION_MODES),
+                            help="Comma-separated DB_CONNECTIONS values to compare.")
+        parser.add_argument("--requests", type=int, default=100, help="Requests per mode.")
+        parser.add_argument("--connect-delay", type=float, default=0.0,
+                            help="Milliseconds added to every new database connection.")
+        parser.add_argument("--fresh-threads", action="store_true",
+                            help="Serve every request from a new thread, as Django does under ASGI.")
+        parser.add_argument("--username", default="seed-parent-0")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument("--worker", action="store_true",
+                            help="Measure the current settings only and print JSON (used per mode).")
+
+    def handle(self, *args, **options):
+        if options["worker"]:
+            result = self.measure(
+                options["username"], options["requests"], options["connect_delay"],
+                options["fresh_threads"],
+            )
+            self.stdout.write(json.dumps(result))
+            return
+
+        if not os.environ.get("DATABASE_URL"):
+            raise CommandError(
+                "Set DATABASE_URL to the database to measure, e.g. "
+                "postgres://localhost/meals; connection modes only apply to it."
+            )
+        modes = [mode.strip() for mode in options["modes"].split(",") if mode.strip()]
+        unknown = set(modes) - set(CONNECTION_MODES)
+        if unknown:
+            raise CommandError(f"Unknown connection modes: {', '.join(sorted(unknown))}")
+
+        results = {}
+        for mode in modes:
+            command = [
+                sys.executable, str(settings.BASE_DIR / "manage.py"), "benchmark_connections",
+                "--worker", "--requests", str(options["requests"]),
+                "--connect-delay", str(options["connect_delay"]),
+                "--username", options["username"],
+            ]
+            if options["fresh_threads"]:
+                command.append("--fresh-threads")
+            run = subprocess.run(
+                command, env={**os.environ, "DB_CONNECTIONS": mode},
+                capture_output=True, text=True,
+            )
+            if run.returncode:
+                raise CommandError(f"{mode} failed:\n{run.stderr}")
+            results[mode] = summary = json.loads(run.stdout.strip().splitlines()[-1])
+            self.stdout.write(
+                f"{mode:12} {summary['engine']:28} p50 {summary['p50_ms']:8.2f} ms  "
+                f"p95 {summary['p95_ms']:8.2f} ms  {summary['connects_per_request']:5.2f} connects  "
+                f"{summary['connect_ms_per_request']:7.2f} ms connecting per request"
+            )
+
+        if options["output"]:
+            write_results(options["output"], results_document(
+                results, requests=options["requests"], connect_delay_ms=options["connect_delay"],
+                fresh_threads=options["fresh_threads"],
+            ))
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def measure(self, username, count, connect_delay, fresh_threads):
+        parent = Parent.objects.select_related("user").filter(user__username=username).first()
+        if parent is None:
+            raise CommandError(f"No parent '{username}'; run seed_school first or pass --username.")
+        client = Client()
+        client.force_login(parent.user)
+        urls = [reverse("meal_ordering"), reverse("meal_choice_history")]
+
+        # Time every physical connect, whichever backend or pool opens it.
+        Database = connection.Database
+        real_connect = Database.connect
+        connects = []
+
+        def timed_connect(*args, **kwargs):
+            started = time.perf_counter()
+            if connect_delay:
+                time.sleep(connect_delay / 1000)
+            try:
+                return real_connect(*args, **kwargs)
+            finally:
+                connects.append((time.perf_counter() - started) * 1000)
+
+        def one_request(url):
+            # The test client skips the connection housekeeping that the
+            # request_started and request_finished signals do in a real server.
+            close_old_connections()
+            client.get(url)
+            close_old_connections()
+
+        close_old_connections()
+        latencies = []
+        Database.connect = timed_connect
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                for n in range(count):
+                    url = urls[n % len(urls)]
+                    started = time.perf_counter()
+                    if fresh_threads:
+                        thread = threading.Thread(target=one_request, args=(url,))
+                        thread.start()
+                        thread.join()
+                    else:
+                        one_request(url)
+                    latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            Database.connect = real_connect
+
+        summary = summarize(latencies)
+        summary.update(
+            engine=connection.settings_dict["ENGINE"],
+            conn_max_age=connection.settings_dict["CONN_MAX_AGE"],
+            connects=len(connects),
+            connects_per_request=round(len(connects) / count, 3) if count else 0.0,
+            connect_ms_per_request=round(sum(connects) / count, 3) if count else 0.0,
+        )
+        return summary
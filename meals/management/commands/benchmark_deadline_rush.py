@@ -0,0 +1,129 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from django.urls import reverse
+from django.utils import timezone
+from meals.benchmarks import results_document, write_results
+from meals.contention import LockWaitSampler, order_integrity
+from meals.loadtest import INTEGRITY_ERROR, ORDERED, Family, run_rush
+from meals.models import Child, MealChoice, MealRegistration, Parent
+from meals.seeding import SEED_PASSWORD
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate the rush before the ordering deadline against a running server: "
+        "every seeded family logs in, then all of them at once open the ordering "
+        "page for one date, POST an order for each child and follow the redirect "
+        "to the next date. Reports orders per second, latency percentiles, lock "
+        "waits (PostgreSQL), save errors and duplicate or missing MealChoice rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", required=True,
+                            help="URL of a running server. Plain http:// servers need DEVELOPMENT "
+                                 "set, as secure cookies are only sent back over https.")
+        parser.add_argument("--families", type=int, default=200, help="Concurrent families.")
+        parser.add_argument("--date", help="Date to order for, YYYY-MM-DD; defaults to the next menu.")
+        parser.add_argument("--fresh", action="store_true",
+                            help="Delete the families' choices for the date first, so every order is new.")
+        parser.add_argument("--strict", action="store_true",
+                            help="Fail if any order is not saved exactly once.")
+        parser.add_argument("--prefix", default="seed", help="Username prefix used by seed_school.")
+        parser.add_argument("--password", default=SEED_PASSWORD)
+        parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+
+    def registration(self, value):
+        registrations = MealRegistration.objects.prefetch_related("meals")
+        if value:
+            try:
+                day = datetime.strptime(value, "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--date must be in YYYY-MM-DD format.")
+            registration = registrations.filter(date=day).first()
+        else:
+            registration = registrations.filter(date__gt=timezone.now().date()).order_by("date").first()
+        if registration is None or not registration.meals.all():
+            raise CommandError("No menu to order from; pass --date or run seed_school first.")
+        return registration
+
+    def families(self, registration, options):
+        parents = (
+            Parent.objects.filter(user__username__startswith=f"{options['prefix']}-parent-")
+            .filter(children__isnull=False).distinct()
+            .select_related("user")
+            .prefetch_related(Prefetch("children", queryset=Child.objects.order_by("id")))
+            .order_by("id")[:options["families"]]
+        )
+        meals = list(registration.meals.all())
+        families = []
+        for parent in parents:
+            # Spread the orders over the menu, so they contend on every
+            # meal's total rather than queue on one.
+            data = {f"{child.id}-meal": meals[child.id % len(meals)].id for child in parent.children.all()}
+            families.append(Family(parent.user.username, options["password"], data))
+        if not families:
+            raise CommandError(f"No '{options['prefix']}-parent-*' users with children; run seed_school first.")
+        return families
+
+    def handle(self, *args, **options):
+        if options["families"] < 1:
+            raise CommandError("--families must be at least 1.")
+        registration = self.registration(options["date"])
+        families = self.families(registration, options)
+        child_ids = [int(field.split("-")[0]) for family in families for field in family.data]
+        if options["fresh"]:
+            MealChoice.objects.filter(meal_registration=registration, child_id__in=child_ids).delete()
+
+        order_path = f"{reverse('meal_ordering')}?date={registration.date}"
+        with LockWaitSampler() as sampler:
+            summary = run_rush(
+                options["target"].rstrip("/"), families, order_path,
+                login_path=reverse("login"), timeout=options["timeout"],
+            )
+        summary["lock_waits"] = sampler.summary()
+        summary.update(order_integrity(registration.id, child_ids))
+
+        outcomes = summary["outcomes"]
+        steps = summary["steps"]
+        self.stdout.write(
+            f"{summary['logged_in']}/{len(families)} families logged in, "
+            f"{outcomes.get(ORDERED, 0)} orders saved in {summary['elapsed_s']:.2f} s "
+            f"({summary['orders_per_second']:.1f} orders/s)"
+        )
+        for name in ("order_page", "order_post", "next_date"):
+            if name in steps:
+                step = steps[name]
+                self.stdout.write(
+                    f"{name:11} p50 {step['p50_ms']:8.2f} ms  p95 {step['p95_ms']:8.2f} ms  "
+                    f"p99 {step['p99_ms']:8.2f} ms"
+                )
+        self.stdout.write(f"Outcomes: {outcomes}  errors: {summary['errors']}")
+        lock_waits = summary["lock_waits"]
+        self.stdout.write(
+            "Lock waits: not sampled on this database" if lock_waits is None else
+            f"Lock waits: up to {lock_waits['max_waiting']} sessions, waiting in "
+            f"{lock_waits['waiting_samples']}/{lock_waits['samples']} samples, "
+            f"{lock_waits['deadlocks']} deadlocks"
+        )
+        self.stdout.write(
+            f"IntegrityErrors: {outcomes.get(INTEGRITY_ERROR, 0)}  "
+            f"duplicate choices: {summary['duplicate_choices']}  "
+            f"missing choices: {summary['missing_choices']}  "
+            f"total mismatches: {summary['total_mismatches']}"
+        )
+
+        if options["output"]:
+            write_results(options["output"], results_document(
+                {"deadline_rush": summary}, target=options["target"], date=str(registration.date),
+            ))
+            self.stdout.write(f"Wrote {options['output']}")
+
+        if options["strict"]:
+            problems = (
+                len(families) - outcomes.get(ORDERED, 0) + summary["duplicate_choices"]
+                + summary["missing_choices"] + summary["total_mismatches"]
+            )
+            if problems:
+                raise CommandError("Not every family's order was saved exactly once.")
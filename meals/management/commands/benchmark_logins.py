@@ -0,0 +1,98 @@
+import os
+import secrets
+import time
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from meals.benchmarks import results_document, summarize, write_results
+from meals.hashers import hashers_for
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure logins per second per core under one or more password "
+        "hashing policies, given as ALGORITHM[:COST]. Logs in as a throwaway "
+        "user that is deleted afterwards, so no real password is rehashed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--policies",
+            default=f"{settings.PASSWORD_HASH_ALGORITHM}:{settings.PASSWORD_HASH_COST}",
+            help="Comma-separated ALGORITHM[:COST] policies, e.g. pbkdf2_sha256:600000,scrypt:16384.",
+        )
+        parser.add_argument("--iterations", type=int, default=20, help="Logins per policy.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+
+    def policies(self, value):
+        policies = []
+        for policy in value.split(","):
+            algorithm, _, cost = policy.strip().partition(":")
+            if algorithm not in settings.PASSWORD_HASH_ALGORITHMS:
+                raise CommandError(
+                    f"Unknown algorithm '{algorithm}'; use one of {', '.join(settings.PASSWORD_HASH_ALGORITHMS)}."
+                )
+            try:
+                policies.append((algorithm, int(cost or 0)))
+            except ValueError:
+                raise CommandError(f"Cost must be a number in '{policy}'.")
+        return policies
+
+    def handle(self, *args, **options):
+        policies = self.policies(options["policies"])
+        username = f"benchmark-logins-{secrets.token_hex(4)}"
+        password = secrets.token_urlsafe()
+        user = User.objects.create_user(username=username, password=password)
+        try:
+            results = self.measure(policies, username, password, options["iterations"])
+        finally:
+            user.delete()
+
+        if options["output"]:
+            write_results(options["output"], results_document(
+                results, iterations=options["iterations"], cpus=os.cpu_count()
+            ))
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def measure(self, policies, username, password, iterations):
+        results = {}
+        for algorithm, cost in policies:
+            with override_settings(
+                PASSWORD_HASHERS=hashers_for(algorithm),
+                PASSWORD_HASH_COST=cost,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            ):
+                # The first login rehashes the stored password under this policy.
+                if not Client().login(username=username, password=password):
+                    raise CommandError(f"Could not log in as '{username}'.")
+                encoded = User.objects.get(username=username).password
+
+                hash_ms = []
+                latencies = []
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    check_password(password, encoded)
+                    hash_ms.append((time.perf_counter() - started) * 1000)
+
+                    client = Client()
+                    started = time.perf_counter()
+                    response = client.post(reverse("login"), {"username": username, "password": password})
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    if response.status_code != 302:
+                        raise CommandError(f"Login returned {response.status_code}.")
+
+            name = f"{algorithm}:{cost or 'default'}"
+            summary = summarize(latencies)
+            summary["hash_ms"] = summarize(hash_ms)["mean_ms"]
+            # One request is served by one core, so this is the per-core rate.
+            summary["logins_per_second_per_core"] = round(1000 / summary["mean_ms"], 1)
+            results[name] = summary
+            self.stdout.write(
+                f"{name:24} p50 {summary['p50_ms']:8.2f} ms  p95 {summary['p95_ms']:8.2f} ms  "
+                f"hash {summary['hash_ms']:8.2f} ms  {summary['logins_per_second_per_core']:7.1f} logins/s/core"
+            )
+        return results
@@ -0,0 +1,97 @@
+import statistics
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from meals.benchmarks import results_document, summarize, write_results
+from meals.models import Parent, MealRegistration
+from meals.seeding import SEED_PASSWORD
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare session engines on the login -> order -> history flow: "
+        "database round-trips, session-table queries and latency per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modes", default=",".join(settings.SESSION_ENGINES),
+                            help="Comma-separated SESSION_MODE values to compare.")
+        parser.add_argument("--iterations", type=int, default=20, help="Flows per mode.")
+        parser.add_argument("--username", default="seed-parent-0")
+        parser.add_argument("--password", default=SEED_PASSWORD)
+        parser.add_argument("--clear-cache", action="store_true",
+                            help="Clear the session cache (SESSION_CACHE_ALIAS) before each mode. "
+                                 "It is shared with the site, so this logs everyone out of the "
+                                 "cache session modes.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+
+    def flow(self, username, password):
+        parent = Parent.objects.filter(user__username=username).first()
+        if parent is None:
+            raise CommandError(f"No parent '{username}'; run seed_school first or pass --username.")
+        registration = (
+            MealRegistration.objects.filter(date__gte=timezone.now().date())
+            .order_by("date").prefetch_related("meals").first()
+        )
+        steps = [
+            ("login", lambda client: client.post(
+                reverse("login"), {"username": username, "password": password})),
+            ("order", lambda client: client.get(reverse("meal_ordering"))),
+        ]
+        if registration and registration.meals.all():
+            meal = registration.meals.all()[0]
+            data = {f"{child.id}-meal": meal.id for child in parent.children.all()}
+            url = f"{reverse('meal_ordering')}?date={registration.date}"
+            steps.append(("order:post", lambda client: client.post(url, data)))
+        steps.append(("history", lambda client: client.get(reverse("meal_choice_history"))))
+        return steps
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options["modes"].split(",") if mode.strip()]
+        unknown = set(modes) - set(settings.SESSION_ENGINES)
+        if unknown:
+            raise CommandError(f"Unknown session modes: {', '.join(sorted(unknown))}")
+        steps = self.flow(options["username"], options["password"])
+
+        results = {}
+        for mode in modes:
+            if options["clear_cache"]:
+                caches[settings.SESSION_CACHE_ALIAS].clear()
+            timings = {name: ([], [], []) for name, _ in steps}
+            with override_settings(
+                SESSION_ENGINE=settings.SESSION_ENGINES[mode],
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            ):
+                for _ in range(options["iterations"]):
+                    client = Client()
+                    for name, send in steps:
+                        latencies, queries, session_queries = timings[name]
+                        with CaptureQueriesContext(connection) as captured:
+                            started = time.perf_counter()
+                            send(client)
+                            latencies.append((time.perf_counter() - started) * 1000)
+                        queries.append(len(captured))
+                        session_queries.append(
+                            sum('"django_session"' in query["sql"] for query in captured)
+                        )
+
+            for name, (latencies, queries, session_queries) in timings.items():
+                summary = summarize(latencies)
+                summary["queries"] = statistics.fmean(queries)
+                summary["session_queries"] = statistics.fmean(session_queries)
+                results[f"{mode}:{name}"] = summary
+                self.stdout.write(
+                    f"{mode:15} {name:11} p50 {summary['p50_ms']:8.2f} ms  "
+                    f"p95 {summary['p95_ms']:8.2f} ms  {summary['queries']:5.1f} queries  "
+                    f"{summary['session_queries']:4.1f} session"
+                )
+
+        if options["output"]:
+            write_results(options["output"], results_document(results, iterations=options["iterations"]))
+            self.stdout.write(f"Wrote {options['output']}")
@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from meals.benchmarks import (
+    compare_results, load_results, results_document, time_requests, write_results,
+)
+from meals.models import Parent, MealChoice, MealRegistration
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure p50/p95/p99 latency and queries per request for each view "
+        "with the Django test client, against the current database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=30, help="Timed requests per view.")
+        parser.add_argument("--warmup", type=int, default=3, help="Untimed requests per view.")
+        parser.add_argument("--username", help="Parent to browse as (default: the largest family).")
+        parser.add_argument("--staff-username", help="Staff user for admin views (default: first superuser).")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument("--compare", help="Baseline JSON file to compare against.")
+        parser.add_argument("--tolerance", type=float, default=0.2,
+                            help="Allowed p95 growth over the baseline, as a fraction.")
+
+    def get_parent(self, username):
+        parents = Parent.objects.select_related("user")
+        if username:
+            parent = parents.filter(user__username=username).first()
+        else:
+            parent = parents.annotate(size=Count("children")).order_by("-size").first()
+        if parent is None:
+            raise CommandError("No parent found; run seed_school first or pass --username.")
+        return parent
+
+    def scenarios(self, parent, staff):
+        today = timezone.now().date()
+        children = list(parent.children.all())
+        registration = (
+            MealRegistration.objects.filter(date__gte=today)
+            .order_by("date").prefetch_related("meals").first()
+        )
+        scenarios = {
+            "meal_ordering": (parent.user, lambda client: client.get(reverse("meal_ordering"))),
+            "meal_choice_history": (parent.user, lambda client: client.get(reverse("meal_choice_history"))),
+            "meal_choice_history:past": (
+                parent.user, lambda client: client.get(reverse("meal_choice_history"), {"view": "past"}),
+            ),
+            "child_list": (parent.user, lambda client: client.get(reverse("child_list"))),
+        }
+        if registration and children and registration.meals.all():
+            meal = registration.meals.all()[0]
+            order_url = f"{reverse('meal_ordering')}?date={registration.date}"
+            data = {f"{child.id}-meal": meal.id for child in children}
+            scenarios["meal_ordering:post"] = (parent.user, lambda client: client.post(order_url, data))
+        choice = MealChoice.objects.filter(child__parent=parent, meal_registration__date__gt=today).first()
+        if choice:
+            edit_url = reverse("edit_meal_choice", args=[choice.id])
+            scenarios["edit_meal_choice"] = (parent.user, lambda client: client.get(edit_url))
+        if staff:
+            scenarios["admin:meals-for-day"] = (staff, lambda client: client.get(reverse("admin:meals-for-day")))
+        return scenarios
+
+    def handle(self, *args, **options):
+        parent = self.get_parent(options["username"])
+        if options["staff_username"]:
+            staff = User.objects.filter(username=options["staff_username"], is_staff=True).first()
+        else:
+            staff = User.objects.filter(is_superuser=True).first()
+        if staff is None:
+            self.stdout.write("No staff user found; skipping admin views.")
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for name, (user, request) in self.scenarios(parent, staff).items():
+                client = Client()
+                client.force_login(user)
+                results[name] = time_requests(
+                    lambda: request(client), options["requests"], warmup=options["warmup"]
+                )
+                summary = results[name]
+                self.stdout.write(
+                    f"{name:28} p50 {summary['p50_ms']:8.2f} ms  p95 {summary['p95_ms']:8.2f} ms  "
+                    f"p99 {summary['p99_ms']:8.2f} ms  {summary['queries']:3} queries"
+                )
+
+        document = results_document(
+            results, parent=parent.user.username, children=parent.children.count()
+        )
+        if options["output"]:
+            write_results(options["output"], document)
+            self.stdout.write(f"Wrote {options['output']}")
+        if options["compare"]:
+            regressions = compare_results(document, load_results(options["compare"]), options["tolerance"])
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f"{len(regressions)} regressions against {options['compare']}.")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}."))
@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from meals.models import MealRegistration
+from meals.standing import expand_standing_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the meal choices that standing orders ask for on newly published "
+        "menus. Choices parents made themselves are never changed; run it after "
+        "publishing menus or from a scheduler."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all-upcoming", action="store_true",
+                            help="Also fill in upcoming dates that were expanded before, "
+                                 "e.g. after adding standing orders for a new child.")
+
+    def handle(self, *args, **options):
+        registrations = None
+        if options["all_upcoming"]:
+            registrations = MealRegistration.objects.filter(date__gte=timezone.now().date())
+
+        started = time.perf_counter()
+        result = expand_standing_orders(registrations)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']} of {result['requested']} standing-order choices "
+            f"across {result['registrations']} menus in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,92 @@
+import json
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from meals.models import Meal
+from meals.planning import WEEKDAYS, parse_holidays, plan_term, rotation_from_weeks
+
+
+def parse_date(value, option):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"{option} must be in YYYY-MM-DD format.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the menus for every school day of a term in bulk, from a weekly "
+        "rotation file or by copying earlier weeks forward."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", required=True, help="First day of the term (YYYY-MM-DD).")
+        parser.add_argument("--end", required=True, help="Last day of the term (YYYY-MM-DD).")
+        parser.add_argument("--holiday", action="append", default=[],
+                            help="A date or START..END range to skip; repeatable.")
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument("--rotation",
+                            help='JSON file: a list of weeks like {"mon": ["Fish fingers"], ...}.')
+        source.add_argument("--copy-from", help="Monday of the first existing week to copy forward.")
+        parser.add_argument("--weeks", type=int, default=1,
+                            help="Number of weeks to copy with --copy-from.")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be created.")
+
+    def load_rotation(self, path):
+        try:
+            with open(path) as fh:
+                weeks = json.load(fh)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+        if isinstance(weeks, dict):
+            weeks = [weeks]
+        names = {name for week in weeks for day in week.values() for name in day}
+        meals = dict(Meal.objects.filter(name__in=names).values_list("name", "id"))
+        missing = names - set(meals)
+        if missing:
+            raise CommandError(f"Unknown meals: {', '.join(sorted(missing))}")
+        rotation = []
+        for week in weeks:
+            unknown = set(week) - set(WEEKDAYS)
+            if unknown:
+                raise CommandError(f"Weekdays are {', '.join(WEEKDAYS)}, not {', '.join(sorted(unknown))}.")
+            rotation.append({
+                WEEKDAYS.index(day): [meals[name] for name in meal_names]
+                for day, meal_names in week.items()
+            })
+        return rotation
+
+    def handle(self, *args, **options):
+        start = parse_date(options["start"], "--start")
+        end = parse_date(options["end"], "--end")
+        if end < start:
+            raise CommandError("--end must not be before --start.")
+        try:
+            holidays = parse_holidays("\n".join(options["holiday"]))
+        except ValueError as e:
+            raise CommandError(f"--holiday: {e}")
+
+        if options["rotation"]:
+            rotation = self.load_rotation(options["rotation"])
+        else:
+            if options["weeks"] < 1:
+                raise CommandError("--weeks must be at least 1.")
+            rotation = rotation_from_weeks(parse_date(options["copy_from"], "--copy-from"), options["weeks"])
+
+        started = time.perf_counter()
+        try:
+            result = plan_term(start, end, rotation, holidays, dry_run=options["dry_run"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        verb = "Would create" if options["dry_run"] else "Created"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['registrations']} menus with {result['menu_rows']} meals "
+            f"in {elapsed:.2f}s."
+        ))
+        if result["skipped"]:
+            self.stdout.write(
+                f"Skipped {len(result['skipped'])} days that already have a menu: "
+                + ", ".join(day.isoformat() for day in result["skipped"])
+            )
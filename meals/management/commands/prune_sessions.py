@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from meals.sessions import prune_expired_sessions, PRUNE_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Delete expired database sessions in small chunks (run from a scheduler)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=PRUNE_CHUNK_SIZE)
+        parser.add_argument("--pause", type=float, default=0.0,
+                            help="Seconds to sleep between chunks.")
+
+    def handle(self, *args, **options):
+        removed = prune_expired_sessions(options["chunk_size"], options["pause"])
+        self.stdout.write(f"Removed {removed} expired sessions.")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from meals.totals import rebuild_totals, verify_totals
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyMealTotal table from MealChoice and verify it."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify-only",
+            action="store_true",
+            help="Only compare the stored totals with MealChoice; change nothing.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["verify_only"]:
+            rows = rebuild_totals()
+            self.stdout.write(f"Rebuilt {rows} daily meal total rows.")
+
+        mismatches = verify_totals()
+        for (registration_id, meal_id), stored, expected in mismatches:
+            self.stderr.write(
+                f"Registration {registration_id}, meal {meal_id}: "
+                f"stored {stored}, expected {expected}"
+            )
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} daily meal totals are out of date.")
+        self.stdout.write(self.style.SUCCESS("Daily meal totals match meal choices."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from meals.jobs import THREADS, work
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs from the database, several at a time. "
+        "Runs until stopped unless --once is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=THREADS,
+                            help="Jobs to run at once; 1 runs them in the main thread.")
+        parser.add_argument("--interval", type=float, default=1.0,
+                            help="Seconds between polls when there is nothing to do.")
+        parser.add_argument("--once", action="store_true",
+                            help="Exit once no job is due.")
+
+    def handle(self, *args, **options):
+        if options["threads"] < 1:
+            raise CommandError("--threads must be at least 1.")
+        finished = work(options["threads"], options["interval"], options["once"])
+        self.stdout.write(self.style.SUCCESS(f"Ran {finished} jobs."))
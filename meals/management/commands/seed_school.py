@@ -0,0 +1,44 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from meals.seeding import seed_school, SEED_PASSWORD
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic school (parents, children, menus and choices) for local benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--parents", type=int, default=300)
+        parser.add_argument("--children", type=int, default=500)
+        parser.add_argument("--dates", type=int, default=190, help="Number of weekday menus.")
+        parser.add_argument("--density", type=float, default=0.85,
+                            help="Share of child/date pairs that get a meal choice.")
+        parser.add_argument("--meals-per-day", type=int, default=3)
+        parser.add_argument("--start", help="First menu date (YYYY-MM-DD).")
+        parser.add_argument("--prefix", default="seed", help="Username prefix for generated parents.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+
+    def handle(self, *args, **options):
+        start = None
+        if options["start"]:
+            try:
+                start = datetime.strptime(options["start"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--start must be in YYYY-MM-DD format.")
+        if options["parents"] < 1:
+            raise CommandError("--parents must be at least 1.")
+        if not 0 <= options["density"] <= 1:
+            raise CommandError("--density must be between 0 and 1.")
+
+        counts = seed_school(
+            parents=options["parents"],
+            children=options["children"],
+            dates=options["dates"],
+            density=options["density"],
+            meals_per_day=options["meals_per_day"],
+            start=start,
+            prefix=options["prefix"],
+            seed=options["seed"],
+        )
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary}."))
+        self.stdout.write(f"Parents log in as {options['prefix']}-parent-<n> with password '{SEED_PASSWORD}'.")
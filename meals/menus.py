@@ -0,0 +1,100 @@
+import time
+from functools import lru_cache
+from uuid import uuid4
+from django.core.cache import cache
+from django.db import transaction
+from .models import MealRegistration
+
+MENU_VERSION_KEY = "meals:menu-version"
+MENU_TIMEOUT = 60 * 60 * 24
+LOCAL_MENU_ENTRIES = 512
+# Seconds a worker serves its own copy of the stamp before reading the
+# shared cache again, so most requests never query the cache table.
+LOCAL_VERSION_TTL = 5
+
+# (stamp, time.monotonic() it expires at), for this process.
+_local_version = (None, 0.0)
+
+
+def _remember_version(version):
+    global _local_version
+    _local_version = (version, time.monotonic() + LOCAL_VERSION_TTL)
+    return version
+
+
+def menu_version():
+    """
+    Return the current menu version stamp: this worker's copy while it is
+    at most ``LOCAL_VERSION_TTL`` seconds old, else the one in the shared
+    cache. A bump in this worker is seen at once, one in another worker
+    within ``LOCAL_VERSION_TTL``.
+
+    The stamp is a random token rather than a counter, so a version that is
+    lost (cache flush, rolled-back transaction) can never be reissued and
+    match an entry left behind in a worker's local LRU.
+    """
+    version, expires = _local_version
+    if version is not None and time.monotonic() < expires:
+        return version
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(MENU_VERSION_KEY, version, timeout=None):
+            version = cache.get(MENU_VERSION_KEY, version)
+    return _remember_version(version)
+
+
+def _set_new_version():
+    cache.set(MENU_VERSION_KEY, _remember_version(uuid4().hex), timeout=None)
+
+
+def bump_menu_version():
+    """
+    Invalidate every cached menu, in this worker and all the others.
+
+    The stamp is replaced now and again once the surrounding transaction
+    commits, so no worker can cache the pre-commit menu under the new stamp.
+    """
+    _set_new_version()
+    transaction.on_commit(_set_new_version)
+
+
+@lru_cache(maxsize=LOCAL_MENU_ENTRIES)
+def _menu_for_date(date, version):
+    key = f"meals:menu:{date.isoformat()}:{version}"
+    cached = cache.get(key)
+    if cached is None:
+        registration = (
+            MealRegistration.objects.filter(date=date).prefetch_related("meals").first()
+        )
+        # Wrapped so that "no menu for this date" is cached as well.
+        cached = (registration,)
+        cache.set(key, cached, MENU_TIMEOUT)
+    return cached[0]
+
+
+@lru_cache(maxsize=8)
+def _registered_dates(version):
+    key = f"meals:menu-dates:{version}"
+    dates = cache.get(key)
+    if dates is None:
+        dates = tuple(
+            MealRegistration.objects.order_by("date").values_list("date", flat=True)
+        )
+        cache.set(key, dates, MENU_TIMEOUT)
+    return dates
+
+
+def menu_for_date(date, version=None):
+    """
+    Return the MealRegistration for ``date`` with its meals prefetched, or
+    None. The instance is shared between requests and must not be modified.
+    """
+    if date is None:
+        return None
+    return _menu_for_date(date, version or menu_version())
+
+
+def registered_dates(version=None):
+    """Return every date with a MealRegistration, in order."""
+    return list(_registered_dates(version or menu_version()))
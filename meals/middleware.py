@@ -0,0 +1,62 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import SimpleLazyObject
+from .models import Parent
+
+PARENT_SESSION_KEY = "meals_parent"
+
+
+def get_or_create_parent(user):
+    parent, created = Parent.objects.get_or_create(
+        user=user, defaults={"full_name": user.get_full_name() or user.username}
+    )
+    return parent
+
+
+def remember_parent(request, parent):
+    """Store the parent in the session so later requests need no lookup."""
+    request.session[PARENT_SESSION_KEY] = {
+        "id": parent.id,
+        "user_id": parent.user_id,
+        "full_name": parent.full_name,
+    }
+
+
+def resolve_parent(request):
+    """
+    Return the Parent for the logged-in user, or None for anonymous users.
+
+    Normally rebuilt from the session without a query; sessions that
+    predate the login hook fall back to get_or_create once and are then
+    remembered.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    cached = request.session.get(PARENT_SESSION_KEY)
+    if cached and cached.get("user_id") == user.pk:
+        return Parent.from_db(
+            DEFAULT_DB_ALIAS,
+            ["id", "user_id", "full_name"],
+            [cached["id"], user.pk, cached["full_name"]],
+        )
+    parent = get_or_create_parent(user)
+    remember_parent(request, parent)
+    return parent
+
+
+class ParentMiddleware:
+    """Attach a lazily resolved ``request.parent`` to every request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            # Nothing here blocks, so stay on the event loop under ASGI.
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.parent = SimpleLazyObject(lambda: resolve_parent(request))
+        return self.get_response(request)
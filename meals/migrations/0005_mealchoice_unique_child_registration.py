@@ -0,0 +1,33 @@
+# Generated by Django 4.2.23 on 2026-10-16 23:51
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_choices(apps, schema_editor):
+    """Keep only the most recent choice for each child and registration."""
+    MealChoice = apps.get_model('meals', 'MealChoice')
+    duplicates = (
+        MealChoice.objects.values('child', 'meal_registration')
+        .annotate(rows=Count('id'), keep=Max('id'))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        MealChoice.objects.filter(
+            child=row['child'], meal_registration=row['meal_registration']
+        ).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0004_alter_child_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_choices, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='mealchoice',
+            constraint=models.UniqueConstraint(fields=('child', 'meal_registration'), name='unique_meal_choice_per_child_and_date'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.23 on 2026-10-16 23:52
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def populate_totals(apps, schema_editor):
+    MealChoice = apps.get_model('meals', 'MealChoice')
+    DailyMealTotal = apps.get_model('meals', 'DailyMealTotal')
+    rows = (
+        MealChoice.objects.values('meal_registration', 'meal')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    DailyMealTotal.objects.bulk_create(
+        DailyMealTotal(
+            meal_registration_id=row['meal_registration'],
+            meal_id=row['meal'],
+            count=row['count'],
+        )
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0005_mealchoice_unique_child_registration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMealTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('meal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_totals', to='meals.meal')),
+                ('meal_registration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meal_totals', to='meals.mealregistration')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailymealtotal',
+            constraint=models.UniqueConstraint(fields=('meal_registration', 'meal'), name='unique_daily_total_per_registration_and_meal'),
+        ),
+        migrations.RunPython(populate_totals, migrations.RunPython.noop),
+    ]
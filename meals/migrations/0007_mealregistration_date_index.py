@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-16 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0006_dailymealtotal'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mealregistration',
+            name='date',
+            field=models.DateField(db_index=True),
+        ),
+    ]
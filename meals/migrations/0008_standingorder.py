@@ -0,0 +1,37 @@
+# Generated by Django 4.2.23 on 2026-10-17 00:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0007_mealregistration_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mealregistration',
+            name='standing_orders_applied',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='StandingOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(blank=True, choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday')], null=True)),
+                ('rank', models.PositiveSmallIntegerField(default=0)),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standing_orders', to='meals.child')),
+                ('meal', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='standing_orders', to='meals.meal')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='standingorder',
+            constraint=models.UniqueConstraint(condition=models.Q(('weekday__isnull', False)), fields=('child', 'weekday', 'rank'), name='unique_standing_order_per_child_weekday_and_rank'),
+        ),
+        migrations.AddConstraint(
+            model_name='standingorder',
+            constraint=models.UniqueConstraint(condition=models.Q(('weekday__isnull', True)), fields=('child', 'rank'), name='unique_daily_standing_order_per_child_and_rank'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-17 00:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0008_standingorder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mealregistration',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
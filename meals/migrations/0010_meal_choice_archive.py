@@ -0,0 +1,46 @@
+# Generated by Django 4.2.23 on 2026-10-17 00:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0009_mealregistration_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MealChoiceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('year_group', models.IntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('meal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='meals.meal')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedMealChoice',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('chosen_at', models.DateTimeField()),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_choices', to='meals.child')),
+                ('meal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_choices', to='meals.meal')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='mealchoicerollup',
+            constraint=models.UniqueConstraint(fields=('date', 'meal', 'year_group'), name='unique_rollup_per_date_meal_and_year_group'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmealchoice',
+            index=models.Index(fields=['child', 'date'], name='archived_choice_child_date'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmealchoice',
+            index=models.Index(fields=['date'], name='archived_choice_date'),
+        ),
+    ]
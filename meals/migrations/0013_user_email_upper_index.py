@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Index auth_user on UPPER(email) for the case-insensitive duplicate
+    check at registration. auth.User belongs to another app, so the
+    index is created with SQL that both SQLite and PostgreSQL accept.
+    """
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("meals", "0012_job"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS "auth_user_email_upper" ON "auth_user" (UPPER("email"));',
+            reverse_sql='DROP INDEX IF EXISTS "auth_user_email_upper";',
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.23 on 2026-10-17 01:26
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def enqueue_unfinished_tasks(apps, schema_editor):
+    """
+    Queue a run_deletion job for every task that was left to the old
+    process_deletions loop, unless one is queued or running already.
+    """
+    DeletionTask = apps.get_model('meals', 'DeletionTask')
+    Job = apps.get_model('meals', 'Job')
+    name = 'meals.deletion.run_deletion'
+    queued = {
+        job.args[0] for job in Job.objects.filter(name=name, status__in=['queued', 'running']) if job.args
+    }
+    now = timezone.now()
+    tasks = DeletionTask.objects.filter(status__in=['pending', 'running']).exclude(id__in=queued)
+    Job.objects.bulk_create(
+        Job(name=name, args=[task_id], kwargs={}, run_at=now, max_attempts=5)
+        for task_id in tasks.values_list('id', flat=True)
+    )
+    tasks.update(status='pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0013_user_email_upper_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(enqueue_unfinished_tasks, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='deletiontask',
+            name='deletion_task_status',
+        ),
+        migrations.RemoveField(
+            model_name='deletiontask',
+            name='attempts',
+        ),
+        migrations.RemoveField(
+            model_name='deletiontask',
+            name='locked_until',
+        ),
+    ]
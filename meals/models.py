@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 
 
@@ -10,6 +10,13 @@ class Parent(models.Model):
         return self.full_name
 
 
+class ChildManager(models.Manager):
+    """Leaves out children whose deletion is still being processed."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_active=True)
+
+
 class Child(models.Model):
     parent = models.ForeignKey(
         Parent,
@@ -19,6 +26,11 @@ class Child(models.Model):
     first_name = models.CharField(max_length=30)
     last_name = models.CharField(max_length=30)
     year_group = models.IntegerField()
+    # Cleared when the child is deleted; the rows go in the background.
+    is_active = models.BooleanField(default=True)
+
+    objects = ChildManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.year_group})"
@@ -36,8 +48,12 @@ class Meal(models.Model):
 
 
 class MealRegistration(models.Model):
-    date = models.DateField()
+    date = models.DateField(db_index=True)
     meals = models.ManyToManyField(Meal, related_name='registrations')
+    # Set once standing orders have been expanded into choices for this
+    # date, so a later run never brings back a choice a parent removed.
+    standing_orders_applied = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Meal Registration for {self.date}"
@@ -59,3 +75,219 @@ class MealChoice(models.Model):
 
     def __str__(self):
         return f"{self.child} - {self.meal} on {self.meal_registration.date}"
+
+    def save(self, *args, **kwargs):
+        # DailyMealTotal is updated from the post_save signal; keep it in
+        # the same transaction as the row itself.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['child', 'meal_registration'],
+                name='unique_meal_choice_per_child_and_date',
+            )
+        ]
+
+
+class ArchivedMealChoice(models.Model):
+    """
+    A MealChoice moved out of the hot table once its date is past the
+    archive cutoff. It keeps the original id, so history pages can key on
+    ``(date, id)`` across both tables, and the date instead of the
+    registration, so reading it needs no join.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    child = models.ForeignKey(
+        Child,
+        on_delete=models.CASCADE,
+        related_name='archived_choices'
+    )
+    meal = models.ForeignKey(
+        Meal,
+        on_delete=models.CASCADE,
+        related_name='archived_choices'
+    )
+    date = models.DateField()
+    chosen_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.child} - {self.meal} on {self.date} (archived)"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['child', 'date'], name='archived_choice_child_date'),
+            models.Index(fields=['date'], name='archived_choice_date'),
+        ]
+
+
+class MealChoiceRollup(models.Model):
+    """Number of choices of a meal per date and year group, kept for archived dates."""
+    date = models.DateField()
+    meal = models.ForeignKey(
+        Meal,
+        on_delete=models.CASCADE,
+        related_name='rollups'
+    )
+    year_group = models.IntegerField()
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.meal} x {self.count} for year {self.year_group} on {self.date}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'meal', 'year_group'],
+                name='unique_rollup_per_date_meal_and_year_group',
+            )
+        ]
+
+
+class StandingOrder(models.Model):
+    """
+    A child's repeat order, expanded into MealChoice rows when new menus are
+    published. A row applies to one weekday, or to every day when
+    ``weekday`` is empty, and an empty ``meal`` means the first option on
+    the menu. For each date the child's rows for that weekday are tried
+    before the every-day ones, each in ``rank`` order, and the first meal
+    that is on the menu wins.
+    """
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+    ]
+
+    child = models.ForeignKey(
+        Child,
+        on_delete=models.CASCADE,
+        related_name='standing_orders'
+    )
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, null=True, blank=True)
+    rank = models.PositiveSmallIntegerField(default=0)
+    meal = models.ForeignKey(
+        Meal,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='standing_orders'
+    )
+
+    def __str__(self):
+        day = self.get_weekday_display() if self.weekday is not None else 'Every day'
+        return f"{self.child} - {day} #{self.rank}: {self.meal or 'first option'}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['child', 'weekday', 'rank'],
+                condition=models.Q(weekday__isnull=False),
+                name='unique_standing_order_per_child_weekday_and_rank',
+            ),
+            models.UniqueConstraint(
+                fields=['child', 'rank'],
+                condition=models.Q(weekday__isnull=True),
+                name='unique_daily_standing_order_per_child_and_rank',
+            ),
+        ]
+
+
+class DailyMealTotal(models.Model):
+    """
+    Number of choices of each meal per registration, kept up to date in the
+    same transaction as every MealChoice write so kitchen pages read one row
+    per menu item instead of counting orders.
+    """
+    meal_registration = models.ForeignKey(
+        MealRegistration,
+        on_delete=models.CASCADE,
+        related_name='meal_totals'
+    )
+    meal = models.ForeignKey(
+        Meal,
+        on_delete=models.CASCADE,
+        related_name='daily_totals'
+    )
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.meal} x {self.count} on {self.meal_registration.date}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['meal_registration', 'meal'],
+                name='unique_daily_total_per_registration_and_meal',
+            )
+        ]
+
+
+class DeletionTask(models.Model):
+    """
+    A user account or child being deleted in the background, with its
+    progress. The target is kept as a plain id so the task outlives the
+    rows it deletes. It is run by a ``run_deletion`` job, which owns the
+    lease and the retries.
+    """
+    ACCOUNT = 'account'
+    CHILD = 'child'
+    KIND_CHOICES = [(ACCOUNT, 'Account'), (CHILD, 'Child')]
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    target_id = models.BigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    step = models.CharField(max_length=50, blank=True)
+    rows_deleted = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Delete {self.kind} {self.target_id}: {self.status}"
+
+
+class Job(models.Model):
+    """
+    A call to a function registered with ``meals.jobs.job``, queued to run
+    in the ``run_worker`` process instead of the request. ``args`` and
+    ``kwargs`` are stored as JSON. A failed job is queued again with
+    ``run_at`` pushed back until it has used ``max_attempts``.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    run_at = models.DateTimeField()
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    last_error = models.TextField(blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at'),
+        ]
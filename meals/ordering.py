@@ -0,0 +1,186 @@
+from collections import Counter, namedtuple
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Child, MealRegistration, MealChoice
+from .totals import apply_total_changes
+
+
+def _unordered_dates(child_ids):
+    ordered = (
+        MealChoice.objects.filter(
+            meal_registration=OuterRef("pk"), child_id__in=child_ids
+        )
+        .order_by()
+        .values("meal_registration")
+        .annotate(total=Count("child", distinct=True))
+        .values("total")
+    )
+    # Past dates are closed, and archived ones have no hot choices left to count.
+    return (
+        MealRegistration.objects.filter(date__gte=timezone.now().date())
+        .annotate(
+            ordered=Coalesce(
+                Subquery(ordered, output_field=IntegerField()), Value(0)
+            )
+        )
+        .filter(ordered__lt=len(child_ids))
+        .order_by("date")
+        .values_list("date", flat=True)
+    )
+
+
+def next_unordered_date(child_ids):
+    """
+    Return the first registered date from today on which at least one of
+    the given children has no meal choice yet, or None when every such
+    date is ordered.
+
+    Runs as a single query: a correlated count of the children's choices per
+    registration, scanned in date order and stopped at the first gap.
+    """
+    child_ids = list(child_ids)
+    if not child_ids:
+        return None
+    return _unordered_dates(child_ids).first()
+
+
+async def anext_unordered_date(child_ids):
+    """Async version of next_unordered_date()."""
+    child_ids = list(child_ids)
+    if not child_ids:
+        return None
+    return await _unordered_dates(child_ids).afirst()
+
+
+OrderingBundle = namedtuple(
+    "OrderingBundle", ["children", "choices_by_child", "meals"]
+)
+
+
+def load_ordering_bundle(children, meal_registration):
+    """
+    Load everything the ordering form needs for one date up front: the
+    children, their existing choices keyed by child id, and the menu.
+
+    Costs two queries however many children there are.
+    """
+    children = list(children)
+    choices = MealChoice.objects.filter(
+        meal_registration=meal_registration,
+        child_id__in=[child.id for child in children],
+    )
+    return OrderingBundle(
+        children=children,
+        choices_by_child={choice.child_id: choice for choice in choices},
+        meals=list(meal_registration.meals.all()),
+    )
+
+
+async def aload_ordering_bundle(children, meal_registration):
+    """Async version of load_ordering_bundle(), with the same two queries."""
+    children = list(children)
+    choices = MealChoice.objects.filter(
+        meal_registration=meal_registration,
+        child_id__in=[child.id for child in children],
+    )
+    return OrderingBundle(
+        children=children,
+        choices_by_child={choice.child_id: choice async for choice in choices},
+        meals=[meal async for meal in meal_registration.meals.all()],
+    )
+
+
+def lock_children(child_ids):
+    """
+    Lock the children's rows until the caller's transaction ends, so
+    everything that reads their choices and then moves the totals takes
+    its turn: orders, cancellations and deletions alike.
+    """
+    children = Child.all_objects.filter(id__in=child_ids)
+    if connection.features.has_select_for_update:
+        # In id order, so two batches over the same children cannot deadlock.
+        list(children.select_for_update().order_by("id").values_list("id"))
+    else:
+        # SQLite has no row locks. Writing first takes its database lock,
+        # for which writers wait; a transaction that reads first fails
+        # with "database is locked" when another writer got there first.
+        children.update(is_active=F("is_active"))
+
+
+def upsert_choices(selections):
+    """
+    Insert or update choices in bulk, in the caller's transaction.
+
+    ``selections`` maps ``(child_id, meal_registration_id)`` to the chosen
+    meal id. The children's rows are locked first (see lock_children()),
+    so submissions for the same child queue up behind each other, and the
+    choices already stored are then read under that lock: the
+    DailyMealTotal deltas and the result come from that read, never from
+    what the caller loaded earlier. Only choices whose meal changes are written. Where the
+    database supports ``INSERT ... ON CONFLICT DO UPDATE`` that is one
+    statement; other backends fall back to update_or_create per choice.
+    Returns the meal id previously stored for every key that had one.
+    """
+    child_ids = sorted({child_id for child_id, _ in selections})
+    lock_children(child_ids)
+    previous = {
+        (child_id, registration_id): meal_id
+        for child_id, registration_id, meal_id in MealChoice.objects.filter(
+            child_id__in=child_ids,
+            meal_registration_id__in={registration_id for _, registration_id in selections},
+        ).values_list("child_id", "meal_registration_id", "meal_id")
+        if (child_id, registration_id) in selections
+    }
+    changed = {key: meal_id for key, meal_id in selections.items() if previous.get(key) != meal_id}
+    choices = [
+        MealChoice(child_id=child_id, meal_registration_id=registration_id, meal_id=meal_id)
+        for (child_id, registration_id), meal_id in changed.items()
+    ]
+    if not choices:
+        return previous
+    if connection.features.supports_update_conflicts_with_target:
+        MealChoice.objects.bulk_create(
+            choices,
+            update_conflicts=True,
+            unique_fields=["child", "meal_registration"],
+            update_fields=["meal"],
+        )
+        # bulk_create sends no signals, so move the totals here.
+        changes = Counter()
+        for (child_id, registration_id), meal_id in changed.items():
+            if (child_id, registration_id) in previous:
+                changes[(registration_id, previous[(child_id, registration_id)])] -= 1
+            changes[(registration_id, meal_id)] += 1
+        apply_total_changes(changes)
+    else:
+        for choice in choices:
+            MealChoice.objects.update_or_create(
+                child_id=choice.child_id,
+                meal_registration_id=choice.meal_registration_id,
+                defaults={"meal_id": choice.meal_id},
+            )
+    return previous
+
+
+def save_meal_choices(meal_registration, meals_by_child):
+    """
+    Insert or update one choice per child for ``meal_registration``.
+
+    ``meals_by_child`` maps child id to the chosen Meal. See
+    upsert_choices(). Returns a ``(created, updated)`` tuple of counts, as
+    found under the lock rather than from the choices the form was built
+    with.
+    """
+    with transaction.atomic():
+        previous = upsert_choices(
+            {(child_id, meal_registration.id): meal.id for child_id, meal in meals_by_child.items()}
+        )
+    return len(meals_by_child) - len(previous), len(previous)
+
+
+# transaction.atomic() is not usable from async code in Django 4.2, so async
+# views hand the whole upsert to one worker thread.
+asave_meal_choices = sync_to_async(save_meal_choices)
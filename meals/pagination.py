@@ -0,0 +1,84 @@
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.db.models import Subquery
+from django.utils.functional import cached_property
+
+COUNT_LIMIT = 10000
+PK_ORDERINGS = {("-pk",), ("pk",), ("-id",), ("id",)}
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for tables too big to count on every page view.
+
+    An unfiltered list on PostgreSQL is counted from the planner's row
+    estimate; anything else is counted up to ``count_limit`` rows. Either
+    figure is only shown: while the count is not exact there is always a
+    link to one page past it, and asking for a page beyond it counts the
+    rows for real. When the list is ordered by primary key, later pages
+    first find their first key with an index-only query and then read just
+    one page of rows from there, rather than fetching and joining every row
+    they skip.
+    """
+
+    count_limit = COUNT_LIMIT
+    exact = True
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self._estimate(queryset)
+            if estimate is not None:
+                self.exact = False
+                return estimate
+        count = queryset.order_by().values("pk")[:self.count_limit + 1].count()
+        if count > self.count_limit:
+            self.exact = False
+            return self.count_limit
+        return count
+
+    @cached_property
+    def num_pages(self):
+        pages = super().num_pages
+        return pages if self.exact else pages + 1
+
+    def validate_number(self, number):
+        try:
+            number = super().validate_number(number)
+            if self.exact or number < self.num_pages:
+                return number
+        except EmptyPage:
+            if self.exact:
+                raise
+        # The page is past the estimated or capped count: count for real.
+        self.__dict__["count"] = self.object_list.count()
+        self.__dict__.pop("num_pages", None)
+        self.exact = True
+        return super().validate_number(number)
+
+    def _estimate(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 until the table has been analyzed.
+        if row is None or row[0] < 0:
+            return None
+        return int(row[0])
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        ordering = tuple(self.object_list.query.order_by)
+        if not bottom or ordering not in PK_ORDERINGS:
+            return super().page(number)
+        first = self.object_list.values("pk")[bottom:bottom + 1]
+        lookup = "pk__lte" if ordering[0].startswith("-") else "pk__gte"
+        rows = self.object_list.filter(**{lookup: Subquery(first)})[:self.per_page]
+        return self._get_page(rows, number, self)
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+from django.db import transaction
+from .models import MealRegistration
+from .menus import bump_menu_version
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri"]
+
+
+def parse_holidays(text):
+    """
+    Parse holidays given one per line or comma-separated, each either a
+    date or an inclusive ``START..END`` range (``YYYY-MM-DD``), into a set
+    of dates. Raises ValueError on anything else.
+    """
+    holidays = set()
+    for item in text.replace(",", "\n").splitlines():
+        item = item.strip()
+        if not item:
+            continue
+        first, _, last = item.partition("..")
+        start = datetime.strptime(first.strip(), "%Y-%m-%d").date()
+        end = datetime.strptime(last.strip(), "%Y-%m-%d").date() if last else start
+        if end < start:
+            raise ValueError(f"Holiday range {item} ends before it starts.")
+        while start <= end:
+            holidays.add(start)
+            start += timedelta(days=1)
+    return holidays
+
+
+def term_days(start, end, holidays=()):
+    """Weekdays from ``start`` to ``end`` inclusive, minus ``holidays``."""
+    holidays = set(holidays)
+    days = []
+    day = start
+    while day <= end:
+        if day.weekday() < 5 and day not in holidays:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def rotation_from_weeks(first_monday, weeks):
+    """
+    Read ``weeks`` consecutive weeks of existing menus, starting with the
+    week of ``first_monday``, as a rotation: a list with one
+    ``{weekday: [meal ids]}`` dict per week. Days without a menu are left
+    out. Costs one query.
+    """
+    first_monday = week_start(first_monday)
+    rotation = [{} for _ in range(weeks)]
+    Through = MealRegistration.meals.through
+    rows = Through.objects.filter(
+        mealregistration__date__gte=first_monday,
+        mealregistration__date__lt=first_monday + timedelta(weeks=weeks),
+    ).values_list("mealregistration__date", "meal_id").order_by("mealregistration__date", "meal_id")
+    for date, meal_id in rows:
+        week = (date - first_monday).days // 7
+        if date.weekday() < 5:
+            rotation[week].setdefault(date.weekday(), []).append(meal_id)
+    return rotation
+
+
+def plan_term(start, end, rotation, holidays=(), dry_run=False):
+    """
+    Create a menu for every school day from ``start`` to ``end``.
+
+    ``rotation`` is a list of weeks, each a dict of weekday (0 = Monday) to
+    meal ids; the rotation moves on one week for every week that has at
+    least one school day, so it resumes where it left off after a holiday.
+    Days that already have a registration, and days the rotation leaves
+    empty, are skipped. Everything is written with two bulk inserts (the
+    registrations, then their ``meals`` rows) in one transaction, and the
+    menu cache is invalidated once.
+
+    Returns a dict with the number of registrations and menu rows created
+    and the dates skipped because they already had a menu.
+    """
+    if not rotation or not any(rotation):
+        raise ValueError("The rotation has no meals in it.")
+    days = term_days(start, end, holidays)
+    existing = set(
+        MealRegistration.objects.filter(date__in=days).values_list("date", flat=True)
+    )
+
+    planned = []
+    week_index = -1
+    current_week = None
+    for day in days:
+        if week_start(day) != current_week:
+            current_week = week_start(day)
+            week_index += 1
+        meal_ids = rotation[week_index % len(rotation)].get(day.weekday())
+        if meal_ids and day not in existing:
+            planned.append((day, list(dict.fromkeys(meal_ids))))
+
+    result = {
+        "registrations": len(planned),
+        "menu_rows": sum(len(meal_ids) for _, meal_ids in planned),
+        "skipped": sorted(existing),
+    }
+    if dry_run or not planned:
+        return result
+
+    with transaction.atomic():
+        registrations = MealRegistration.objects.bulk_create(
+            MealRegistration(date=day) for day, _ in planned
+        )
+        Through = MealRegistration.meals.through
+        Through.objects.bulk_create(
+            Through(mealregistration_id=registration.id, meal_id=meal_id)
+            for registration, (_, meal_ids) in zip(registrations, planned)
+            for meal_id in meal_ids
+        )
+        # bulk_create sends no signals, so invalidate the menus here.
+        bump_menu_version()
+    return result
@@ -0,0 +1,150 @@
+import hashlib
+from collections import Counter
+from datetime import datetime, timedelta
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from .models import DailyMealTotal, MealChoice, MealChoiceRollup
+
+MAX_REPORT_DAYS = 366
+
+# Report dimension -> the MealChoice fields it groups by.
+GROUPINGS = {
+    "date": ("meal_registration__date",),
+    "meal": ("meal_id", "meal__name"),
+    "year_group": ("child__year_group",),
+}
+# The same dimensions on MealChoiceRollup, which holds archived dates.
+ROLLUP_GROUPINGS = {
+    "date": ("date",),
+    "meal": ("meal_id", "meal__name"),
+    "year_group": ("year_group",),
+}
+DEFAULT_GROUP_BY = ("date", "meal")
+
+
+def _date(value, name):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError(f"{name} must be in YYYY-MM-DD format.")
+
+
+def _ids(values, name):
+    try:
+        return sorted({int(value) for value in values})
+    except ValueError:
+        raise ValueError(f"{name} must be a number.")
+
+
+def parse_report_params(query):
+    """
+    Read ``start``, ``end``, ``meal``, ``year_group`` (both repeatable) and
+    ``group_by`` (comma-separated dimensions) from a QueryDict. Dates
+    default to today; raises ValueError on anything invalid.
+    """
+    today = timezone.now().date()
+    start = _date(query["start"], "start") if query.get("start") else today
+    end = _date(query["end"], "end") if query.get("end") else start
+    if end < start:
+        raise ValueError("end must not be before start.")
+    if end - start >= timedelta(days=MAX_REPORT_DAYS):
+        raise ValueError(f"Reports cover at most {MAX_REPORT_DAYS} days.")
+    group_by = [name.strip() for name in query.get("group_by", ",".join(DEFAULT_GROUP_BY)).split(",")]
+    group_by = list(dict.fromkeys(name for name in group_by if name))
+    unknown = set(group_by) - set(GROUPINGS)
+    if unknown:
+        raise ValueError(f"group_by takes {', '.join(GROUPINGS)}, not {', '.join(sorted(unknown))}.")
+    return {
+        "start": start,
+        "end": end,
+        "meals": _ids(query.getlist("meal"), "meal"),
+        "year_groups": _ids(query.getlist("year_group"), "year_group"),
+        "group_by": group_by,
+    }
+
+
+def _rollups(params):
+    rollups = MealChoiceRollup.objects.filter(date__range=(params["start"], params["end"]))
+    if params["meals"]:
+        rollups = rollups.filter(meal_id__in=params["meals"])
+    return rollups
+
+
+def report_state(params):
+    """
+    What a report's ETag is derived from, in one aggregate over the
+    daily totals of its dates and one over the rollups of its archived
+    dates: the latest total and registration change, plus the number of
+    rows and orders in each, so deleted choices, registrations and
+    archiving change the ETag too. Year groups are read as they are now,
+    so moving a child between year groups does not count as a change.
+    """
+    totals = DailyMealTotal.objects.filter(
+        meal_registration__date__range=(params["start"], params["end"])
+    )
+    if params["meals"]:
+        totals = totals.filter(meal_id__in=params["meals"])
+    state = totals.aggregate(
+        totals_changed=Max("updated_at"),
+        registrations_changed=Max("meal_registration__updated_at"),
+        rows=Count("id"),
+        orders=Sum("count"),
+    )
+    state.update(_rollups(params).aggregate(archived_rows=Count("id"), archived_orders=Sum("count")))
+    return state
+
+
+def report_etag(params, state):
+    key = "|".join(str(part) for part in (
+        params["start"], params["end"], params["meals"], params["year_groups"], params["group_by"],
+        state["rows"], state["orders"], state["totals_changed"], state["registrations_changed"],
+        state["archived_rows"], state["archived_orders"],
+    ))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def _counts(queryset, fields, count):
+    if not fields:
+        return Counter({(): queryset.aggregate(n=count)["n"] or 0})
+    return Counter({tuple(key): n for *key, n in queryset.values_list(*fields).annotate(n=count).order_by()})
+
+
+def report_rows(params):
+    """
+    Order counts grouped by ``params["group_by"]``, with one GROUP BY over
+    the choices and one over the rollups of archived dates, added together.
+    Archived choices are counted in the year group their child was in when
+    they were archived. Returns a list of dicts with a ``count`` and the
+    grouped dimensions.
+    """
+    choices = MealChoice.objects.filter(
+        meal_registration__date__range=(params["start"], params["end"])
+    )
+    rollups = _rollups(params)
+    if params["meals"]:
+        choices = choices.filter(meal_id__in=params["meals"])
+    if params["year_groups"]:
+        choices = choices.filter(child__year_group__in=params["year_groups"])
+        rollups = rollups.filter(year_group__in=params["year_groups"])
+    fields = [field for name in params["group_by"] for field in GROUPINGS[name]]
+    rollup_fields = [field for name in params["group_by"] for field in ROLLUP_GROUPINGS[name]]
+    counts = _counts(choices, fields, Count("id")) + _counts(rollups, rollup_fields, Sum("count"))
+
+    names = {
+        "meal_registration__date": "date",
+        "meal_id": "meal",
+        "meal__name": "meal_name",
+        "child__year_group": "year_group",
+    }
+    if not fields:
+        return [{"count": counts[()]}]
+    return [
+        {
+            **{
+                names[field]: value.isoformat() if field == "meal_registration__date" else value
+                for field, value in zip(fields, key)
+            },
+            "count": counts[key],
+        }
+        for key in sorted(counts)
+    ]
@@ -0,0 +1,139 @@
+import random
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from .models import Parent, Child, Meal, MealRegistration, MealChoice
+from .menus import bump_menu_version
+from .totals import rebuild_totals
+
+SEED_PASSWORD = "seed-password"
+BATCH_SIZE = 5000
+
+MEAL_NAMES = [
+    "Roast chicken", "Vegetable lasagne", "Fish fingers", "Cheese pizza",
+    "Beef chilli", "Jacket potato", "Pasta bolognese", "Chickpea curry",
+    "Sausage and mash", "Tomato soup", "Halloumi wrap", "Salmon fishcakes",
+]
+FIRST_NAMES = [
+    "Ava", "Ben", "Chloe", "Dan", "Ella", "Finn", "Grace", "Harry", "Isla",
+    "Jack", "Katie", "Leo", "Mia", "Noah", "Olivia", "Ryan", "Sophie", "Tom",
+]
+LAST_NAMES = [
+    "Brown", "Clarke", "Davies", "Evans", "Green", "Hall", "Jones", "King",
+    "Lewis", "Moore", "Patel", "Roberts", "Smith", "Taylor", "Walker", "Wright",
+]
+
+
+def school_days(start, count):
+    """Return ``count`` weekdays from ``start`` onwards."""
+    days = []
+    day = start
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def seed_school(parents, children, dates, density=0.85, meals_per_day=3,
+                start=None, prefix="seed", seed=0):
+    """
+    Generate a synthetic school with bulk inserts only.
+
+    Creates ``parents`` users with parent profiles, ``children`` children
+    spread over them in year groups 0-13, ``dates`` weekday menus of
+    ``meals_per_day`` meals starting at ``start`` (by default half of them
+    in the past), and a choice for each child on roughly ``density`` of
+    the dates. Returns a dict of the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    if start is None:
+        start = timezone.now().date() - timedelta(weeks=dates // 10)
+    password = make_password(SEED_PASSWORD)
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            (
+                User(username=f"{prefix}-parent-{n}", email=f"{prefix}-parent-{n}@example.com",
+                     password=password)
+                for n in range(parents)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        parent_rows = Parent.objects.bulk_create(
+            (Parent(user=user, full_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}")
+             for user in users),
+            batch_size=BATCH_SIZE,
+        )
+        child_rows = Child.objects.bulk_create(
+            (
+                Child(
+                    parent=rng.choice(parent_rows),
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    year_group=rng.randint(0, 13),
+                )
+                for _ in range(children)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+        meals = list(Meal.objects.filter(name__in=MEAL_NAMES))
+        known = {meal.name for meal in meals}
+        meals += Meal.objects.bulk_create(
+            Meal(name=name) for name in MEAL_NAMES if name not in known
+        )
+        popularity = [rng.uniform(0.5, 3.0) for _ in meals]
+
+        registrations = MealRegistration.objects.bulk_create(
+            (MealRegistration(date=day) for day in school_days(start, dates)),
+            batch_size=BATCH_SIZE,
+        )
+        menus = {
+            registration.id: rng.sample(range(len(meals)), min(meals_per_day, len(meals)))
+            for registration in registrations
+        }
+        Through = MealRegistration.meals.through
+        Through.objects.bulk_create(
+            (
+                Through(mealregistration_id=registration_id, meal_id=meals[index].id)
+                for registration_id, indexes in menus.items()
+                for index in indexes
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+        def choices():
+            for registration_id, indexes in menus.items():
+                weights = [popularity[index] for index in indexes]
+                for child in child_rows:
+                    if rng.random() < density:
+                        index = rng.choices(indexes, weights)[0]
+                        yield MealChoice(
+                            child_id=child.id,
+                            meal_registration_id=registration_id,
+                            meal_id=meals[index].id,
+                        )
+
+        created_choices = 0
+        batch = []
+        for choice in choices():
+            batch.append(choice)
+            if len(batch) == BATCH_SIZE:
+                MealChoice.objects.bulk_create(batch)
+                created_choices += len(batch)
+                batch = []
+        MealChoice.objects.bulk_create(batch)
+        created_choices += len(batch)
+
+        rebuild_totals()
+        bump_menu_version()
+
+    return {
+        "parents": len(parent_rows),
+        "children": len(child_rows),
+        "registrations": len(registrations),
+        "choices": created_choices,
+    }
@@ -0,0 +1,26 @@
+import time
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+PRUNE_CHUNK_SIZE = 1000
+
+
+def prune_expired_sessions(chunk_size=PRUNE_CHUNK_SIZE, pause=0.0, now=None):
+    """
+    Delete expired rows from django_session a chunk at a time, so a large
+    backlog never holds long locks or one huge transaction. Returns the
+    number of sessions removed.
+    """
+    now = now or timezone.now()
+    removed = 0
+    while True:
+        keys = list(
+            Session.objects.filter(expire_date__lt=now)
+            .order_by()
+            .values_list("session_key", flat=True)[:chunk_size]
+        )
+        if not keys:
+            return removed
+        removed += Session.objects.filter(session_key__in=keys).delete()[0]
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,79 @@
+from collections import Counter
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Meal, MealChoice, MealRegistration, Parent
+from .menus import bump_menu_version
+from .middleware import get_or_create_parent, remember_parent
+from .totals import apply_total_changes
+
+
+@receiver(pre_save, sender=MealChoice)
+def remember_previous_choice(sender, instance, raw=False, **kwargs):
+    """Record the row being replaced so post_save can move its total."""
+    instance._previous_total_key = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._previous_total_key = (
+        MealChoice.objects.filter(pk=instance.pk)
+        .values_list("meal_registration_id", "meal_id")
+        .first()
+    )
+
+
+@receiver(post_save, sender=MealChoice)
+def count_saved_choice(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    changes = Counter()
+    previous = getattr(instance, "_previous_total_key", None)
+    if previous:
+        changes[previous] -= 1
+    changes[(instance.meal_registration_id, instance.meal_id)] += 1
+    apply_total_changes(changes)
+
+
+@receiver(post_delete, sender=MealChoice)
+def count_deleted_choice(sender, instance, **kwargs):
+    apply_total_changes({(instance.meal_registration_id, instance.meal_id): -1})
+
+
+@receiver(post_save, sender=MealRegistration)
+@receiver(post_delete, sender=MealRegistration)
+@receiver(post_save, sender=Meal)
+@receiver(post_delete, sender=Meal)
+def invalidate_menus(sender, raw=False, **kwargs):
+    if not raw:
+        bump_menu_version()
+
+
+@receiver(m2m_changed, sender=MealRegistration.meals.through)
+def invalidate_menus_on_meal_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        # post_clear gets no pk_set, so note the menus the meal is leaving.
+        instance._cleared_registration_ids = list(
+            sender.objects.filter(meal=instance).values_list("mealregistration_id", flat=True)
+        )
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_menu_version()
+        # Changing a menu changes its registration for reports' ETag.
+        if not reverse:
+            ids = [instance.pk]
+        elif action == "post_clear":
+            ids = getattr(instance, "_cleared_registration_ids", ())
+        else:
+            ids = pk_set or ()
+        if ids:
+            MealRegistration.objects.filter(pk__in=ids).update(updated_at=timezone.now())
+
+
+@receiver(user_logged_in)
+def remember_parent_on_login(sender, request, user, **kwargs):
+    """Create the parent profile at login so request.parent never has to."""
+    if request is None or not hasattr(request, "session"):
+        return
+    if user.is_staff and not Parent.objects.filter(user=user).exists():
+        # Staff only get a profile if they actually use the ordering pages.
+        return
+    remember_parent(request, get_or_create_parent(user))
@@ -0,0 +1,123 @@
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.utils import timezone
+from .models import MealChoice, MealRegistration, StandingOrder
+from .ordering import lock_children
+from .totals import apply_total_changes
+
+BATCH_SIZE = 500
+
+
+def choose_meal(preferences, menu):
+    """
+    The first of ``preferences`` (meal ids, or None for the first option)
+    that is on ``menu``, a list of meal ids in menu order; None if none is.
+    """
+    for meal_id in preferences:
+        if meal_id is None:
+            if menu:
+                return menu[0]
+        elif meal_id in menu:
+            return meal_id
+    return None
+
+
+def load_preferences():
+    """
+    Every child's standing orders as ``{child_id: {weekday: [meal ids]}}``,
+    each list already in the order it should be tried: the rows for that
+    weekday by rank, then the every-day rows by rank. Costs one query.
+    """
+    by_day = defaultdict(lambda: defaultdict(list))
+    every_day = defaultdict(list)
+    rows = (
+        StandingOrder.objects.filter(child__is_active=True)
+        .order_by("child_id", "rank", "id")
+        .values_list("child_id", "weekday", "meal_id")
+    )
+    for child_id, weekday, meal_id in rows:
+        if weekday is None:
+            every_day[child_id].append(meal_id)
+        else:
+            by_day[child_id][weekday].append(meal_id)
+    return {
+        child_id: {
+            weekday: by_day[child_id][weekday] + every_day[child_id]
+            for weekday in range(5)
+        }
+        for child_id in set(by_day) | set(every_day)
+    }
+
+
+def expand_standing_orders(registrations=None, today=None, batch_size=BATCH_SIZE):
+    """
+    Turn standing orders into MealChoice rows for ``registrations``, by
+    default every upcoming date whose standing orders have not been applied
+    yet.
+
+    The menus and the standing orders are read with one query each. The
+    children are then locked (see ordering.lock_children()) and the choices
+    they already have read under that lock, so a choice a parent already
+    made always wins and an order placed meanwhile waits for this run. Only
+    the missing choices are inserted, in batches, and the totals are moved
+    by those rows alone. Dates with a menu are then marked as applied, so a
+    later run never brings back a choice that a parent has since removed.
+
+    Returns a dict with the number of registrations expanded, the choices
+    the standing orders asked for and the choices actually created.
+    """
+    if registrations is None:
+        today = today or timezone.now().date()
+        registrations = MealRegistration.objects.filter(
+            date__gte=today, standing_orders_applied=False
+        )
+    dates = dict(registrations.values_list("id", "date"))
+    menus = defaultdict(list)
+    Through = MealRegistration.meals.through
+    rows = (
+        Through.objects.filter(mealregistration_id__in=list(dates))
+        .values_list("mealregistration_id", "meal_id")
+        .order_by("id")
+    )
+    for registration_id, meal_id in rows:
+        menus[registration_id].append(meal_id)
+    registration_ids = sorted(menus)
+    result = {"registrations": len(registration_ids), "requested": 0, "created": 0}
+    if not registration_ids:
+        return result
+
+    preferences = load_preferences()
+    choices = []
+    for registration_id in registration_ids:
+        menu = menus[registration_id]
+        weekday = dates[registration_id].weekday()
+        for child_id, by_day in preferences.items():
+            meal_id = choose_meal(by_day.get(weekday, ()), menu)
+            if meal_id is not None:
+                choices.append(MealChoice(
+                    child_id=child_id, meal_registration_id=registration_id, meal_id=meal_id
+                ))
+    result["requested"] = len(choices)
+
+    with transaction.atomic():
+        lock_children(sorted(preferences))
+        stored = set(
+            MealChoice.objects.filter(
+                meal_registration_id__in=registration_ids, child_id__in=list(preferences)
+            ).values_list("child_id", "meal_registration_id")
+        )
+        choices = [
+            choice for choice in choices
+            if (choice.child_id, choice.meal_registration_id) not in stored
+        ]
+        for start in range(0, len(choices), batch_size):
+            MealChoice.objects.bulk_create(choices[start:start + batch_size])
+        result["created"] = len(choices)
+        # bulk_create sends no signals, so move the totals here.
+        apply_total_changes(Counter(
+            (choice.meal_registration_id, choice.meal_id) for choice in choices
+        ))
+        MealRegistration.objects.filter(id__in=registration_ids).update(
+            standing_orders_applied=True
+        )
+    return result
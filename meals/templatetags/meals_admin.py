@@ -0,0 +1,45 @@
+from django import template
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.contrib.admin.templatetags.base import InclusionAdminNode
+from meals.models import DailyMealTotal
+
+register = template.Library()
+
+
+class TotalsChangeList:
+    """A ChangeList whose date hierarchy queries go to another queryset."""
+
+    def __init__(self, changelist, queryset):
+        self._changelist = changelist
+        self.queryset = queryset
+
+    def __getattr__(self, name):
+        return getattr(self._changelist, name)
+
+
+def totals_date_hierarchy(cl):
+    """
+    The admin date hierarchy for a list of choices, with its years, months
+    and days read from the daily totals (one row per meal and date) instead
+    of a DISTINCT over every choice in the list. Other filters are not
+    applied to the options, so a day may be offered that the current
+    filters leave empty.
+    """
+    field = cl.date_hierarchy
+    totals = DailyMealTotal.objects.filter(count__gt=0)
+    for part in ("year", "month", "day"):
+        lookup = f"{field}__{part}"
+        if cl.params.get(lookup):
+            totals = totals.filter(**{lookup: cl.params[lookup]})
+    return date_hierarchy(TotalsChangeList(cl, totals))
+
+
+@register.tag(name="totals_date_hierarchy")
+def totals_date_hierarchy_tag(parser, token):
+    return InclusionAdminNode(
+        parser,
+        token,
+        func=totals_date_hierarchy,
+        template_name="date_hierarchy.html",
+        takes_context=False,
+    )
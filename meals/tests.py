@@ -1,9 +1,57 @@
-from django.test import TestCase
+import asyncio
+import json
+import sqlite3
+import os
+import tempfile
+import time
+import traceback
+import zipfile
+from collections import Counter
+from unittest import mock
+from io import BytesIO, StringIO
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from django.core.paginator import EmptyPage
+from django.test import LiveServerTestCase, TestCase
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import connection, transaction, IntegrityError
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.utils import timezone
-from datetime import timedelta
-from .models import Parent, Child, Meal, MealRegistration, MealChoice
+from django.utils.http import http_date
+from datetime import date, timedelta
+from .models import (
+    Parent, Child, Meal, MealRegistration, MealChoice, DailyMealTotal, StandingOrder,
+    ArchivedMealChoice, MealChoiceRollup, DeletionTask, Job,
+)
+from .forms import MealChoiceForm, MenuFragment, UserParentRegistrationForm
+from .ordering import lock_children, next_unordered_date, save_meal_choices
+from .totals import verify_totals, rebuild_totals
+from .history import history_page
+from .deletion import request_account_deletion, request_child_deletion, run_deletion, run_task, MAX_ATTEMPTS
+from .jobs import backoff, claim_jobs, enqueue, job, run_job, work
+from .hashers import hashers_for
+from .menus import LOCAL_VERSION_TTL, MENU_VERSION_KEY, menu_for_date, menu_version, bump_menu_version
+from .middleware import PARENT_SESSION_KEY
+from .backends import apply_connection_mode
+from .backends.pool import ConnectionPool
+from .planning import plan_term, rotation_from_weeks
+from .batch import MAX_CELLS
+from .standing import expand_standing_orders
+from .forecasting import forecast, forecast_rows, load_demand
+from .pagination import EstimatedCountPaginator
+from .archive import archive_choices, archive_cutoff
+from .contention import order_integrity
+from .loadtest import ORDERED, Family, run_rush
+from .exports import filter_choices, stream_csv
+from .reports import report_etag, report_rows, report_state
+from . import views
+from . import urls as meals_urls
 
 
 class MealAppFlowsTest(TestCase):
@@ -88,6 +136,10 @@ class MealAppFlowsTest(TestCase):
         resp = self.client.post(reverse('delete_account'), follow=True)
 
         self.assertEqual(resp.status_code, 200)
+        # The account is locked at once; its rows go when the worker runs.
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
+        self.assertFalse(self.client.login(username='parent1', password='pass1234'))
+        call_command('run_worker', once=True, threads=1, stdout=StringIO())
         self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
         self.assertFalse(Parent.objects.filter(pk=self.parent.pk).exists())
         self.assertFalse(Child.objects.filter(parent=self.parent).exists())
@@ -96,3 +148,1406 @@ class MealAppFlowsTest(TestCase):
         redirect_resp = self.client.get(self.order_url)
         self.assertEqual(redirect_resp.status_code, 302)
         self.assertIn(reverse('login'), redirect_resp.url)
+
+    def test_next_unordered_date_waits_for_every_child(self):
+        child_ids = [self.child1.id, self.child2.id]
+        self.assertEqual(next_unordered_date(child_ids), self.date1)
+
+        MealChoice.objects.create(child=self.child1, meal_registration=self.reg1, meal=self.meal_a)
+        self.assertEqual(next_unordered_date(child_ids), self.date1)
+
+        MealChoice.objects.create(child=self.child2, meal_registration=self.reg1, meal=self.meal_b)
+        self.assertEqual(next_unordered_date(child_ids), self.date2)
+
+        MealChoice.objects.create(child=self.child1, meal_registration=self.reg2, meal=self.meal_a)
+        MealChoice.objects.create(child=self.child2, meal_registration=self.reg2, meal=self.meal_a)
+        self.assertIsNone(next_unordered_date(child_ids))
+
+    def test_meal_ordering_query_count_does_not_grow_with_dates(self):
+        self.client.login(username='parent1', password='pass1234')
+        self.client.get(self.order_url)  # warm the menu cache
+        with CaptureQueriesContext(connection) as few_dates:
+            self.client.get(self.order_url)
+
+        start = self.date2 + timedelta(days=1)
+        for offset in range(20):
+            reg = MealRegistration.objects.create(date=start + timedelta(days=offset))
+            reg.meals.add(self.meal_a)
+            for child in (self.child1, self.child2):
+                MealChoice.objects.create(child=child, meal_registration=reg, meal=self.meal_a)
+        self.client.get(self.order_url)
+        with CaptureQueriesContext(connection) as many_dates:
+            self.client.get(self.order_url)
+
+        self.assertEqual(len(many_dates), len(few_dates))
+
+    def test_meal_ordering_query_count_does_not_grow_with_children(self):
+        MealChoice.objects.create(child=self.child1, meal_registration=self.reg1, meal=self.meal_a)
+        self.client.login(username='parent1', password='pass1234')
+        url = f"{self.order_url}?date={self.date1.strftime('%Y-%m-%d')}"
+        self.client.get(url)  # warm the menu cache
+        with CaptureQueriesContext(connection) as two_children:
+            resp = self.client.get(url)
+        self.assertRegex(
+            resp.content.decode(),
+            rf'name="{self.child1.id}-meal" value="{self.meal_a.id}"[^>]* checked',
+        )
+
+        for i in range(4):
+            child = Child.objects.create(parent=self.parent, first_name=f'Kid{i}', last_name='Smith', year_group=i)
+            MealChoice.objects.create(child=child, meal_registration=self.reg1, meal=self.meal_b)
+        with CaptureQueriesContext(connection) as six_children:
+            self.client.get(url)
+
+        self.assertEqual(len(six_children), len(two_children))
+
+    def test_meal_choice_form_rejects_meal_outside_menu(self):
+        other = Meal.objects.create(name='Off menu')
+        form = MealChoiceForm({'meal': str(other.id)}, meals=[self.meal_a, self.meal_b])
+        self.assertFalse(form.is_valid())
+        form = MealChoiceForm({'meal': str(self.meal_b.id)}, meals=[self.meal_a, self.meal_b])
+        with self.assertNumQueries(0):
+            self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['meal'], self.meal_b)
+
+    def test_menu_fragment_matches_the_rendered_field(self):
+        meals = [self.meal_a, self.meal_b, Meal.objects.create(name='Fish & "chips"')]
+        fragment = MenuFragment(meals)
+        cases = [
+            ({}, None),
+            ({'initial': {'meal': self.meal_b.id}}, None),
+            ({}, {'7-meal': str(meals[2].id)}),
+            ({}, {'7-meal': 'nonsense'}),
+        ]
+        for kwargs, data in cases:
+            form = MealChoiceForm(data, meals=meals, prefix='7', **kwargs)
+            if data:
+                form.is_valid()
+            self.assertEqual(fragment.render('7', form['meal'].value()), str(form['meal']))
+
+    def test_meal_ordering_renders_each_menu_once(self):
+        for i in range(3):
+            Child.objects.create(parent=self.parent, first_name=f'Kid{i}', last_name='Smith', year_group=i)
+        self.client.login(username='parent1', password='pass1234')
+        url = f"{self.order_url}?date={self.date1.strftime('%Y-%m-%d')}"
+        self.client.get(url)
+        resp = self.client.get(url)
+        self.assertContains(resp, f'name="{self.child2.id}-meal"', count=2)
+        self.assertEqual([t.name for t in resp.templates if t.name.startswith('django/forms/')], [])
+
+    def test_reposting_meal_choices_updates_in_place(self):
+        self.client.login(username='parent1', password='pass1234')
+        url = f"{self.order_url}?date={self.date1.strftime('%Y-%m-%d')}"
+        self.client.post(url, {f'{self.child1.id}-meal': self.meal_a.id, f'{self.child2.id}-meal': self.meal_a.id})
+        self.client.post(url, {f'{self.child1.id}-meal': self.meal_b.id, f'{self.child2.id}-meal': self.meal_a.id})
+
+        choices = MealChoice.objects.filter(meal_registration=self.reg1)
+        self.assertEqual(choices.count(), 2)
+        self.assertEqual(choices.get(child=self.child1).meal, self.meal_b)
+
+    def test_save_meal_choices_reports_created_and_updated(self):
+        MealChoice.objects.create(child=self.child1, meal_registration=self.reg1, meal=self.meal_a)
+        created, updated = save_meal_choices(
+            self.reg1, {self.child1.id: self.meal_b, self.child2.id: self.meal_b}
+        )
+        self.assertEqual((created, updated), (1, 1))
+        self.assertEqual(MealChoice.objects.filter(meal_registration=self.reg1, meal=self.meal_b).count(), 2)
+
+    def test_save_meal_choices_reads_what_is_stored_not_what_the_form_saw(self):
+        # The page was loaded with no choice; another tab then ordered meal A.
+        MealChoice.objects.create(child=self.child1, meal_registration=self.reg1, meal=self.meal_a)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(save_meal_choices(self.reg1, {self.child1.id: self.meal_b}), (0, 1))
+        self.assertIn('meals_child', queries[1]['sql'])
+        self.assertEqual(save_meal_choices(self.reg1, {self.child1.id: self.meal_b}), (0, 1))
+        self.assertEqual(MealChoice.objects.get(child=self.child1, meal_registration=self.reg1).meal, self.meal_b)
+        self.assertEqual(verify_totals(), [])
+
+    def test_duplicate_meal_choice_is_rejected(self):
+        MealChoice.objects.create(child=self.child1, meal_registration=self.reg1, meal=self.meal_a)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            MealChoice.objects.create(child=self.child1, meal_registration=self.reg1, meal=self.meal_b)
+
+    def test_daily_totals_follow_choice_writes(self):
+        choice = MealChoice.objects.create(child=self.child1, meal_registration=self.reg1, meal=self.meal_a)
+        save_meal_choices(self.reg1, {self.child2.id: self.meal_a})
+        self.assertEqual(self.reg1.meal_totals.get(meal=self.meal_a).count, 2)
+
+        choice.meal = self.meal_b
+        choice.save()
+        self.assertEqual(self.reg1.meal_totals.get(meal=self.meal_a).count, 1)
+        self.assertEqual(self.reg1.meal_totals.get(meal=self.meal_b).count, 1)
+
+        self.child2.delete()
+        choice.delete()
+        self.assertFalse(self.reg1.meal_totals.filter(count__gt=0).exists())
+        self.assertEqual(verify_totals(), [])
+
+    def test_rebuild_meal_totals_command_repairs_drift(self):
+        MealChoice.objects.create(child=self.child1, meal_registration=self.reg1, meal=self.meal_a)
+        DailyMealTotal.objects.update(count=5)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_meal_totals', '--verify-only', stdout=StringIO(), stderr=StringIO())
+        call_command('rebuild_meal_totals', stdout=StringIO())
+        self.assertEqual(self.reg1.meal_totals.get(meal=self.meal_a).count, 1)
+
+    def test_meals_for_day_reads_daily_totals(self):
+        MealChoice.objects.create(child=self.child1, meal_registration=self.reg1, meal=self.meal_a)
+        MealChoice.objects.create(child=self.child2, meal_registration=self.reg1, meal=self.meal_a)
+        User.objects.create_superuser(username='kitchen', password='pass1234', email='k@example.com')
+        self.client.login(username='kitchen', password='pass1234')
+        resp = self.client.get(reverse('admin:meals-for-day'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['date'], self.date1)
+        self.assertEqual(list(resp.context['meal_totals']), [{'meal__name': 'Meal A', 'total': 2}])
+
+    def test_admin_meal_orders_lists_a_days_orders_for_staff_only(self):
+        MealChoice.objects.create(child=self.child1, meal_registration=self.reg2, meal=self.meal_b)
+        url = reverse('admin_meal_orders')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.login(username='parent1', password='pass1234')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(User.objects.create_superuser(username='kitchen', email='k@example.com'))
+        resp = self.client.get(url, {'date': self.date2.isoformat()})
+        self.assertEqual(resp.context['selected_date'], self.date2)
+        self.assertEqual([choice.child for choice in resp.context['choices']], [self.child1])
+        self.assertEqual(resp.context['totals_items'], [('Meal B', 1)])
+
+    def test_export_orders_streams_csv_and_xlsx(self):
+        MealChoice.objects.create(child=self.child1, meal_registration=self.reg1, meal=self.meal_a)
+        MealChoice.objects.create(child=self.child2, meal_registration=self.reg2, meal=self.meal_b)
+        User.objects.create_superuser(username='kitchen', password='pass1234', email='k@example.com')
+        self.client.login(username='kitchen', password='pass1234')
+        params = {'start': self.date1.isoformat(), 'end': self.date2.isoformat()}
+
+        resp = self.client.get(reverse('admin:export-orders'), {**params, 'format': 'csv', 'year_group': 3})
+        self.assertTrue(resp.streaming)
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        self.assertEqual(lines[1], f'{self.date1.isoformat()},3,Smith,Alice,Meal A')
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(lines[-1], f'{self.date1.isoformat()},Meal A,1')
+
+        # Names a spreadsheet would run as formulas are exported as text.
+        Meal.objects.filter(pk=self.meal_a.pk).update(name='=HYPERLINK("http://x","Meal A")')
+        Child.objects.filter(pk=self.child1.pk).update(first_name='@Alice', last_name='-Smith')
+        resp = self.client.get(reverse('admin:export-orders'), {**params, 'format': 'csv', 'year_group': 3})
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        self.assertEqual(lines[1], f'{self.date1.isoformat()},3,\'-Smith,\'@Alice,"\'=HYPERLINK(""http://x"",""Meal A"")"')
+        self.assertEqual(lines[-1], f'{self.date1.isoformat()},"\'=HYPERLINK(""http://x"",""Meal A"")",1')
+
+        resp = self.client.get(reverse('admin:export-orders'), {**params, 'format': 'xlsx'})
+        with zipfile.ZipFile(BytesIO(b''.join(resp.streaming_content))) as workbook:
+            self.assertIn('Alice', workbook.read('xl/worksheets/sheet1.xml').decode())
+            self.assertIn('Meal B', workbook.read('xl/worksheets/sheet2.xml').decode())
+
+    async def test_export_orders_streams_asynchronously_under_asgi(self):
+        await MealChoice.objects.acreate(child=self.child1, meal_registration=self.reg1, meal=self.meal_a)
+        staff = await User.objects.acreate(username='kitchen', is_staff=True, is_superuser=True)
+        await sync_to_async(self.async_client.force_login)(staff)
+        params = {'start': self.date1.isoformat(), 'end': self.date2.isoformat(), 'format': 'csv'}
+
+        resp = await self.async_client.get(reverse('admin:export-orders'), params)
+        self.assertTrue(resp.is_async)
+        body = b''.join([chunk async for chunk in resp.streaming_content]).decode()
+        self.assertEqual(body.splitlines()[1], f'{self.date1.isoformat()},3,Smith,Alice,Meal A')
+
+    def test_history_pages_with_keyset_cursor(self):
+        today = timezone.now().date()
+        past = MealRegistration.objects.create(date=today - timedelta(days=3))
+        MealChoice.objects.create(child=self.child1, meal_registration=past, meal=self.meal_a)
+        for reg in (self.reg1, self.reg2):
+            for child in (self.child1, self.child2):
+                MealChoice.objects.create(child=child, meal_registration=reg, meal=self.meal_b)
+
+        first, cursor = history_page(self.parent, today, page_size=3)
+        self.assertEqual(len(first), 3)
+        self.assertIsNotNone(cursor)
+        rest, cursor = history_page(self.parent, today, cursor=cursor, page_size=3)
+        self.assertEqual(len(rest), 1)
+        self.assertIsNone(cursor)
+        self.assertEqual([c.meal_registration.date for c in first + rest], [self.date1] * 2 + [self.date2] * 2)
+
+        self.client.login(username='parent1', password='pass1234')
+        resp = self.client.get(self.history_url, {'view': 'past'})
+        self.assertEqual([c.meal_registration_id for c in resp.context['choices']], [past.id])
+        self.assertContains(resp, 'Locked')
+
+    def test_menu_cache_serves_repeat_lookups_and_follows_edits(self):
+        menu = menu_for_date(self.date1)
+        self.assertEqual(set(menu.meals.all()), {self.meal_a, self.meal_b})
+        version = menu_version()
+        with self.assertNumQueries(0):
+            self.assertIs(menu_for_date(self.date1, version), menu)
+            self.assertEqual(list(menu.meals.all()), list(menu.meals.all()))
+
+        self.reg1.meals.remove(self.meal_b)
+        self.assertNotEqual(menu_version(), version)
+        self.assertEqual(list(menu_for_date(self.date1).meals.all()), [self.meal_a])
+        self.assertIsNone(menu_for_date(self.date2 + timedelta(days=30)))
+
+    def test_menu_version_is_read_from_the_shared_cache_only_when_the_local_copy_expires(self):
+        version = menu_version()
+        with self.assertNumQueries(0):
+            self.assertEqual(menu_version(), version)
+        # Another worker bumps the stamp; this one sees it once its copy expires.
+        cache.set(MENU_VERSION_KEY, 'bumped-elsewhere', timeout=None)
+        self.assertEqual(menu_version(), version)
+        later = time.monotonic() + LOCAL_VERSION_TTL
+        with mock.patch('meals.menus.time.monotonic', return_value=later):
+            self.assertEqual(menu_version(), 'bumped-elsewhere')
+
+
+class QueryRecorder:
+    """
+    Record every SQL statement run on the default connection together with
+    the project frames (outside Django and the test module) that issued it.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        frames = [
+            f'{os.path.relpath(frame.filename, settings.BASE_DIR)}:{frame.lineno} in {frame.name}'
+            for frame in traceback.extract_stack()
+            if frame.filename.startswith(str(settings.BASE_DIR))
+            and not frame.filename.endswith('tests.py')
+        ]
+        self.queries.append((sql, frames[-3:]))
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def grown_since(self, baseline):
+        """Describe statements that ran more often here than in ``baseline``."""
+        before = Counter(sql for sql, _ in baseline.queries)
+        after = Counter(sql for sql, _ in self.queries)
+        lines = []
+        for sql, count in after.items():
+            if count > before[sql]:
+                sites = {' <- '.join(reversed(frames)) for s, frames in self.queries if s == sql}
+                lines.append(f'{before[sql]} -> {count} x {sql}')
+                lines.extend(f'    at {site}' for site in sorted(sites))
+        return '\n'.join(lines)
+
+
+def seed_family(user, size, today):
+    """
+    Give ``user`` a parent profile with ``size`` children, ``size`` past and
+    ``size + 3`` upcoming menus of three meals, and a choice for every child
+    on every date except the last one.
+    """
+    parent = Parent.objects.create(user=user, full_name='Budget Parent')
+    children = Child.objects.bulk_create(
+        Child(parent=parent, first_name=f'Kid{i}', last_name='Budget', year_group=i % 14)
+        for i in range(size)
+    )
+    meals = Meal.objects.bulk_create(Meal(name=f'Budget meal {i}') for i in range(3))
+    registrations = MealRegistration.objects.bulk_create(
+        MealRegistration(date=today + timedelta(days=offset)) for offset in range(-size, size + 3)
+    )
+    MealRegistration.meals.through.objects.bulk_create(
+        MealRegistration.meals.through(mealregistration=reg, meal=meal)
+        for reg in registrations for meal in meals
+    )
+    MealChoice.objects.bulk_create(
+        MealChoice(child=child, meal_registration=reg, meal=meals[(child.id + reg.id) % 3])
+        for reg in registrations[:-1] for child in children
+    )
+    rebuild_totals()
+    bump_menu_version()
+    return parent, children, meals, registrations
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Every page must run a fixed number of queries however many children,
+    dates and orders exist. Each scenario is measured warm (after one
+    identical request) against families of 1, 10 and 100 children/dates.
+    """
+
+    SIZES = (1, 10, 100)
+
+    # url name (':post' for the POST variant) -> maximum queries per warm request
+    BUDGETS = {
+        'login': 2,
+        'register_parent': 2,
+        'logout': 4,
+        'meal_ordering': 6,
+        'meal_ordering:post': 10,
+        'order_batch': 12,
+        'order_report': 6,
+        'add_child': 4,
+        'child_list': 3,
+        'edit_child': 5,
+        'delete_child': 5,
+        'meal_choice_history': 3,
+        'admin_meal_orders': 4,
+        'edit_meal_choice': 6,
+        'delete_meal_choice': 8,
+        'delete_account': 2,
+        'admin:meals-for-day': 6,
+        'admin:export-orders': 6,
+    }
+
+    STAFF_VIEWS = ('admin:', 'admin_meal_orders', 'order_report')
+
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.user = User.objects.create_user(username='budget', password='pass1234')
+        self.staff = User.objects.create_superuser(username='kitchen', password='pass1234', email='k@example.com')
+
+    def prepare(self, name, data):
+        """Look up everything the request needs and return it unsent."""
+        parent, children, meals, registrations = data
+        upcoming = next(reg for reg in registrations if reg.date > self.today)
+        url_name = name.removesuffix(':post')
+        if url_name in ('edit_child', 'delete_child'):
+            return lambda: self.client.get(reverse(url_name, args=[children[0].id]))
+        if url_name in ('edit_meal_choice', 'delete_meal_choice'):
+            choice = MealChoice.objects.filter(meal_registration__date__gt=self.today).last()
+            return lambda: self.client.get(reverse(url_name, args=[choice.id]))
+        if name == 'meal_ordering:post':
+            url = f'{reverse(url_name)}?date={upcoming.date}'
+            post_data = {f'{child.id}-meal': meals[1].id for child in children}
+            return lambda: self.client.post(url, post_data)
+        if url_name == 'order_batch':
+            # Alternate the meal so the measured request changes every cell.
+            self.batch_round = getattr(self, 'batch_round', 0) + 1
+            meal = meals[self.batch_round % 2]
+            # Two dates keep 100 children inside one SQLite bulk insert batch.
+            dates = [reg.date for reg in registrations if reg.date > self.today][-2:]
+            body = json.dumps({'orders': [
+                {'child': child.id, 'date': str(day), 'meal': meal.id} for day in dates for child in children
+            ]})
+            return lambda: self.client.post(reverse(url_name), body, content_type='application/json')
+        if url_name == 'order_report':
+            params = {'start': registrations[0].date, 'end': registrations[-1].date,
+                      'group_by': 'date,meal,year_group'}
+            return lambda: self.client.get(reverse(url_name), params)
+        if url_name == 'admin:export-orders':
+            params = {'start': registrations[0].date, 'end': registrations[-1].date, 'format': 'csv'}
+            return lambda: b''.join(self.client.get(reverse(url_name), params).streaming_content)
+        return lambda: self.client.get(reverse(url_name))
+
+    def measure(self, name, size):
+        with transaction.atomic():
+            data = seed_family(self.user, size, self.today)
+            user = self.staff if name.startswith(self.STAFF_VIEWS) else self.user
+            self.client.force_login(user)
+            self.prepare(name, data)()
+            self.client.force_login(user)
+            send = self.prepare(name, data)
+            with QueryRecorder() as recorder:
+                send()
+            transaction.set_rollback(True)
+        return recorder
+
+    def test_budgets_cover_every_url(self):
+        names = {pattern.name for pattern in meals_urls.urlpatterns}
+        self.assertEqual(names - set(self.BUDGETS), set())
+
+    def test_query_counts_do_not_grow_with_data(self):
+        for name, budget in self.BUDGETS.items():
+            with self.subTest(view=name):
+                runs = [self.measure(name, size) for size in self.SIZES]
+                smallest = runs[0]
+                for size, run in zip(self.SIZES, runs):
+                    self.assertLessEqual(
+                        len(run), budget,
+                        f'{name} ran {len(run)} queries with {size} children/dates '
+                        f'(budget {budget}):\n' + '\n'.join(sql for sql, _ in run.queries),
+                    )
+                    self.assertEqual(
+                        len(run), len(smallest),
+                        f'{name} ran {len(smallest)} queries at size {self.SIZES[0]} '
+                        f'but {len(run)} at size {size}:\n' + run.grown_since(smallest),
+                    )
+
+
+class SeedAndBenchmarkCommandTest(TestCase):
+    def test_seed_school_then_benchmark_against_baseline(self):
+        call_command('seed_school', parents=4, children=6, dates=10, density=1, stdout=StringIO())
+        self.assertEqual(Parent.objects.count(), 4)
+        self.assertEqual(MealRegistration.objects.count(), 10)
+        self.assertEqual(MealChoice.objects.count(), 60)
+        self.assertEqual(verify_totals(), [])
+        self.assertTrue(all(reg.date.weekday() < 5 for reg in MealRegistration.objects.all()))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = os.path.join(tmp, 'baseline.json')
+            call_command('benchmark_views', requests=2, warmup=1, output=baseline, stdout=StringIO())
+            with open(baseline) as fh:
+                results = json.load(fh)['results']
+            self.assertIn('meal_ordering', results)
+            self.assertGreater(results['meal_ordering']['queries'], 0)
+
+            call_command('benchmark_views', requests=2, warmup=1, compare=baseline,
+                         tolerance=1000, stdout=StringIO())
+
+
+class ParentMiddlewareTest(TestCase):
+    def test_login_creates_parent_and_pages_skip_the_lookup(self):
+        user = User.objects.create_user(username='newparent', password='pass1234', first_name='New', last_name='Parent')
+        resp = self.client.post(reverse('login'), {'username': 'newparent', 'password': 'pass1234'})
+        self.assertEqual(resp.status_code, 302)
+        parent = Parent.objects.get(user=user)
+        self.assertEqual(parent.full_name, 'New Parent')
+        self.assertEqual(self.client.session[PARENT_SESSION_KEY]['id'], parent.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('child_list'))
+        self.assertFalse(any('"meals_parent"' in query['sql'] for query in queries))
+
+    def test_session_from_another_user_is_not_trusted(self):
+        user = User.objects.create_user(username='p2', password='pass1234')
+        other = Parent.objects.create(user=User.objects.create_user(username='p3'), full_name='Other')
+        self.client.force_login(user)
+        session = self.client.session
+        session[PARENT_SESSION_KEY] = {'id': other.id, 'user_id': other.user_id, 'full_name': 'Other'}
+        session.save()
+        resp = self.client.get(reverse('child_list'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.client.session[PARENT_SESSION_KEY]['id'], Parent.objects.get(user=user).id)
+
+
+class SessionLayerTest(TestCase):
+    def test_prune_sessions_removes_only_expired_rows(self):
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(session_key=f'old{i}', session_data='', expire_date=now - timedelta(days=1))
+        Session.objects.create(session_key='live', session_data='', expire_date=now + timedelta(days=1))
+        call_command('prune_sessions', chunk_size=2, stdout=StringIO())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+
+    def test_benchmark_sessions_compares_every_mode(self):
+        call_command('seed_school', parents=1, children=2, dates=5, stdout=StringIO())
+        local = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-sessions'}
+        with tempfile.TemporaryDirectory() as tmp, override_settings(CACHES={**settings.CACHES, 'local': local}):
+            output = os.path.join(tmp, 'sessions.json')
+            call_command('benchmark_sessions', iterations=1, clear_cache=True, output=output, stdout=StringIO())
+            with open(output) as fh:
+                results = json.load(fh)['results']
+        self.assertGreater(results['db:history']['session_queries'], 0)
+        self.assertEqual(results['signed_cookies:history']['session_queries'], 0)
+        self.assertEqual(results['cache:history']['session_queries'], 0)
+
+
+class AsyncViewsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='parent1', password='pass1234')
+        self.parent = Parent.objects.create(user=self.user, full_name='Parent One')
+        self.child = Child.objects.create(parent=self.parent, first_name='Alice', last_name='Smith', year_group=3)
+        self.meal = Meal.objects.create(name='Meal A')
+        self.registration = MealRegistration.objects.create(date=timezone.now().date() + timedelta(days=1))
+        self.registration.meals.add(self.meal)
+        self.async_client.force_login(self.user)
+
+    def test_views_are_coroutines(self):
+        for view in (views.meal_ordering, views.meal_choice_history):
+            self.assertTrue(asyncio.iscoroutinefunction(view), view.__name__)
+
+    async def test_order_and_history_under_asgi(self):
+        url = f"{reverse('meal_ordering')}?date={self.registration.date}"
+        resp = await self.async_client.get(url)
+        self.assertContains(resp, 'Alice')
+        resp = await self.async_client.post(url, {f'{self.child.id}-meal': self.meal.id})
+        self.assertEqual(resp.status_code, 302)
+        resp = await self.async_client.get(reverse('meal_choice_history'))
+        self.assertContains(resp, 'Meal A')
+        self.assertEqual(await MealChoice.objects.filter(child=self.child).acount(), 1)
+
+    async def test_anonymous_users_are_sent_to_login(self):
+        await sync_to_async(self.async_client.logout)()
+        resp = await self.async_client.get(reverse('meal_choice_history'))
+        self.assertEqual(resp.status_code, 302)
+        self.assertIn(settings.LOGIN_URL, resp['Location'])
+
+
+# The live server speaks plain http, where a real client does not send
+# secure cookies back.
+@override_settings(SESSION_COOKIE_SECURE=False, CSRF_COOKIE_SECURE=False)
+class ConcurrencyBenchmarkTest(LiveServerTestCase):
+    def test_benchmark_concurrency_against_live_server(self):
+        call_command('seed_school', parents=2, children=3, dates=5, stdout=StringIO())
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'concurrency.json')
+            call_command(
+                'benchmark_concurrency', target=[f'live={self.live_server_url}'],
+                concurrency='2', rounds=2, output=output, stdout=StringIO(),
+            )
+            with open(output) as fh:
+                result = json.load(fh)['results']['live:2']
+        self.assertEqual(result['logged_in'], 2)
+        self.assertEqual(result['errors'], {})
+        self.assertEqual(result['requests'], 8)
+        self.assertEqual(set(result['steps']), {'meal_ordering', 'meal_choice_history'})
+
+
+class FileDatabaseLiveServerTestCase(LiveServerTestCase):
+    """
+    A threaded live server on a copy of the test database in a file. The
+    in-memory test database is one connection shared by every server
+    thread, so concurrent requests would trample each other's
+    transactions; with a file each thread opens its own connection and
+    the requests really run side by side.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.database_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.database_dir.name, 'live.sqlite3')
+        connection.ensure_connection()
+        copy = sqlite3.connect(path)
+        connection.connection.backup(copy)
+        copy.close()
+        # Keep the in-memory database open, as closing it would drop it.
+        cls.memory_connection, connection.connection = connection.connection, None
+        cls.memory_name, connection.settings_dict['NAME'] = connection.settings_dict['NAME'], path
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connection.close()
+        connection.settings_dict['NAME'] = cls.memory_name
+        connection.connection = cls.memory_connection
+        cls.database_dir.cleanup()
+
+
+@override_settings(SESSION_COOKIE_SECURE=False, CSRF_COOKIE_SECURE=False)
+class DeadlineRushTest(FileDatabaseLiveServerTestCase):
+
+    def test_every_family_orders_once_under_a_rush(self):
+        call_command('seed_school', parents=6, children=12, dates=6, stdout=StringIO())
+        registration = MealRegistration.objects.filter(date__gt=timezone.now().date()).order_by('date').first()
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'rush.json')
+            call_command(
+                'benchmark_deadline_rush', target=self.live_server_url, families=6,
+                fresh=True, strict=True, output=output, stdout=StringIO(),
+            )
+            with open(output) as fh:
+                document = json.load(fh)
+        result = document['results']['deadline_rush']
+        families = Parent.objects.filter(children__isnull=False).distinct().count()
+        self.assertEqual(document['date'], str(registration.date))
+        self.assertEqual(result['logged_in'], families)
+        self.assertEqual(result['outcomes'], {'ordered': families})
+        self.assertEqual(result['errors'], {})
+        self.assertEqual(set(result['steps']), {'order_page', 'order_post', 'next_date'})
+        self.assertEqual(
+            (result['duplicate_choices'], result['missing_choices'], result['total_mismatches']), (0, 0, 0)
+        )
+        self.assertIsNone(result['lock_waits'])
+        self.assertEqual(MealChoice.objects.filter(meal_registration=registration).count(), 12)
+
+
+    def test_racing_orders_for_one_child_leave_one_choice(self):
+        user = User.objects.create_user(username='parent1', password='pass1234')
+        parent = Parent.objects.create(user=user, full_name='Parent One')
+        child = Child.objects.create(parent=parent, first_name='Alice', last_name='Smith', year_group=3)
+        meals = [Meal.objects.create(name=f'Meal {n}') for n in range(4)]
+        registration = MealRegistration.objects.create(date=timezone.now().date() + timedelta(days=1))
+        registration.meals.set(meals)
+        # Eight tabs of one parent submit different meals for one child at once.
+        families = [Family('parent1', 'pass1234', {f'{child.id}-meal': meals[n % 4].id}) for n in range(8)]
+        result = run_rush(
+            self.live_server_url, families, f"{reverse('meal_ordering')}?date={registration.date}",
+            login_path=reverse('login'),
+        )
+        # They queue on the child's lock rather than fail, and the last one wins.
+        self.assertEqual(result['logged_in'], 8)
+        self.assertEqual(result['outcomes'], {ORDERED: 8})
+        self.assertIn(MealChoice.objects.get(child=child).meal, meals)
+        self.assertEqual(
+            order_integrity(registration.id, [child.id]),
+            {'duplicate_choices': 0, 'missing_choices': 0, 'total_mismatches': 0},
+        )
+
+
+class ConnectionModeTest(TestCase):
+    def test_modes_configure_the_database_settings(self):
+        postgres = {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'meals'}
+        pooled = apply_connection_mode(postgres, 'pool', pool_size=2)
+        self.assertEqual(pooled['ENGINE'], 'meals.backends.postgresql')
+        self.assertEqual((pooled['CONN_MAX_AGE'], pooled['POOL']['max_size']), (0, 2))
+        persistent = apply_connection_mode(postgres, 'persistent', max_age=60)
+        self.assertEqual((persistent['CONN_MAX_AGE'], persistent['CONN_HEALTH_CHECKS']), (60, True))
+        self.assertTrue(apply_connection_mode(postgres, 'pgbouncer')['DISABLE_SERVER_SIDE_CURSORS'])
+        sqlite = apply_connection_mode({'ENGINE': 'django.db.backends.sqlite3'}, 'pool')
+        self.assertEqual(sqlite['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(postgres, {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'meals'})
+        self.assertEqual(apply_connection_mode(postgres, 'per_request', asgi=True)['CONN_MAX_AGE'], 0)
+        with self.assertRaises(ImproperlyConfigured):
+            apply_connection_mode(postgres, 'persistent', asgi=True)
+
+    def test_pool_reuses_checks_and_caps_idle_connections(self):
+        pool = ConnectionPool(max_size=1)
+        connect = lambda: sqlite3.connect(':memory:')
+        first, second = pool.acquire(connect), pool.acquire(connect)
+        pool.release(first)
+        pool.release(second)
+        self.assertEqual((len(pool), pool.stats['discarded']), (1, 1))
+        self.assertIs(pool.acquire(connect), first)
+        pool.release(first)
+        self.assertIsNot(pool.acquire(connect, check=lambda conn: False), first)
+        self.assertEqual(pool.stats['created'], 3)
+
+    def test_pool_drops_connections_that_fail_their_reset(self):
+        pool = ConnectionPool(max_size=2)
+        connection = pool.acquire(lambda: sqlite3.connect(':memory:'))
+
+        def reset(conn):
+            conn.execute('DISCARD ALL')  # not SQL SQLite knows, so the reset fails
+
+        pool.release(connection, reset)
+        self.assertEqual((len(pool), pool.stats['discarded']), (0, 1))
+
+    def test_benchmark_connections_worker_counts_connects(self):
+        call_command('seed_school', parents=1, children=2, dates=5, stdout=StringIO())
+        out = StringIO()
+        call_command('benchmark_connections', worker=True, requests=4, stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertEqual(result['requests'], 4)
+        self.assertIn('connects_per_request', result)
+
+
+class TermPlanningTest(TestCase):
+    def setUp(self):
+        self.fish = Meal.objects.create(name='Fish fingers')
+        self.pasta = Meal.objects.create(name='Pasta bake')
+        self.monday = date(2027, 9, 6)
+
+    def test_rotation_skips_weekends_holidays_and_existing_menus(self):
+        MealRegistration.objects.create(date=self.monday + timedelta(days=1))
+        holidays = {self.monday + timedelta(days=7 + n) for n in range(5)}
+        rotation = [{0: [self.fish.id], 1: [self.fish.id]}, {0: [self.pasta.id, self.fish.id]}]
+        result = plan_term(self.monday, self.monday + timedelta(days=27), rotation, holidays)
+        self.assertEqual(result['registrations'], 4)
+        self.assertEqual(result['skipped'], [self.monday + timedelta(days=1)])
+        menus = {
+            reg.date: sorted(meal.name for meal in reg.meals.all())
+            for reg in MealRegistration.objects.prefetch_related('meals') if reg.meals.all()
+        }
+        # The holiday week does not use up the second rotation week.
+        self.assertEqual(menus, {
+            self.monday: ['Fish fingers'],
+            self.monday + timedelta(days=14): ['Fish fingers', 'Pasta bake'],
+            self.monday + timedelta(days=21): ['Fish fingers'],
+            self.monday + timedelta(days=22): ['Fish fingers'],
+        })
+
+    def test_full_year_copied_forward_with_two_inserts(self):
+        plan_term(self.monday, self.monday + timedelta(days=4),
+                  [{day: [self.fish.id, self.pasta.id] for day in range(5)}])
+        rotation = rotation_from_weeks(self.monday, 1)
+        with CaptureQueriesContext(connection) as queries:
+            result = plan_term(self.monday + timedelta(weeks=1), self.monday + timedelta(weeks=39, days=4), rotation)
+        self.assertEqual(result['registrations'], 39 * 5)
+        self.assertEqual(result['menu_rows'], 39 * 5 * 2)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(MealRegistration.meals.through.objects.count(), 40 * 5 * 2)
+
+    def test_admin_and_command_plan_a_term(self):
+        staff = User.objects.create_superuser(username='kitchen', password='pass1234', email='k@example.com')
+        self.client.force_login(staff)
+        resp = self.client.post(reverse('admin:plan-term'), {
+            'start': self.monday, 'end': self.monday + timedelta(days=13), 'weeks': 1,
+            'holidays': str(self.monday + timedelta(days=2)), 'mon': [self.fish.id], 'wed': [self.pasta.id],
+        })
+        self.assertRedirects(resp, reverse('admin:meals_mealregistration_changelist'))
+        self.assertEqual(MealRegistration.objects.count(), 3)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as fh:
+            json.dump([{'fri': ['Fish fingers']}], fh)
+        self.addCleanup(os.unlink, fh.name)
+        out = StringIO()
+        call_command('plan_term', start=str(self.monday), end=str(self.monday + timedelta(days=13)),
+                     rotation=fh.name, stdout=out)
+        self.assertIn('Created 2 menus', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('plan_term', start=str(self.monday), end=str(self.monday),
+                         copy_from=str(self.monday - timedelta(weeks=4)), stdout=StringIO())
+
+
+class BatchOrderApiTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='parent1', password='pass1234')
+        self.parent = Parent.objects.create(user=self.user, full_name='Parent One')
+        self.alice = Child.objects.create(parent=self.parent, first_name='Alice', last_name='Smith', year_group=3)
+        self.bob = Child.objects.create(parent=self.parent, first_name='Bob', last_name='Smith', year_group=5)
+        self.meal_a = Meal.objects.create(name='Meal A')
+        self.meal_b = Meal.objects.create(name='Meal B')
+        today = timezone.now().date()
+        self.dates = [today + timedelta(days=offset) for offset in range(1, 21)]
+        plan_term(self.dates[0], self.dates[-1],
+                  [{day: [self.meal_a.id, self.meal_b.id] for day in range(5)}])
+        self.menu_dates = list(MealRegistration.objects.order_by('date').values_list('date', flat=True))
+        self.url = reverse('order_batch')
+        self.client.force_login(self.user)
+
+    def post(self, orders):
+        return self.client.post(self.url, json.dumps({'orders': orders}), content_type='application/json')
+
+    def test_month_of_orders_in_one_request(self):
+        orders = [
+            {'child': child.id, 'date': str(day), 'meal': self.meal_a.id}
+            for day in self.menu_dates for child in (self.alice, self.bob)
+        ]
+        resp = self.post(orders)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['summary']['created'], len(orders))
+        self.assertEqual(MealChoice.objects.count(), len(orders))
+        self.assertEqual(verify_totals(), [])
+
+        orders[0]['meal'] = self.meal_b.id
+        summary = self.post(orders).json()['summary']
+        self.assertEqual((summary['updated'], summary['unchanged']), (1, len(orders) - 1))
+        self.assertEqual(verify_totals(), [])
+
+    def test_each_bad_cell_is_rejected_on_its_own(self):
+        other = Child.objects.create(
+            parent=Parent.objects.create(user=User.objects.create_user(username='p2'), full_name='Other'),
+            first_name='Eve', last_name='Other', year_group=1,
+        )
+        weekend = next(day for day in self.dates if day.weekday() == 5)
+        stranger = Meal.objects.create(name='Not on the menu')
+        day = str(self.menu_dates[0])
+        resp = self.post([
+            {'child': self.alice.id, 'date': day, 'meal': self.meal_a.id},
+            {'child': self.alice.id, 'date': day, 'meal': self.meal_b.id},
+            {'child': other.id, 'date': day, 'meal': self.meal_a.id},
+            {'child': self.bob.id, 'date': str(weekend), 'meal': self.meal_a.id},
+            {'child': self.bob.id, 'date': day, 'meal': stranger.id},
+            {'child': self.bob.id, 'date': str(timezone.now().date() - timedelta(days=1)), 'meal': self.meal_a.id},
+            {'child': self.bob.id, 'date': 'tomorrow', 'meal': self.meal_a.id},
+            'nonsense',
+        ])
+        results = resp.json()['results']
+        self.assertEqual([result['status'] for result in results], ['created'] + ['rejected'] * 7)
+        self.assertIn('Duplicate', results[1]['error'])
+        self.assertEqual(results[2]['error'], 'Unknown child.')
+        self.assertIn('no menu', results[3]['error'])
+        self.assertIn('not on the menu', results[4]['error'])
+        self.assertIn('past', results[5]['error'])
+        self.assertEqual(MealChoice.objects.count(), 1)
+
+    def test_duplicates_are_found_across_registrations_of_one_date(self):
+        day = self.menu_dates[0]
+        meal_c = Meal.objects.create(name='Meal C')
+        MealRegistration.objects.create(date=day).meals.set([meal_c])
+        results = self.post([
+            {'child': self.alice.id, 'date': str(day), 'meal': self.meal_a.id},
+            {'child': self.alice.id, 'date': str(day), 'meal': meal_c.id},
+        ]).json()['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'rejected'])
+        self.assertEqual(MealChoice.objects.filter(child=self.alice).count(), 1)
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.client.post(self.url, 'nope', content_type='application/json').status_code, 400)
+        self.assertEqual(self.post([{}] * (MAX_CELLS + 1)).status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.client.logout()
+        self.assertEqual(self.post([]).status_code, 401)
+
+
+class StandingOrderTest(TestCase):
+    def setUp(self):
+        self.parent = Parent.objects.create(user=User.objects.create_user(username='parent1'), full_name='Parent One')
+        self.alice = Child.objects.create(parent=self.parent, first_name='Alice', last_name='Smith', year_group=3)
+        self.bob = Child.objects.create(parent=self.parent, first_name='Bob', last_name='Smith', year_group=5)
+        Child.objects.create(parent=self.parent, first_name='Carol', last_name='Smith', year_group=1)
+        self.fish = Meal.objects.create(name='Fish fingers')
+        self.chips = Meal.objects.create(name='Chips')
+        self.pasta = Meal.objects.create(name='Pasta bake')
+        today = timezone.now().date()
+        self.monday = today + timedelta(days=7 - today.weekday())
+        self.tuesday = self.monday + timedelta(days=1)
+        plan_term(self.monday, self.tuesday, [{0: [self.fish.id, self.chips.id], 1: [self.pasta.id, self.fish.id]}])
+        # Alice: chips, else pasta on Mondays, else the first option;
+        # Bob: fish every day; Carol has no standing orders.
+        StandingOrder.objects.create(child=self.alice, weekday=0, rank=0, meal=self.chips)
+        StandingOrder.objects.create(child=self.alice, weekday=0, rank=1, meal=self.pasta)
+        StandingOrder.objects.create(child=self.alice, rank=0)
+        StandingOrder.objects.create(child=self.bob, rank=0, meal=self.fish)
+        self.bob_monday = MealChoice.objects.create(
+            child=self.bob, meal=self.chips, meal_registration=MealRegistration.objects.get(date=self.monday)
+        )
+
+    def chosen(self):
+        return {
+            (choice.child.first_name, choice.meal_registration.date): choice.meal.name
+            for choice in MealChoice.objects.select_related('child', 'meal', 'meal_registration')
+        }
+
+    def test_expands_new_menus_without_overwriting_choices(self):
+        result = expand_standing_orders()
+        self.assertEqual(result, {'registrations': 2, 'requested': 4, 'created': 3})
+        self.assertEqual(self.chosen(), {
+            ('Alice', self.monday): 'Chips',
+            ('Alice', self.tuesday): 'Pasta bake',
+            ('Bob', self.monday): 'Chips',
+            ('Bob', self.tuesday): 'Fish fingers',
+        })
+        self.assertEqual(verify_totals(), [])
+        self.assertFalse(MealRegistration.objects.filter(standing_orders_applied=False).exists())
+
+        # A choice removed after expansion stays removed on the next run.
+        MealChoice.objects.filter(child=self.alice, meal_registration__date=self.monday).delete()
+        self.assertEqual(expand_standing_orders()['registrations'], 0)
+        self.assertNotIn(('Alice', self.monday), self.chosen())
+
+    def test_inserts_in_bulk_and_command_can_refill_upcoming_dates(self):
+        with CaptureQueriesContext(connection) as queries:
+            expand_standing_orders()
+        inserts = [
+            query for query in queries
+            if query['sql'].startswith('INSERT') and '"meals_mealchoice"' in query['sql'].split('(')[0]
+        ]
+        self.assertEqual(len(inserts), 1)
+        # Totals are moved by the rows inserted, never recounted under orders coming in.
+        self.assertFalse(any(query['sql'].startswith('DELETE FROM "meals_dailymealtotal"') for query in queries))
+        self.assertEqual(verify_totals(), [])
+
+        MealChoice.objects.filter(child=self.alice).delete()
+        out = StringIO()
+        call_command('expand_standing_orders', all_upcoming=True, stdout=out)
+        self.assertIn('Created 2 of 4', out.getvalue())
+        self.assertEqual(self.chosen()[('Alice', self.monday)], 'Chips')
+        self.assertEqual(verify_totals(), [])
+
+
+class ForecastTest(TestCase):
+    def setUp(self):
+        parent = Parent.objects.create(user=User.objects.create_user(username='parent1'), full_name='Parent One')
+        self.children = [
+            Child.objects.create(parent=parent, first_name=f'Child{n}', last_name='Smith', year_group=3)
+            for n in range(10)
+        ]
+        self.fish = Meal.objects.create(name='Fish fingers')
+        self.chips = Meal.objects.create(name='Chips')
+        self.pasta = Meal.objects.create(name='Pasta bake')
+        # Four past Mondays where 7 of 10 children had fish and 3 chips.
+        today = timezone.now().date()
+        self.monday = today + timedelta(days=7 - today.weekday())
+        for week in range(2, 6):
+            registration = MealRegistration.objects.create(date=self.monday - timedelta(weeks=week))
+            registration.meals.set([self.fish, self.chips])
+            MealChoice.objects.bulk_create(
+                MealChoice(child=child, meal_registration=registration, meal=self.fish if n < 7 else self.chips)
+                for n, child in enumerate(self.children)
+            )
+        self.upcoming = MealRegistration.objects.create(date=self.monday)
+        self.upcoming.meals.set([self.fish, self.chips, self.pasta])
+
+    def rows(self):
+        return {
+            row['meal_id']: (row['ordered'], row['forecast'])
+            for row in forecast_rows(forecast(self.monday, self.monday))
+        }
+
+    def test_shares_out_expected_diners_around_placed_orders(self):
+        MealChoice.objects.create(child=self.children[0], meal_registration=self.upcoming, meal=self.chips)
+        result = forecast(self.monday, self.monday)
+        predicted = result.predicted.sum(axis=2)[0]
+        # Ten diners expected; pasta has no history so it gets the average
+        # share of fish (0.7) and chips (0.3), and nine are still to order.
+        self.assertAlmostEqual(predicted.sum(), 10)
+        shares = dict(zip(result.meal_ids.tolist(), predicted.tolist()))
+        self.assertAlmostEqual(shares[self.fish.id], 9 * 0.7 / 1.5)
+        self.assertAlmostEqual(shares[self.chips.id], 1 + 9 * 0.3 / 1.5)
+        self.assertEqual(self.rows(), {self.fish.id: (0, 5), self.chips.id: (1, 3), self.pasta.id: (0, 3)})
+
+    def test_never_below_orders_placed(self):
+        for n in range(12):
+            child = Child.objects.create(parent=Parent.objects.get(), first_name=f'Extra{n}',
+                                         last_name='Smith', year_group=3)
+            MealChoice.objects.create(child=child, meal_registration=self.upcoming, meal=self.pasta)
+        self.assertEqual(self.rows()[self.pasta.id], (12, 12))
+        self.assertEqual(self.rows()[self.fish.id], (0, 0))
+
+    def test_a_term_costs_three_queries_and_shows_in_admin(self):
+        plan_term(self.monday + timedelta(days=1), self.monday + timedelta(weeks=13),
+                  [{day: [self.fish.id, self.chips.id] for day in range(5)}])
+        with CaptureQueriesContext(connection) as queries:
+            result = forecast(self.monday, self.monday + timedelta(weeks=13))
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(len(result.registration_ids), 1 + 13 * 5)
+
+        User.objects.create_superuser(username='kitchen', password='pass1234', email='k@example.com')
+        self.client.login(username='kitchen', password='pass1234')
+        resp = self.client.get(reverse('admin:meals-for-day'), {'date': self.monday})
+        self.assertEqual(
+            [(row['meal__name'], row['forecast']) for row in resp.context['forecast_totals']],
+            [('Fish fingers', 5), ('Pasta bake', 4), ('Chips', 2)],
+        )
+        self.assertContains(resp, 'Forecast')
+
+
+class OrderReportApiTest(TestCase):
+    def setUp(self):
+        parent = Parent.objects.create(user=User.objects.create_user(username='parent1'), full_name='Parent One')
+        self.alice = Child.objects.create(parent=parent, first_name='Alice', last_name='Smith', year_group=3)
+        self.bob = Child.objects.create(parent=parent, first_name='Bob', last_name='Smith', year_group=5)
+        self.fish = Meal.objects.create(name='Fish fingers')
+        self.chips = Meal.objects.create(name='Chips')
+        self.day = date(2027, 9, 6)
+        self.registration = MealRegistration.objects.create(date=self.day)
+        self.registration.meals.set([self.fish, self.chips])
+        MealChoice.objects.create(child=self.alice, meal_registration=self.registration, meal=self.fish)
+        self.bob_choice = MealChoice.objects.create(child=self.bob, meal_registration=self.registration, meal=self.fish)
+        self.client.force_login(User.objects.create_superuser(username='kitchen', email='k@example.com'))
+        self.url = reverse('order_report')
+
+    def get(self, headers=None, **params):
+        return self.client.get(self.url, {'start': self.day, 'end': self.day, **params}, headers=headers)
+
+    def test_groups_by_any_dimensions(self):
+        body = self.get(group_by='meal,year_group').json()
+        self.assertEqual(body['rows'], [
+            {'meal': self.fish.id, 'meal_name': 'Fish fingers', 'year_group': 3, 'count': 1},
+            {'meal': self.fish.id, 'meal_name': 'Fish fingers', 'year_group': 5, 'count': 1},
+        ])
+        self.assertEqual(self.get(year_group=5, group_by='date').json()['rows'],
+                         [{'date': str(self.day), 'count': 1}])
+        self.assertEqual(self.get(meal=self.chips.id, group_by='').json()['total'], 0)
+        self.assertEqual(self.get(group_by='colour').status_code, 400)
+
+    def test_revalidation_answers_304_until_orders_change(self):
+        first = self.get()
+        # Deletions cannot move a Last-Modified forward, so only the ETag is sent.
+        self.assertFalse(first.has_header('Last-Modified'))
+        etag = first['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.get({'If-None-Match': etag})
+        self.assertEqual(cached.status_code, 304)
+        self.assertFalse(any('GROUP BY' in query['sql'] and 'meals_mealchoice' in query['sql'] for query in queries))
+        self.assertEqual(self.get({'If-Modified-Since': http_date()}).status_code, 200)
+
+        # A changed meal and a deleted choice both keep chosen_at as it was.
+        self.bob_choice.meal = self.chips
+        self.bob_choice.save()
+        changed = self.get({'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.bob_choice.delete()
+        deleted = self.get({'If-None-Match': changed['ETag']})
+        self.assertEqual(deleted.status_code, 200)
+        self.registration.delete()
+        self.assertEqual(self.get({'If-None-Match': deleted['ETag']}).status_code, 200)
+
+    def test_menu_edits_from_either_side_touch_the_registration(self):
+        stale = timezone.now() - timedelta(days=1)
+        for edit in (lambda: self.registration.meals.remove(self.chips),
+                     lambda: self.fish.registrations.clear()):
+            MealRegistration.objects.filter(pk=self.registration.pk).update(updated_at=stale)
+            edit()
+            self.registration.refresh_from_db()
+            self.assertGreater(self.registration.updated_at, stale)
+
+    def test_staff_only(self):
+        self.client.force_login(self.alice.parent.user)
+        self.assertEqual(self.get().status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.get().status_code, 401)
+
+
+class MealChoiceChangelistTest(TestCase):
+    def setUp(self):
+        parent = Parent.objects.create(user=User.objects.create_user(username='parent1'), full_name='Parent One')
+        self.children = [
+            Child.objects.create(parent=parent, first_name=f'Child{n}', last_name='Smith', year_group=n % 3)
+            for n in range(6)
+        ]
+        self.meal = Meal.objects.create(name='Fish fingers')
+        self.url = reverse('admin:meals_mealchoice_changelist')
+        self.client.force_login(User.objects.create_superuser(username='kitchen', email='k@example.com'))
+
+    def add_days(self, first, days):
+        plan_term(first, first + timedelta(days=days - 1), [{day: [self.meal.id] for day in range(5)}])
+        registrations = MealRegistration.objects.filter(date__gte=first, date__lt=first + timedelta(days=days))
+        for registration in registrations:
+            for child in self.children:
+                MealChoice.objects.create(child=child, meal_registration=registration, meal=self.meal)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_days(date(2027, 9, 6), 1)
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.add_days(date(2027, 10, 4), 14)
+        with CaptureQueriesContext(connection) as many:
+            resp = self.client.get(self.url)
+        self.assertEqual(len(many), len(few))
+        self.assertContains(resp, 'September 2027')
+        self.assertContains(resp, 'October 2027')
+        # The hierarchy and filter options never scan the choices.
+        self.assertFalse([
+            query['sql'] for query in many
+            if 'DISTINCT' in query['sql'] and 'meals_mealchoice' in query['sql']
+        ])
+
+        resp = self.client.get(self.url, {'meal_registration__date__year': 2027,
+                                          'meal_registration__date__month': 10,
+                                          'child__year_group': 1})
+        self.assertEqual(resp.context['cl'].result_count, 10 * 2)
+
+    def test_later_pages_match_offset_pagination(self):
+        self.add_days(date(2027, 9, 6), 7)
+        choices = MealChoice.objects.select_related('child').order_by('-pk')
+        seek = EstimatedCountPaginator(choices, 7)
+        self.assertEqual(seek.count, 30)
+        for number in seek.page_range:
+            self.assertEqual(list(seek.page(number)), list(choices[(number - 1) * 7:number * 7]))
+
+    def test_pages_past_the_count_limit_are_reachable(self):
+        self.add_days(date(2027, 9, 6), 7)
+        choices = MealChoice.objects.order_by('-pk')
+        capped = EstimatedCountPaginator(choices, 7)
+        capped.count_limit = 10
+        # Ten rows are shown, with a link to one page past them...
+        self.assertEqual((capped.count, capped.num_pages), (10, 3))
+        # ...which counts the rows, so the rest of the pages appear.
+        self.assertEqual(list(capped.page(3)), list(choices[14:21]))
+        self.assertEqual((capped.count, capped.num_pages), (30, 5))
+
+        typed = EstimatedCountPaginator(choices, 7)
+        typed.count_limit = 10
+        self.assertEqual(list(typed.page(5)), list(choices[28:35]))
+        with self.assertRaises(EmptyPage):
+            typed.page(6)
+
+
+class ArchiveTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='parent1', password='pass1234')
+        self.parent = Parent.objects.create(user=self.user, full_name='Parent One')
+        self.alice = Child.objects.create(parent=self.parent, first_name='Alice', last_name='Smith', year_group=3)
+        self.bob = Child.objects.create(parent=self.parent, first_name='Bob', last_name='Smith', year_group=5)
+        self.fish = Meal.objects.create(name='Fish fingers')
+        self.chips = Meal.objects.create(name='Chips')
+        self.today = timezone.now().date()
+        self.dates = [self.today - timedelta(days=days) for days in (300, 250, 200, 10)] + [self.today + timedelta(days=5)]
+        for day in self.dates:
+            registration = MealRegistration.objects.create(date=day)
+            registration.meals.set([self.fish, self.chips])
+            MealChoice.objects.create(child=self.alice, meal_registration=registration, meal=self.fish)
+            MealChoice.objects.create(child=self.bob, meal_registration=registration, meal=self.chips)
+
+    def test_moves_old_choices_after_writing_rollups(self):
+        result = archive_choices(archive_cutoff(self.today, days=120), batch_size=2)
+        self.assertEqual(result, {'dates': 3, 'choices': 6, 'rollups': 6})
+        self.assertEqual(
+            sorted(MealChoice.objects.values_list('meal_registration__date', flat=True).distinct()),
+            self.dates[3:],
+        )
+        self.assertEqual(ArchivedMealChoice.objects.count(), 6)
+        self.assertEqual(
+            set(MealChoiceRollup.objects.filter(date=self.dates[0]).values_list('meal__name', 'year_group', 'count')),
+            {('Fish fingers', 3, 1), ('Chips', 5, 1)},
+        )
+        self.assertFalse(DailyMealTotal.objects.filter(meal_registration__date__lt=self.dates[3]).exists())
+        self.assertEqual(verify_totals(), [])
+
+        # A late admin correction on an archived date adds to its rollup.
+        late = Child.objects.create(parent=self.parent, first_name='Cara', last_name='Smith', year_group=3)
+        MealChoice.objects.create(
+            child=late, meal=self.fish, meal_registration=MealRegistration.objects.get(date=self.dates[0])
+        )
+        out = StringIO()
+        call_command('archive_meal_choices', before=str(self.dates[3]), stdout=out)
+        self.assertIn('Archived 1 choices from 1 dates', out.getvalue())
+        self.assertEqual(MealChoiceRollup.objects.get(date=self.dates[0], meal=self.fish, year_group=3).count, 2)
+
+    def test_reports_exports_and_forecasts_still_count_archived_dates(self):
+        start, end = self.dates[0], self.dates[-1]
+        params = {'start': start, 'end': end, 'meals': [], 'year_groups': [], 'group_by': ['meal', 'year_group']}
+
+        def read():
+            return (
+                report_rows(params),
+                report_rows({**params, 'year_groups': [5], 'group_by': ['date']}),
+                ''.join(stream_csv(filter_choices(start, end))),
+                load_demand(start, end).counts.tolist(),
+            )
+
+        before = read()
+        etag = report_etag(params, report_state(params))
+        archive_choices(archive_cutoff(self.today, days=120))
+        self.assertEqual(read(), before)
+        self.assertEqual(sum(row['count'] for row in before[0]), 2 * len(self.dates))
+        self.assertNotEqual(report_etag(params, report_state(params)), etag)
+
+    def test_ordering_skips_and_refuses_archived_dates(self):
+        upcoming = MealRegistration.objects.create(date=self.today + timedelta(days=7))
+        upcoming.meals.set([self.fish])
+        archive_choices(archive_cutoff(self.today, days=120))
+        self.assertEqual(next_unordered_date([self.alice.id, self.bob.id]), upcoming.date)
+
+        self.client.login(username='parent1', password='pass1234')
+        resp = self.client.get(reverse('meal_ordering'))
+        self.assertEqual(resp.context['selected_date'], upcoming.date)
+        resp = self.client.post(
+            f"{reverse('meal_ordering')}?date={self.dates[0]}",
+            {f'{self.alice.id}-meal': self.fish.id, f'{self.bob.id}-meal': self.fish.id},
+        )
+        self.assertEqual(resp.status_code, 403)
+        self.assertFalse(MealChoice.objects.filter(meal_registration__date=self.dates[0]).exists())
+
+    def test_history_reads_the_archive_in_the_same_query(self):
+        archive_choices(archive_cutoff(self.today, days=120))
+        pages = []
+        cursor = None
+        while True:
+            page, cursor = history_page(self.parent, self.today, view='past', cursor=cursor, page_size=3)
+            pages.append([(choice.meal_registration.date, choice.child.first_name) for choice in page])
+            if cursor is None:
+                break
+        self.assertEqual(pages, [
+            [(self.dates[3], 'Bob'), (self.dates[3], 'Alice'), (self.dates[2], 'Bob')],
+            [(self.dates[2], 'Alice'), (self.dates[1], 'Bob'), (self.dates[1], 'Alice')],
+            [(self.dates[0], 'Bob'), (self.dates[0], 'Alice')],
+        ])
+
+        self.client.login(username='parent1', password='pass1234')
+        self.client.get(reverse('meal_choice_history'), {'view': 'past'})
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('meal_choice_history'), {'view': 'past'})
+        self.assertEqual(len([query for query in queries if 'UNION' in query['sql']]), 1)
+        self.assertContains(resp, 'Fish fingers', count=4)
+
+
+class DeletionTaskTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='parent1', password='pass1234')
+        self.parent = Parent.objects.create(user=self.user, full_name='Parent One')
+        self.alice = Child.objects.create(parent=self.parent, first_name='Alice', last_name='Smith', year_group=3)
+        self.bob = Child.objects.create(parent=self.parent, first_name='Bob', last_name='Smith', year_group=5)
+        other_user = User.objects.create_user(username='parent2', password='pass1234')
+        other = Parent.objects.create(user=other_user, full_name='Parent Two')
+        self.cara = Child.objects.create(parent=other, first_name='Cara', last_name='Jones', year_group=3)
+        self.fish = Meal.objects.create(name='Fish fingers')
+        today = timezone.now().date()
+        for days in (-5, -4, -3, -2, -1, 1, 2, 3, 4, 5):
+            registration = MealRegistration.objects.create(date=today + timedelta(days=days))
+            registration.meals.set([self.fish])
+            for child in (self.alice, self.bob, self.cara):
+                MealChoice.objects.create(child=child, meal_registration=registration, meal=self.fish)
+        StandingOrder.objects.create(child=self.alice, weekday=None, rank=0, meal=self.fish)
+
+    def test_account_is_deleted_in_chunks_with_progress(self):
+        task = request_account_deletion(self.user)
+        self.assertEqual(task.status, DeletionTask.PENDING)
+        # Upcoming meals are cancelled at once; the past ones go in chunks.
+        self.assertEqual(MealChoice.objects.filter(child__parent=self.parent).count(), 10)
+
+        with CaptureQueriesContext(connection) as queries:
+            run_deletion(task.pk, chunk_size=3)
+        deletes = [query['sql'] for query in queries if query['sql'].startswith('DELETE FROM "meals_mealchoice"')]
+        self.assertEqual(len(deletes), 4)
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, DeletionTask.DONE)
+        self.assertIsNotNone(task.finished_at)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Child.all_objects.filter(parent_id=self.parent.id).exists())
+        self.assertFalse(StandingOrder.objects.exists())
+        self.assertEqual(MealChoice.objects.count(), 10)
+        self.assertEqual(set(DailyMealTotal.objects.values_list('count', flat=True)), {1})
+        self.assertEqual(verify_totals(), [])
+        # Running the job again finds the task done and leaves it alone.
+        run_deletion(task.pk)
+        self.assertEqual(DeletionTask.objects.get(pk=task.pk).rows_deleted, task.rows_deleted)
+
+    def test_child_is_hidden_at_once(self):
+        self.client.login(username='parent1', password='pass1234')
+        self.client.post(reverse('delete_child', args=[self.alice.id]))
+        self.assertEqual(list(self.parent.children.all()), [self.bob])
+        self.assertEqual(
+            self.client.get(reverse('edit_child', args=[self.alice.id])).status_code, 404
+        )
+        # The kitchen stops counting the child's upcoming meals at once.
+        upcoming = MealChoice.objects.filter(meal_registration__date__gt=timezone.now().date())
+        self.assertFalse(upcoming.filter(child_id=self.alice.id).exists())
+        self.assertEqual(
+            set(DailyMealTotal.objects.filter(meal_registration__in=upcoming.values('meal_registration'))
+                .values_list('count', flat=True)),
+            {2},
+        )
+        self.assertEqual(verify_totals(), [])
+        self.assertTrue(MealChoice.objects.filter(child_id=self.alice.id).exists())
+
+        work(threads=1, once=True)
+        self.assertFalse(Child.all_objects.filter(pk=self.alice.id).exists())
+        self.assertEqual(MealChoice.objects.filter(child=self.bob).count(), 10)
+        self.assertEqual(verify_totals(), [])
+
+    def test_a_crashed_worker_is_picked_up_after_its_lease(self):
+        task = request_child_deletion(self.alice)
+        [claimed] = claim_jobs(1)
+        # Nobody else gets the deletion while the lease holds...
+        self.assertEqual(claim_jobs(1), [])
+        # ...and once it runs out, the next worker takes over and carries on.
+        later = claimed.locked_until + timedelta(seconds=1)
+        [retried] = claim_jobs(1, now=later)
+        self.assertEqual((retried.pk, retried.attempts), (claimed.pk, 2))
+        self.assertEqual(run_job(retried).status, Job.DONE)
+        self.assertEqual(DeletionTask.objects.get(pk=task.pk).status, DeletionTask.DONE)
+
+    def test_a_deletion_run_twice_at_once_moves_the_totals_once(self):
+        task = request_child_deletion(self.alice)
+        rivals = [DeletionTask.objects.get(pk=task.pk)]
+
+        def lock_behind_a_rival(child_ids):
+            # A second worker on the same task gets the lock first and finishes.
+            if rivals:
+                run_task(rivals.pop())
+            lock_children(child_ids)
+
+        with mock.patch('meals.deletion.lock_children', lock_behind_a_rival):
+            run_task(task)
+        self.assertFalse(MealChoice.objects.filter(child_id=self.alice.id).exists())
+        self.assertEqual(set(DailyMealTotal.objects.values_list('count', flat=True)), {2})
+        self.assertEqual(verify_totals(), [])
+
+    def test_failures_are_retried_then_given_up(self):
+        task = request_child_deletion(self.alice)
+        DeletionTask.objects.filter(pk=task.pk).update(kind='bogus')
+        now = timezone.now()
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            [claimed] = claim_jobs(1, now=now)
+            self.assertEqual(claimed.attempts, attempt)
+            result = run_job(claimed)
+            now = result.run_at
+        self.assertEqual(result.status, Job.FAILED)
+        task.refresh_from_db()
+        self.assertEqual(task.status, DeletionTask.FAILED)
+        self.assertIn('bogus', task.last_error)
+        self.assertEqual(claim_jobs(1, now=now + timedelta(days=1)), [])
+
+
+@job
+def add_meal(name):
+    Meal.objects.create(name=name)
+
+
+@job
+def failing_job(message):
+    raise ValueError(message)
+
+
+class JobQueueTest(TestCase):
+    def test_enqueued_job_runs_in_the_worker(self):
+        enqueue(add_meal, 'Fish fingers')
+        self.assertFalse(Meal.objects.exists())
+
+        out = StringIO()
+        call_command('run_worker', once=True, threads=1, stdout=out)
+        self.assertIn('Ran 1 jobs.', out.getvalue())
+        self.assertTrue(Meal.objects.filter(name='Fish fingers').exists())
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+
+    def test_only_jobs_can_be_queued(self):
+        with self.assertRaises(ValueError):
+            enqueue(print, 'hello')
+        bad = Job.objects.create(name='builtins.print', args=['hello'], run_at=timezone.now())
+        run_job(claim_jobs(1)[0])
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, Job.QUEUED)
+        self.assertIn('is not a job', bad.last_error)
+
+    def test_failures_back_off_then_give_up(self):
+        queued = enqueue(failing_job, 'boom', max_attempts=3)
+        now = timezone.now()
+        for attempt in range(1, 4):
+            claimed = claim_jobs(5, now=now)
+            self.assertEqual([(j.pk, j.attempts) for j in claimed], [(queued.pk, attempt)])
+            before = timezone.now()
+            failed = run_job(claimed[0])
+            if attempt < 3:
+                self.assertEqual(failed.status, Job.QUEUED)
+                self.assertGreaterEqual(failed.run_at, before + backoff(attempt))
+                # Not due again until the backoff has passed.
+                self.assertEqual(claim_jobs(5, now=now), [])
+                now = failed.run_at
+        self.assertEqual((failed.status, failed.last_error), (Job.FAILED, 'boom'))
+        self.assertEqual(claim_jobs(5, now=now + timedelta(days=1)), [])
+        self.assertEqual([backoff(n).total_seconds() for n in (1, 2, 3, 20)], [30, 60, 120, 3600])
+
+    def test_jobs_are_claimed_once_until_their_lease_runs_out(self):
+        first = enqueue(failing_job, 'one')
+        second = enqueue(failing_job, 'two')
+        self.assertEqual([j.pk for j in claim_jobs(1)], [first.pk])
+        self.assertEqual([j.pk for j in claim_jobs(5)], [second.pk])
+        self.assertEqual(claim_jobs(5), [])
+        later = Job.objects.get(pk=first.pk).locked_until + timedelta(seconds=1)
+        self.assertEqual([(j.pk, j.attempts) for j in claim_jobs(5, now=later)], [(first.pk, 2), (second.pk, 2)])
+
+    def test_deletions_run_on_the_queue(self):
+        user = User.objects.create_user(username='parent1', password='pass1234')
+        parent = Parent.objects.create(user=user, full_name='Parent One')
+        child = Child.objects.create(parent=parent, first_name='Alice', last_name='Smith', year_group=3)
+        task = request_child_deletion(child)
+        self.assertEqual(Job.objects.get().args, [task.pk])
+
+        self.assertEqual(work(threads=1, once=True), 1)
+        task.refresh_from_db()
+        self.assertEqual(task.status, DeletionTask.DONE)
+        self.assertFalse(Child.all_objects.filter(pk=child.pk).exists())
+
+
+class PasswordHashingTest(TestCase):
+    def login(self):
+        self.assertTrue(self.client.login(username='parent1', password='pass1234'))
+        return User.objects.get(username='parent1').password
+
+    def test_changing_the_policy_rehashes_at_next_login(self):
+        with override_settings(PASSWORD_HASHERS=hashers_for('pbkdf2_sha256'), PASSWORD_HASH_COST=1000):
+            User.objects.create_user(username='parent1', password='pass1234')
+            self.assertTrue(self.login().startswith('pbkdf2_sha256$1000$'))
+        with override_settings(PASSWORD_HASHERS=hashers_for('pbkdf2_sha256'), PASSWORD_HASH_COST=2000):
+            self.assertTrue(self.login().startswith('pbkdf2_sha256$2000$'))
+        with override_settings(PASSWORD_HASHERS=hashers_for('scrypt'), PASSWORD_HASH_COST=1024):
+            self.assertTrue(self.login().startswith('scrypt$'))
+            # Already under the current policy, so left alone.
+            encoded = User.objects.get(username='parent1').password
+            self.assertEqual(self.login(), encoded)
+
+    def test_login_benchmark_reports_per_core_rate(self):
+        encoded = User.objects.create_user(username='parent1', password='pass1234').password
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'logins.json')
+            call_command('benchmark_logins', policies='pbkdf2_sha256:1000,scrypt:1024', iterations=2,
+                         output=output, stdout=out)
+            with open(output) as fh:
+                results = json.load(fh)['results']
+        self.assertEqual(set(results), {'pbkdf2_sha256:1000', 'scrypt:1024'})
+        self.assertGreater(results['scrypt:1024']['logins_per_second_per_core'], 0)
+        # The throwaway user is gone and real users keep their hashes.
+        self.assertEqual(list(User.objects.values_list('username', 'password')), [('parent1', encoded)])
+        with self.assertRaises(CommandError):
+            call_command('benchmark_logins', policies='md5', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('benchmark_logins', policies='argon2', stdout=StringIO())
+
+    def test_registration_rejects_an_email_in_another_case(self):
+        User.objects.create_user(username='parent1', password='pass1234', email='parent@example.com')
+        form = UserParentRegistrationForm(data={
+            'username': 'parent2', 'email': 'Parent@Example.com', 'full_name': 'Parent Two',
+            'password': 'longpassword1', 'password2': 'longpassword1',
+        })
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(form.is_valid())
+        self.assertIn('email', form.errors)
+        self.assertTrue(any('UPPER("auth_user"."email")' in query['sql'] for query in queries))
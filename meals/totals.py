@@ -0,0 +1,109 @@
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from .models import DailyMealTotal, MealChoice
+
+
+# Keys per UPDATE; keeps the OR-ed filter well inside SQLite's expression depth limit.
+UPDATE_CHUNK = 200
+
+
+def apply_total_changes(changes):
+    """
+    Add the deltas in ``changes``, a mapping of
+    ``(meal_registration_id, meal_id)`` to a signed count, to the stored
+    daily totals. Missing rows are only created for positive deltas, so a
+    decrement issued while a meal or registration is being deleted never
+    recreates a row for it. Rows sharing a delta are updated together, so a
+    batch of +1/-1 changes costs two UPDATEs however many keys it touches.
+    """
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    new_rows = [
+        DailyMealTotal(meal_registration_id=registration_id, meal_id=meal_id)
+        for (registration_id, meal_id), delta in changes.items()
+        if delta > 0
+    ]
+    if new_rows:
+        DailyMealTotal.objects.bulk_create(new_rows, ignore_conflicts=True)
+    now = timezone.now()
+    keys_by_delta = defaultdict(list)
+    for key, delta in sorted(changes.items()):
+        keys_by_delta[delta].append(key)
+    for delta, keys in keys_by_delta.items():
+        for start in range(0, len(keys), UPDATE_CHUNK):
+            rows = reduce(or_, (
+                Q(meal_registration_id=registration_id, meal_id=meal_id)
+                for registration_id, meal_id in keys[start:start + UPDATE_CHUNK]
+            ))
+            DailyMealTotal.objects.filter(rows).update(count=F("count") + delta, updated_at=now)
+
+
+def count_choices(registration_ids=None):
+    """Count stored choices per ``(meal_registration_id, meal_id)``."""
+    choices = MealChoice.objects.all()
+    if registration_ids is not None:
+        choices = choices.filter(meal_registration_id__in=registration_ids)
+    rows = (
+        choices.values_list("meal_registration_id", "meal_id")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    return Counter(
+        {(registration_id, meal_id): total for registration_id, meal_id, total in rows}
+    )
+
+
+def stored_totals(registration_ids=None):
+    """Read the maintained totals per ``(meal_registration_id, meal_id)``."""
+    totals = DailyMealTotal.objects.exclude(count=0)
+    if registration_ids is not None:
+        totals = totals.filter(meal_registration_id__in=registration_ids)
+    return Counter(
+        {
+            (registration_id, meal_id): count
+            for registration_id, meal_id, count in totals.values_list(
+                "meal_registration_id", "meal_id", "count"
+            )
+        }
+    )
+
+
+def rebuild_totals(registration_ids=None):
+    """
+    Recompute the totals from MealChoice, for every registration or just
+    the given ones. Returns the number of total rows written.
+    """
+    expected = count_choices(registration_ids)
+    with transaction.atomic():
+        existing = DailyMealTotal.objects.all()
+        if registration_ids is not None:
+            existing = existing.filter(meal_registration_id__in=registration_ids)
+        existing.delete()
+        DailyMealTotal.objects.bulk_create(
+            DailyMealTotal(
+                meal_registration_id=registration_id, meal_id=meal_id, count=count
+            )
+            for (registration_id, meal_id), count in expected.items()
+        )
+    return len(expected)
+
+
+def verify_totals(registration_ids=None):
+    """
+    Compare the maintained totals with a fresh count of MealChoice.
+
+    Returns a sorted list of ``(key, stored, expected)`` for every
+    ``(meal_registration_id, meal_id)`` that disagrees.
+    """
+    expected = count_choices(registration_ids)
+    stored = stored_totals(registration_ids)
+    return [
+        (key, stored[key], expected[key])
+        for key in sorted(set(expected) | set(stored))
+        if stored[key] != expected[key]
+    ]
@@ -7,11 +7,14 @@ urlpatterns = [
     path('login/', views.user_login, name='login'),
     path('logout/', views.user_logout, name='logout'),
     path('order/', views.meal_ordering, name='meal_ordering'),
+    path('api/orders/', views.order_batch, name='order_batch'),
+    path('api/reports/orders/', views.order_report, name='order_report'),
     path('add-child/', views.add_child, name='add_child'),
     path('children/', views.child_list, name='child_list'),  # List children
     path('children/<int:child_id>/edit/', views.edit_child, name='edit_child'),  # UPDATE
     path('children/<int:child_id>/delete/', views.delete_child, name='delete_child'),  # DELETE
     path('history/', views.meal_choice_history, name='meal_choice_history'),
+    path('orders/', views.admin_meal_orders, name='admin_meal_orders'),
     path('edit-choice/<int:choice_id>/', views.edit_meal_choice, name='edit_meal_choice'),
     path('delete-choice/<int:choice_id>/', views.delete_meal_choice, name='delete_meal_choice'),
     path('account/delete/', views.delete_account, name='delete_account'),
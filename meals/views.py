@@ -2,13 +2,29 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.forms import AuthenticationForm, PasswordResetForm
 from django.contrib.auth import login, logout
+from django.contrib.sites.shortcuts import get_current_site
 from django.utils import timezone
-from .forms import UserParentRegistrationForm, MealChoiceForm, ChildRegistrationForm
-from .models import Parent, MealRegistration, MealChoice
+from .forms import UserParentRegistrationForm, MealChoiceForm, ChildRegistrationForm, menu_fragment
+from .models import MealChoice
+from .ordering import anext_unordered_date, aload_ordering_bundle, asave_meal_choices
+from .history import ahistory_page, UPCOMING, PAST
+from .menus import menu_version, menu_for_date, registered_dates
+from .decorators import async_login_required, async_staff_required, aget_parent
+from .batch import MAX_CELLS, STATUSES, place_orders
+from .reports import parse_report_params, report_etag, report_rows, report_state
+from .deletion import request_account_deletion, request_child_deletion
+from .emails import send_password_reset
+from .jobs import enqueue
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST, require_safe
 from django.db import transaction, IntegrityError
 from django.core.exceptions import ValidationError
+from collections import Counter
 from datetime import datetime
+import json
 import logging
 
 logger = logging.getLogger("meals")
@@ -78,11 +94,12 @@ def password_reset_request(request):
     if request.method == "POST":
         form = PasswordResetForm(request.POST)
         if form.is_valid():
-            # Django's built-in password reset will handle sending email and link
-            form.save(
-                request=request,
-                email_template_name="meals/password_reset_email.html",
-                subject_template_name="meals/password_reset_subject.txt",
+            # The worker sends the email, so a slow mail server doesn't hold up the request.
+            enqueue(
+                send_password_reset,
+                form.cleaned_data["email"],
+                get_current_site(request).domain,
+                request.is_secure(),
             )
             messages.success(
                 request, "Password reset instructions have been sent to your email."
@@ -93,16 +110,9 @@ def password_reset_request(request):
     return render(request, "meals/password_reset.html", {"form": form})
 
 
-def get_or_create_parent(user):
-    parent, created = Parent.objects.get_or_create(
-        user=user, defaults={"full_name": user.get_full_name() or user.username}
-    )
-    return parent
-
-
 @login_required
 def child_list(request):
-    parent = get_or_create_parent(request.user)
+    parent = request.parent
     children = parent.children.all().order_by("year_group", "last_name")
     return render(request, "meals/child_list.html", {"children": children})
 
@@ -110,7 +120,7 @@ def child_list(request):
 @login_required
 @transaction.atomic
 def add_child(request):
-    parent = get_or_create_parent(request.user)
+    parent = request.parent
     if request.method == "POST":
         form = ChildRegistrationForm(request.POST)
         if form.is_valid():
@@ -146,7 +156,7 @@ def add_child(request):
 @login_required
 @transaction.atomic
 def edit_child(request, child_id):
-    parent = get_or_create_parent(request.user)
+    parent = request.parent
     child = get_object_or_404(parent.children, id=child_id)
     if request.method == "POST":
         form = ChildRegistrationForm(request.POST, instance=child)
@@ -182,14 +192,14 @@ def edit_child(request, child_id):
 @login_required
 @transaction.atomic
 def delete_child(request, child_id):
-    parent = get_or_create_parent(request.user)
+    parent = request.parent
     child = get_object_or_404(parent.children, id=child_id)
     if request.method == "POST":
         try:
             child_name = f"{child.first_name} {child.last_name}"
-            child.delete()
+            request_child_deletion(child)
             messages.success(request, f"{child_name} has been deleted successfully.")
-            logger.info(f"Child deleted: {child_id} by parent {parent.id}")
+            logger.info(f"Child deletion queued: {child_id} by parent {parent.id}")
             return redirect("child_list")
         except Exception as e:
             logger.error(f"Error deleting child {child_id}: {str(e)}")
@@ -199,20 +209,25 @@ def delete_child(request, child_id):
     return render(request, "meals/confirm_delete_child.html", {"child": child})
 
 
-@login_required
-def meal_ordering(request):
-    parent = get_or_create_parent(request.user)
-    children = parent.children.all()
-    if not children.exists():
+@async_login_required
+async def meal_ordering(request):
+    parent = await aget_parent(request)
+    children = [child async for child in parent.children.all()]
+    if not children:
         messages.info(
             request, "You have no registered children. Please add a child first."
         )
         return redirect("add_child")
 
+    # A save that fails re-renders the form with 409 (a conflicting write)
+    # or 503 (anything else), and an order for a closed date with 403, so
+    # clients can tell them from a rejected form.
+    status = 200
     try:
-        available_dates = MealRegistration.objects.order_by("date").values_list(
-            "date", flat=True
-        )
+        version = await sync_to_async(menu_version)()
+        available_dates = await sync_to_async(registered_dates)(version)
+        child_ids = [child.id for child in children]
+        today = timezone.now().date()
         selected_date_str = request.GET.get("date")
         selected_date = None
 
@@ -224,99 +239,86 @@ def meal_ordering(request):
                 )
 
         if not selected_date:
-            # Find first available date without choices for any child
-            for date in available_dates:
-                if not MealChoice.objects.filter(
-                    child__in=children, meal_registration__date=date
-                ).exists():
-                    selected_date = date
-                    break
-            if not selected_date and available_dates:
-                selected_date = available_dates[0]
-
-        meal_registration = (
-            MealRegistration.objects.filter(date=selected_date).first()
-            if selected_date
-            else None
-        )
+            # Find first available date still missing a choice for any child
+            selected_date = await anext_unordered_date(child_ids)
+            if not selected_date:
+                selected_date = next((day for day in available_dates if day >= today), None)
+
+        meal_registration = await sync_to_async(menu_for_date)(selected_date, version)
 
         forms = []
         if meal_registration:
-            for child in children:
-                choice = MealChoice.objects.filter(
-                    child=child, meal_registration=meal_registration
-                ).first()
-                initial = {"meal": choice.meal} if choice else {}
+            bundle = await aload_ordering_bundle(children, meal_registration)
+            fragment = await sync_to_async(menu_fragment)(meal_registration, version)
+            for child in bundle.children:
+                choice = bundle.choices_by_child.get(child.id)
+                initial = {"meal": choice.meal_id} if choice else {}
                 forms.append(
                     (
                         child,
                         MealChoiceForm(
                             request.POST if request.method == "POST" else None,
                             initial=initial,
-                            meal_registration=meal_registration,
+                            meals=bundle.meals,
                             prefix=str(child.id),
+                            fragment=fragment,
                         ),
                     )
                 )
 
-        if request.method == "POST" and meal_registration:
-            success_messages = []
+        if request.method == "POST" and meal_registration and meal_registration.date < today:
+            # Past dates are closed, and may already be archived.
+            messages.error(request, f"Ordering for {meal_registration.date} has closed.")
+            status = 403
+        elif request.method == "POST" and meal_registration:
             all_valid = True
             try:
-                with transaction.atomic():
-                    for child, form in forms:
-                        if form.is_valid():
-                            meal = form.cleaned_data["meal"]
-                            choice, created = MealChoice.objects.get_or_create(
-                                child=child,
-                                meal_registration=meal_registration,
-                                defaults={"meal": meal},
-                            )
-                            if not created:
-                                choice.meal = meal
-                                choice.save()
-                            success_messages.append(
-                                (
-                                    (
-                                        f"Meal choice for {child.first_name} {child.last_name} "
-                                        f"on {meal_registration.date}: {meal.name}"
-                                    )
-                                )
-                            )
-                        else:
-                            all_valid = False
-
-                    if all_valid:
-                        for msg in success_messages:
-                            messages.success(request, msg)
-                        logger.info(f"Meal choices saved for parent {parent.id}")
-                        # Find the next available date without choices for any child
-                        next_date = None
-                        for date in available_dates:
-                            if not MealChoice.objects.filter(
-                                child__in=children, meal_registration__date=date
-                            ).exists():
-                                next_date = date
-                                break
-                        if next_date:
-                            return redirect(f"{request.path}?date={next_date}")
-                        else:
-                            return redirect("meal_ordering")
+                selections = []
+                for child, form in forms:
+                    if form.is_valid():
+                        selections.append((child, form.cleaned_data["meal"]))
+                    else:
+                        all_valid = False
+                created, updated = await asave_meal_choices(
+                    meal_registration,
+                    {child.id: meal for child, meal in selections},
+                )
+
+                if all_valid:
+                    for child, meal in selections:
+                        messages.success(
+                            request,
+                            f"Meal choice for {child.first_name} {child.last_name} "
+                            f"on {meal_registration.date}: {meal.name}",
+                        )
+                    logger.info(
+                        f"Meal choices saved for parent {parent.id}: "
+                        f"{created} created, {updated} updated"
+                    )
+                    # Find the next available date still missing choices
+                    next_date = await anext_unordered_date(child_ids)
+                    if next_date:
+                        return redirect(f"{request.path}?date={next_date}")
+                    else:
+                        return redirect("meal_ordering")
             except IntegrityError as e:
                 logger.error(f"Database error saving meal choices: {str(e)}")
                 messages.error(request, "A database error occurred. Please try again.")
+                status = 409
             except Exception as e:
                 logger.error(f"Unexpected error saving meal choices: {str(e)}")
                 messages.error(
                     request, "An unexpected error occurred. Please try again."
                 )
+                status = 503
     except Exception as e:
         logger.error(f"Error in meal_ordering view: {str(e)}")
         messages.error(
             request, "An error occurred loading meal options. Please try again."
         )
         return redirect("child_list")
-    return render(
+    # Rendering reads the session and the user, so it runs in a thread.
+    return await sync_to_async(render)(
         request,
         "meals/meal_ordering.html",
         {
@@ -325,26 +327,29 @@ def meal_ordering(request):
             "meal_registration": meal_registration,
             "forms": forms,
         },
+        status=status,
     )
 
 
-@login_required
-def meal_choice_history(request):
+@async_login_required
+async def meal_choice_history(request):
     try:
-        parent = get_object_or_404(Parent, user=request.user)
-        children = parent.children.all()
-        choices = (
-            MealChoice.objects.filter(child__in=children)
-            .select_related("meal_registration", "meal", "child")
-            .order_by("-meal_registration__date")
-        )
+        parent = await aget_parent(request)
+        view = request.GET.get("view")
+        if view not in (UPCOMING, PAST):
+            view = UPCOMING
         today = timezone.now().date()
-        return render(
+        choices, next_cursor = await ahistory_page(
+            parent, today, view=view, cursor=request.GET.get("after")
+        )
+        return await sync_to_async(render)(
             request,
             "meals/meal_choice_history.html",
             {
                 "choices": choices,
                 "today": today,
+                "view": view,
+                "next_cursor": next_cursor,
             },
         )
     except Exception as e:
@@ -353,14 +358,96 @@ def meal_choice_history(request):
         return redirect("meal_ordering")
 
 
+@require_POST
+def order_batch(request):
+    """
+    Order meals for several children and dates in one JSON request.
+
+    Expects ``{"orders": [{"child": id, "date": "YYYY-MM-DD", "meal": id}, ...]}``
+    and answers with one result per order plus a count per status.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Authentication required."}, status=401)
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "The request body is not valid JSON."}, status=400)
+    orders = payload.get("orders") if isinstance(payload, dict) else None
+    if not isinstance(orders, list):
+        return JsonResponse({"error": 'Expected {"orders": [...]}.'}, status=400)
+    if len(orders) > MAX_CELLS:
+        return JsonResponse(
+            {"error": f"At most {MAX_CELLS} orders per request."}, status=400
+        )
+
+    try:
+        parent = request.parent
+        results = place_orders(parent, orders, timezone.now().date())
+    except IntegrityError as e:
+        logger.error(f"Database error saving batch order: {str(e)}")
+        return JsonResponse({"error": "A database error occurred. Please try again."}, status=500)
+    except Exception as e:
+        logger.error(f"Unexpected error saving batch order: {str(e)}")
+        return JsonResponse({"error": "An unexpected error occurred. Please try again."}, status=500)
+
+    counts = Counter(result["status"] for result in results)
+    summary = {status: counts[status] for status in STATUSES}
+    logger.info(
+        f"Batch order for parent {parent.id}: "
+        + ", ".join(f"{count} {status}" for status, count in summary.items())
+    )
+    return JsonResponse({"results": results, "summary": summary})
+
+
+# Only an ETag: a latest-change time cannot move forward when choices,
+# totals or registrations are deleted, so Last-Modified would go stale.
+@condition(etag_func=lambda request, params: report_etag(params, report_state(params)))
+def _order_report_response(request, params):
+    rows = report_rows(params)
+    return JsonResponse({
+        "start": params["start"].isoformat(),
+        "end": params["end"].isoformat(),
+        "group_by": params["group_by"],
+        "rows": rows,
+        "total": sum(row["count"] for row in rows),
+    })
+
+
+@require_safe
+@cache_control(private=True, no_cache=True)
+def order_report(request):
+    """
+    Order counts for kitchen screens and dashboards, as JSON.
+
+    Takes ``start``, ``end``, ``meal``, ``year_group`` and ``group_by``
+    (any of date, meal and year_group) and answers with one row per group.
+    Responses carry an ETag taken from the daily totals, so polling clients
+    get a 304 without the report being recomputed.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Authentication required."}, status=401)
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Reports are only available to staff."}, status=403)
+    try:
+        params = parse_report_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return _order_report_response(request, params)
+
+
 @login_required
 @transaction.atomic
 def edit_meal_choice(request, choice_id):
     try:
         choice = get_object_or_404(
-            MealChoice, id=choice_id, child__parent__user=request.user
+            MealChoice.objects.select_related("meal_registration", "child"),
+            id=choice_id,
+            child__parent__user=request.user,
         )
         meal_registration = choice.meal_registration
+        menu = menu_for_date(meal_registration.date)
+        if menu is not None and menu.pk == meal_registration.pk:
+            meal_registration = menu
 
         # Check if the meal date hasn't passed
         if meal_registration.date < timezone.now().date():
@@ -389,7 +476,7 @@ def edit_meal_choice(request, choice_id):
                 messages.error(request, "Please correct the errors below.")
         else:
             form = MealChoiceForm(
-                initial={"meal": choice.meal},
+                initial={"meal": choice.meal_id},
                 meal_registration=meal_registration,
                 prefix=str(choice.child.id),
             )
@@ -427,9 +514,11 @@ def delete_meal_choice(request, choice_id):
     return redirect("meal_choice_history")
 
 
-def admin_meal_orders(request):
+@async_staff_required
+async def admin_meal_orders(request):
     try:
-        dates = MealRegistration.objects.order_by("date").values_list("date", flat=True)
+        version = await sync_to_async(menu_version)()
+        dates = await sync_to_async(registered_dates)(version)
         selected_date_str = request.GET.get("date")
         selected_date = None
 
@@ -443,14 +532,9 @@ def admin_meal_orders(request):
         if not selected_date and dates:
             selected_date = dates[0]
 
-        meal_registration = (
-            MealRegistration.objects.filter(date=selected_date).first()
-            if selected_date
-            else None
-        )
+        meal_registration = await sync_to_async(menu_for_date)(selected_date, version)
 
         choices = []
-        totals = {}
         totals_items = []
         if meal_registration:
             meal_choices = (
@@ -458,30 +542,31 @@ def admin_meal_orders(request):
                 .select_related("child", "meal")
                 .order_by("child__year_group", "child__last_name")
             )
-            choices = list(meal_choices)
-            from collections import Counter
-
-            totals = Counter(choice.meal.name for choice in choices)
+            choices = [choice async for choice in meal_choices]
             # Provide a safe iterable to templates to avoid key collisions like 'items'
-            totals_items = list(totals.items())
+            totals_items = [
+                row
+                async for row in meal_registration.meal_totals.filter(count__gt=0)
+                .order_by("-count", "meal__name")
+                .values_list("meal__name", "count")
+            ]
     except Exception as e:
         logger.error(f"Error in admin_meal_orders: {str(e)}")
         messages.error(request, "An error occurred loading meal orders.")
         dates = []
         selected_date = None
         choices = []
-        totals = {}
         totals_items = []
         meal_registration = None
 
-    return render(
+    return await sync_to_async(render)(
         request,
         "meals/admin_meal_orders.html",
         {
             "dates": dates,
             "selected_date": selected_date,
             "choices": choices,
-            "totals": totals,
+            "totals": dict(totals_items),
             "totals_items": totals_items,
             "meal_registration": meal_registration,
         },
@@ -507,9 +592,9 @@ def delete_account(request):
         user = request.user
         username = user.username
         try:
+            task = request_account_deletion(user)
             logout(request)
-            user.delete()
-            logger.info(f"Account deleted for user: {username}")
+            logger.info(f"Account deletion queued for user: {username} (task {task.id})")
         except Exception as e:
             logger.error(f"Error deleting account for {username}: {str(e)}")
             messages.error(
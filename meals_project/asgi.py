@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'meals_project.settings')
+# Tells the settings they are served over ASGI (see DB_CONNECTIONS).
+os.environ.setdefault('DJANGO_ASGI', '1')
 
 application = get_asgi_application()
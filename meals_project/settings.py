@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import os
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
+from meals.backends import apply_connection_mode
 
 if os.path.isfile("env.py"):
     import env
@@ -76,6 +78,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "meals.middleware.ParentMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
@@ -111,10 +114,21 @@ WSGI_APPLICATION = "meals_project.wsgi.application"
 DATABASES = {}
 DATABASE_URL = os.environ.get("DATABASE_URL")
 if DATABASE_URL:
-    DATABASES["default"] = dj_database_url.parse(DATABASE_URL)
-    # Disable persistent connections during collectstatic
-    if "DYNO" in os.environ and not DEBUG:
-        DATABASES["default"]["CONN_MAX_AGE"] = 0
+    # Connection management, see meals.backends.apply_connection_mode:
+    # "per_request" (default), "pool", "pgbouncer" or "persistent". The
+    # pool is opt-in until it has been run against production PostgreSQL,
+    # and persistent connections are refused under ASGI (meals_project.asgi
+    # sets DJANGO_ASGI), where they would leak one per thread.
+    DB_CONNECTIONS = os.environ.get("DB_CONNECTIONS", "per_request")
+    DATABASES["default"] = apply_connection_mode(
+        dj_database_url.parse(DATABASE_URL),
+        DB_CONNECTIONS,
+        max_age=int(os.environ.get("DB_CONN_MAX_AGE", "600")),
+        pool_size=int(os.environ.get("DB_POOL_SIZE", "4")),
+        pool_max_idle=int(os.environ.get("DB_POOL_MAX_IDLE", "300")),
+        behind_proxy="DB_BEHIND_PROXY" in os.environ,
+        asgi="DJANGO_ASGI" in os.environ,
+    )
 else:
     # fallback to local sqlite for development
     DATABASES["default"] = {
@@ -122,6 +136,80 @@ else:
         "NAME": BASE_DIR / "db.sqlite3",
     }
 
+# Cache
+# Shared by every worker through the project database, so menu version
+# stamps are seen by all of them; each worker reads the stamp at most every
+# few seconds (see meals.menus). Create the table with createcachetable.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "meals_cache",
+    }
+}
+
+# Node-local cache for single-node deployments. "file" is shared by every
+# worker on the machine; "memory" is per process and only safe with one
+# worker when used for sessions.
+LOCAL_CACHE = os.environ.get("LOCAL_CACHE", "file")
+if LOCAL_CACHE == "memory":
+    CACHES["local"] = {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "meals-local",
+    }
+else:
+    CACHES["local"] = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("LOCAL_CACHE_DIR", str(BASE_DIR / "cache")),
+    }
+
+# Sessions
+# SESSION_MODE picks the session engine: "db" (Django's default),
+# "cached_db" (reads from the local cache, writes through to the database),
+# "cache" (local cache only) or "signed_cookies" (no server-side state).
+SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+SESSION_MODE = os.environ.get("SESSION_MODE", "db")
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+SESSION_CACHE_ALIAS = "local"
+
+# Choices for dates more than this many days ago are moved to the archive
+# by the archive_meal_choices command.
+MEALS_ARCHIVE_AFTER_DAYS = int(os.environ.get("MEALS_ARCHIVE_AFTER_DAYS", "120"))
+
+# Password hashing
+# PASSWORD_HASH_ALGORITHM picks the hasher for new passwords and
+# PASSWORD_HASH_COST its cost: PBKDF2 iterations or the scrypt work factor,
+# 0 for Django's default. A password hashed under any other algorithm or
+# cost is rehashed with the current ones when its user next logs in.
+# Argon2 and bcrypt need packages that are not installed, so they are not
+# offered. The cost can be raised but not lowered below Django's default,
+# as every stored hash would be weakened at its user's next login; only
+# benchmark_logins tries lower costs.
+PASSWORD_HASH_ALGORITHMS = {
+    "pbkdf2_sha256": "meals.hashers.PBKDF2PasswordHasher",
+    "scrypt": "meals.hashers.ScryptPasswordHasher",
+    "pbkdf2_sha1": "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+}
+PASSWORD_HASH_MIN_COST = {"pbkdf2_sha256": 600_000, "scrypt": 2 ** 14}
+PASSWORD_HASH_ALGORITHM = os.environ.get("PASSWORD_HASH_ALGORITHM", "pbkdf2_sha256")
+PASSWORD_HASH_COST = int(os.environ.get("PASSWORD_HASH_COST", "0"))
+if PASSWORD_HASH_ALGORITHM not in PASSWORD_HASH_ALGORITHMS:
+    raise ImproperlyConfigured(
+        f"PASSWORD_HASH_ALGORITHM must be one of {', '.join(PASSWORD_HASH_ALGORITHMS)}."
+    )
+if PASSWORD_HASH_COST and PASSWORD_HASH_COST < PASSWORD_HASH_MIN_COST.get(PASSWORD_HASH_ALGORITHM, 1):
+    raise ImproperlyConfigured(
+        f"PASSWORD_HASH_COST must be 0 or at least "
+        f"{PASSWORD_HASH_MIN_COST.get(PASSWORD_HASH_ALGORITHM, 1)} for {PASSWORD_HASH_ALGORITHM}."
+    )
+PASSWORD_HASHERS = [PASSWORD_HASH_ALGORITHMS[PASSWORD_HASH_ALGORITHM]] + [
+    path for name, path in PASSWORD_HASH_ALGORITHMS.items() if name != PASSWORD_HASH_ALGORITHM
+]
+
 CSRF_TRUSTED_ORIGINS = [
     "https://*.herokuapp.com",
     "http://127.0.0.1:8000/",